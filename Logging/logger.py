@@ -1,22 +1,142 @@
+'''
+logger.py - Process-wide logging setup.
+
+Application code only enqueues records: a QueueHandler on the root logger hands them to a
+QueueListener thread that formats them and does the I/O for the size-rotated log file and the
+console, so a slow disk or terminal never stalls the event loop.
+
+- logger:          the application logger; use %-style arguments (logger.info("x=%s", x)) so
+                   disabled levels never build the message.
+- payload_logger:  for large payloads (prompts, raw LLM output, tool inputs and results). Records
+                   are sampled (LOG_PAYLOAD_SAMPLE_RATE) and truncated (LOG_PAYLOAD_MAX_CHARS);
+                   log them through log_payload() so nothing is serialized unless a record is kept.
+
+The file gets one JSON object per line (LOG_FORMAT=text for the old plain format), with the
+current trace id when a request is being traced. LOG_LEVEL, LOG_DIR, LOG_MAX_BYTES and
+LOG_BACKUP_COUNT configure the rest.
+'''
+
 import os
 import sys
+import json
+import atexit
+import queue
+import random
 import logging
-from datetime import datetime
-
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any
 
 logging_format = "[%(asctime)s] - %(lineno)d %(name)s - %(levelname)s - %(module)s: - %(message)s"
-log_dir = os.path.join(os.getcwd(),"Artifacts/Logs")
-os.makedirs(log_dir,exist_ok=True)
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_PAYLOAD_SAMPLE_RATE = float(os.getenv("LOG_PAYLOAD_SAMPLE_RATE", "0.1"))
+LOG_PAYLOAD_MAX_CHARS = int(os.getenv("LOG_PAYLOAD_MAX_CHARS", "2000"))
+
+log_dir = os.getenv("LOG_DIR", os.path.join(os.getcwd(), "Artifacts/Logs"))
+os.makedirs(log_dir, exist_ok=True)
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
-log_filepath = os.path.join(log_dir,LOG_FILE)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format=logging_format,
-    handlers=[
-        logging.FileHandler(log_filepath), # putting log message in the logs file.
-        logging.StreamHandler(sys.stdout)  # printing log message on the console.
-    ]
-)
-
-logger = logging.getLogger("logger")
\ No newline at end of file
+log_filepath = os.path.join(log_dir, LOG_FILE)
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "module": record.module,
+            "line": record.lineno,
+            "message": record.getMessage(),
+        }
+        trace_id = getattr(record, "trace_id", None)
+        if trace_id:
+            entry["trace_id"] = trace_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TraceContextFilter(logging.Filter):
+    """Stamps records with the current trace id; runs in the calling thread, where the request context is."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        tracing = sys.modules.get("utility.Tracing")  # not imported here: Tracing itself logs
+        record.trace_id = tracing.current_trace_id() if tracing is not None else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a random `rate` share of records below WARNING."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _Truncated:
+    """Defers serializing and truncating a payload until the record is actually formatted."""
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+
+    def __str__(self) -> str:
+        payload = self.payload
+        if not isinstance(payload, str):
+            if hasattr(payload, "model_dump"):
+                payload = payload.model_dump()
+            try:
+                payload = json.dumps(payload, ensure_ascii=False, default=str)
+            except (TypeError, ValueError):
+                payload = str(payload)
+        if len(payload) > LOG_PAYLOAD_MAX_CHARS:
+            return f"{payload[:LOG_PAYLOAD_MAX_CHARS]}... [{len(payload) - LOG_PAYLOAD_MAX_CHARS} more chars]"
+        return payload
+
+
+def _build_handlers():
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_filepath, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(logging_format))
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setFormatter(logging.Formatter(logging_format))
+    return file_handler, console_handler
+
+
+log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+queue_handler = logging.handlers.QueueHandler(log_queue)
+queue_handler.addFilter(TraceContextFilter())
+listener = logging.handlers.QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+
+root = logging.getLogger()
+root.setLevel(LOG_LEVEL)
+root.handlers = [queue_handler]
+listener.start()
+
+
+def _stop_listener():
+    if listener._thread is not None:  # drains the queue on shutdown
+        listener.stop()
+
+
+atexit.register(_stop_listener)
+
+logger = logging.getLogger("logger")
+
+payload_logger = logging.getLogger("logger.payload")
+payload_logger.addFilter(SamplingFilter(LOG_PAYLOAD_SAMPLE_RATE))
+
+
+def log_payload(label: str, payload: Any, level: int = logging.INFO):
+    """Logs a (sampled, truncated) payload; costs one level check when the level is disabled."""
+    if payload_logger.isEnabledFor(level):
+        payload_logger.log(level, "%s: %s", label, _Truncated(payload), stacklevel=2)
@@ -1,20 +1,22 @@
 from utility.model import Metadata, UserProfile, Location, ConversationState
-from Logging.logger import logger
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 from utility.LLM import LLMClient
+from utility.ConversationSummary import context_summary
 from Meta.location_normalizer import LocationNormalizer
 from router.ToolExecutor import safe_json_parse
 import json
 import sys
 import re
+from typing import Optional
 from dotenv import load_dotenv
 load_dotenv()
 
 class MetadataExtractor:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
-            logger.info(f"Initializing MetadataExtractor with model: {model}")
-            self.llm_client = LLMClient(model=model)
+            self.llm_client = LLMClient(model=model, route="metadata_extraction")
+            logger.info(f"Initializing MetadataExtractor with model: {self.llm_client.model}")
             self.location_normalizer = LocationNormalizer()
         except Exception as e:
             logger.error(f"Failed to initialize MetadataExtractor: {e}")
@@ -40,6 +42,31 @@ class MetadataExtractor:
 
         raise ValueError("No valid JSON object found in LLM response.")
 
+    def _parse_metadata(self, raw_output: str) -> dict:
+        """
+        The metadata JSON of an LLM response. Raises ValueError when it cannot be parsed or lacks the
+        required keys, which makes LLMClient.run_structured retry the query on a larger model.
+        """
+        log_payload("Raw output from LLM", raw_output)
+
+        # 1) Try to extract an embedded JSON object from mixed prose.
+        try:
+            metadata_dict = self._extract_embedded_json(raw_output)
+        except Exception as ex:
+            logger.warning(f"[MetadataExtractor] Embedded JSON not found or invalid: {ex}. Falling back to safe_json_parse.")
+            # 2) Fallback to safe_json_parse (may return {"output_text": "..."}).
+            metadata_dict = safe_json_parse(raw_output)
+
+        # --- Validate required keys early for clearer errors ---
+        if not isinstance(metadata_dict, dict) or not all(k in metadata_dict for k in ("intents", "entities", "user_profile")):
+            raise ValueError("Metadata JSON missing required keys (intents/entities/user_profile).")
+        user_profile = metadata_dict["user_profile"]
+        if not isinstance(user_profile, dict) or not isinstance(user_profile.get("user_type"), str):
+            raise ValueError("Metadata JSON has no user_profile.user_type.")
+        if not isinstance(metadata_dict["intents"], list) or not isinstance(metadata_dict["entities"] or {}, dict):
+            raise ValueError("Metadata JSON intents must be a list and entities an object.")
+        return metadata_dict
+
     def extract_metadata(self, query: str, state: ConversationState | None = None) -> Metadata:
         try:
             logger.info(f"Extracting metadata from query: {query}")
@@ -47,12 +74,12 @@ class MetadataExtractor:
             context_hint = ""
             if state:
                 last_tool = state.last_tool_used or ""
-                last_msg = state.messages[-1].content if state.messages else ""
+                summary = context_summary(state)
                 last_entities = state.context_entities or {}
 
                 context_hint = f"""
 Previous tool used: {last_tool}
-Last assistant message: {last_msg}
+Conversation summary: {summary}
 Previously detected entities (if any): {json.dumps(last_entities)}
 Use this context if the current query is ambiguous or a follow-up.
 """.strip()
@@ -96,22 +123,7 @@ Use this context if the current query is ambiguous or a follow-up.
                 - Be concise, factual, and avoid hallucinations.
             """.strip()
 
-            raw_output = self.llm_client.run_chat(system_prompt, contextual_query)
-            logger.info(f"Raw output from LLM:\n{raw_output}")
-
-            # 1) Try to extract an embedded JSON object from mixed prose.
-            try:
-                metadata_dict = self._extract_embedded_json(raw_output)
-            except Exception as ex:
-                logger.warning(f"[MetadataExtractor] Embedded JSON not found or invalid: {ex}. Falling back to safe_json_parse.")
-                # 2) Fallback to safe_json_parse (may return {"output_text": "..."}).
-                metadata_dict = safe_json_parse(raw_output)
-                # If fallback returned a non-JSON structure (e.g., {"output_text": "..."}), error out clearly.
-                if not isinstance(metadata_dict, dict) or "user_profile" not in metadata_dict:
-                    raise UdayamitraException(
-                        "Metadata extraction failed: could not parse a valid JSON object with required keys.",
-                        sys
-                    )
+            metadata_dict = self.llm_client.run_structured(system_prompt, contextual_query, self._parse_metadata)
 
             # --- Normalize entities.scheme: handle list -> string ---
             expanded_query = metadata_dict.get("expanded_query", "").strip()
@@ -126,11 +138,7 @@ Use this context if the current query is ambiguous or a follow-up.
                 entities["scheme"] = scheme_val[0]
             metadata_dict["entities"] = entities
 
-            logger.info(f"Metadata extracted:\n{json.dumps(metadata_dict, indent=2)}")
-
-            # --- Validate required keys early for clearer errors ---
-            if "user_profile" not in metadata_dict or "intents" not in metadata_dict or "entities" not in metadata_dict:
-                raise UdayamitraException("Metadata JSON missing required keys (intents/entities/user_profile).", sys)
+            log_payload("Metadata extracted", metadata_dict)
 
             # Normalize location
             raw_loc = (metadata_dict["user_profile"].get("location") or "").strip().lower()
@@ -1,6 +1,7 @@
 '''
 location_normalizer.py - Resolves raw location strings into structured administrative regions
-using the Nominatim (OpenStreetMap) API.
+using the Nominatim (OpenStreetMap) API. Requests go through the "nominatim" limiter of
+utility/Governor.py, which enforces the one-request-per-second usage policy process-wide.
 '''
 
 import requests
@@ -8,13 +9,12 @@ import sys
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from typing import Dict, Optional
-import time
+from utility.Governor import governor, GovernorRejected
 class LocationNormalizer:
     NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
-    def __init__(self, delay: float = 1.0):
+    def __init__(self):
         try:
             logger.info("Initializing LocationNormalizer")
-            self.delay = delay  # to respect Nominatim rate limits
             self.cache = {}     # simple in-memory cache
         except Exception as e:
             logger.error(f"Failed to initialize LocationNormalizer: {e}")
@@ -38,8 +38,13 @@ class LocationNormalizer:
                 "User-Agent": "Udyamitra/1.0",
                 "Accept-Language": "en" 
             }
-            response = requests.get(self.NOMINATIM_URL, params=params, headers=headers)
-            time.sleep(self.delay)  # avoid hammering the API
+            try:
+                with governor.limiter("nominatim").slot():
+                    response = requests.get(self.NOMINATIM_URL, params=params, headers=headers)
+            except GovernorRejected as e:
+                # Geocoding only enriches the metadata; answer without it rather than fail the request.
+                logger.warning(f"Skipping geocoding of '{raw_location}': {e}")
+                return {"raw": raw_location, "city": None, "state": None, "country": None}
             data = response.json()
 
             if not data:
@@ -3,6 +3,7 @@ intent_pipeline.py - Combines metadata extraction and tool mapping into a single
 '''
 
 import sys
+from typing import Optional
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from utility.model import Metadata, ConversationState
@@ -10,7 +11,7 @@ from .extractor import MetadataExtractor
 from .tool_mapper import ToolMapper
 
 class IntentPipeline:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
             logger.info(f"Initializing IntentPipeline")
             self.extractor = MetadataExtractor(model=model)
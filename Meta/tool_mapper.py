@@ -31,8 +31,8 @@ class ToolMapper:
             for tool_name, entry in self.tool_registry.items():
                 desc_emb, intent_emb = loop.run_until_complete(
                     asyncio.gather(
-                        self.embedding_model.embed_documents([entry.description]),
-                        self.embedding_model.embed_documents([" ".join(entry.intents)])
+                        self.embedding_model.aembed_documents([entry.description]),
+                        self.embedding_model.aembed_documents([" ".join(entry.intents)])
                     )
                 )
                 self.tool_embeddings[tool_name] = {
@@ -58,8 +58,8 @@ class ToolMapper:
             loop = asyncio.get_event_loop()
             query_emb, intents_emb = loop.run_until_complete(
                 asyncio.gather(
-                    self.embedding_model.embed_documents([metadata.query]),
-                    self.embedding_model.embed_documents([" ".join(metadata.intents)])
+                    self.embedding_model.aembed_documents([metadata.query]),
+                    self.embedding_model.aembed_documents([" ".join(metadata.intents)])
                 )
             )
             query_emb = np.array(query_emb[0])
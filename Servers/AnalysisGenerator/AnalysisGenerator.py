@@ -11,6 +11,7 @@ from collections import defaultdict
 
 from utility.LLM import LLMClient
 from utility.model import AnalysisGeneratorOutput
+from utility.ContextPacker import ContextPacker
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from Meta.location_normalizer import LocationNormalizer
@@ -38,10 +39,11 @@ class AnalysisGenerator:
     }
     """
 
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
             logger.info("Starting AnalysisGenerator...")
-            self.llm_client = LLMClient(model=model)
+            self.llm_client = LLMClient(model=model, route="trade_analysis")
+            self.intent_client = self.llm_client.with_route("analysis_intent")
             self.location_normalizer = LocationNormalizer()
 
             # --- ADDED: Connection to structured data collection ---
@@ -63,7 +65,6 @@ class AnalysisGenerator:
             raise UdayamitraException(e, sys)
 
     def _classify_query_intent(self, user_query: str) -> str:
-        # (This function remains unchanged)
         system_prompt = """
         You are a query analysis expert. Your task is to determine if a user's question requires a detailed table of data to be answered effectively, or if a simple, direct textual answer is sufficient.
 
@@ -88,12 +89,14 @@ class AnalysisGenerator:
 
         Now, classify the original query.
         """
-        try:
-            response = self.llm_client.run_json(system_prompt, user_prompt)
-            intent = response.get("intent", "table_required")
+        def validate(response: Dict) -> str:
+            intent = response.get("intent")
             if intent not in ["table_required", "direct_answer"]:
-                return "table_required"
+                raise ValueError(f"Unknown intent: {intent!r}")
             return intent
+
+        try:
+            return self.intent_client.run_json(system_prompt, user_prompt, validate=validate)
         except Exception:
             return "table_required"
 
@@ -215,8 +218,8 @@ class AnalysisGenerator:
     # --- ENTIRE FUNCTION REWRITTEN ---
     async def generate_structured_insight(self, user_query: str, user_profile: dict, entities: dict) -> dict:
         try:
-            # Step 1: Classify intent (this is fast, can be sync)
-            intent = self._classify_query_intent(user_query)
+            # Step 1: Classify intent (a blocking LLM call, kept off the event loop)
+            intent = await asyncio.to_thread(self._classify_query_intent, user_query)
             logger.info(f"User query classified with intent: '{intent}'")
 
             # Step 2: Fetch data in parallel
@@ -226,8 +229,8 @@ class AnalysisGenerator:
                 self._fetch_structured_data(entities=entities)
             )
             
-            # Combine vector doc content for the LLM prompt
-            vector_context = "\n\n".join([doc.get("content", "") for doc in vector_docs])
+            # Pack vector doc content for the LLM prompt within the model's token budget
+            vector_context = ContextPacker(model=self.llm_client.model).pack(vector_docs).text
             source_names = list(set([doc.get("metadata", {}).get("source", "exp_scheme_chunks") for doc in vector_docs]))
             if structured_records and self.structured_collection_name not in source_names:
                 source_names.append(self.structured_collection_name)
@@ -251,7 +254,7 @@ class AnalysisGenerator:
             markdown_table = ""
             if intent == "table_required":
                 top_destinations = analysis_results.get("top_destination_ports_by_shipments", [])
-                data_table = self._build_data_table(top_destinations)
+                data_table = await asyncio.to_thread(self._build_data_table, top_destinations)
                 markdown_table = self._to_markdown_table(data_table)
 
             # Step 5: Generate LLM Prompts
@@ -329,7 +332,7 @@ class AnalysisGenerator:
             # Step 6: Call LLM
             textual_response = None
             try:
-                textual_response = self.llm_client.run_json(system_prompt, user_prompt)
+                textual_response = await asyncio.to_thread(self.llm_client.run_json, system_prompt, user_prompt)
             except Exception as llm_error:
                 logger.warning(f"LLM failed: {llm_error}")
                 textual_response = None
@@ -5,7 +5,8 @@ from mcp.server.fastmcp import FastMCP
 from dotenv import load_dotenv
 from typing import Optional
 from .AnalysisGenerator import AnalysisGenerator
-from Logging.logger import logger
+from Servers.resources import tool_resources
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 from utility.model import UserProfile
 from utility.register_tools import generate_tool_registry_entry, register_tool
@@ -13,6 +14,7 @@ from utility.register_tools import generate_tool_registry_entry, register_tool
 load_dotenv()
 
 mcp = FastMCP("AnalysisGenerator", stateless_http=True)
+tool_resources.register("AnalysisGenerator", AnalysisGenerator)
 
 @mcp.tool()
 async def generate_analysis(schema_dict: dict) -> dict:
@@ -21,9 +23,9 @@ async def generate_analysis(schema_dict: dict) -> dict:
     and returns an analytical insight.
     """
     try:
-        logger.info(f"[AnalysisGenerator] Received request: {schema_dict}")
+        log_payload("[AnalysisGenerator] Received request", schema_dict)
         
-        analysis_generator = AnalysisGenerator()
+        analysis_generator = await tool_resources.get("AnalysisGenerator")
 
         user_query = schema_dict.get("user_query", "Provide a general analysis of the export data.")
         user_profile_data = schema_dict.get("user_profile", {})
@@ -33,10 +33,10 @@ class Analyzer:
     }
     """
 
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
             logger.info("Starting Analyzer...")
-            self.llm_client = LLMClient(model=model)
+            self.llm_client = LLMClient(model=model, route="analysis")
             logger.info("Analyzer initialized successfully.") 
 
         except Exception as e:
@@ -102,7 +102,7 @@ class Analyzer:
             
             textual_response = None
             try:
-                textual_response = self.llm_client.run_json(system_prompt, user_prompt)
+                textual_response = await asyncio.to_thread(self.llm_client.run_json, system_prompt, user_prompt)
             except Exception as llm_error:
                 logger.warning(f"LLM failed: {llm_error}")
                 textual_response = None 
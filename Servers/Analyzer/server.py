@@ -2,25 +2,28 @@ import sys
 import os
 from mcp.server.fastmcp import FastMCP
 from .Analyzer import Analyzer 
-from Logging.logger import logger
+from Servers.resources import tool_resources
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 from utility.register_tools import generate_tool_registry_entry, register_tool
 from fastmcp import Client
 from typing import List, Optional
 from dotenv import load_dotenv
 from utility.model import UserProfile
+from utility.ContextPacker import ContextPacker
 
 load_dotenv()
 
 mcp = FastMCP("Analyzer", stateless_http=True) 
+tool_resources.register("Analyzer", Analyzer)
 RETRIEVER_URL = "http://127.0.0.1:10000/retrieve-data/mcp"
 RETRIEVER_TOOL_NAME = "retrieve_documents"
 
 @mcp.tool()
 async def generate_analysis(schema_dict: dict, documents: Optional[str] = None) -> dict: 
     try:
-        logger.info(f"[Analyzer] Received request: {schema_dict}")  
-        analysis_generator = Analyzer() 
+        log_payload("[Analyzer] Received request", schema_dict)  
+        analysis_generator = await tool_resources.get("Analyzer")
         user_profile_obj = UserProfile(**schema_dict.get("user_profile", {}))
 
         query_text = schema_dict.get("user_query", "")
@@ -44,14 +47,14 @@ async def generate_analysis(schema_dict: dict, documents: Optional[str] = None)
         logger.info(f"[Analyzer] Retrieved {len(docs_from_retriever)} documents.")  # Changed
 
         doc_dicts = [vars(d) for d in docs_from_retriever]
-        combined_content = "\n\n".join(doc.get("content", "") for doc in doc_dicts)
-        logger.info(f"[Analyzer] Combined content length: {len(combined_content)}")  # Changed
+        packed = ContextPacker(model=analysis_generator.llm_client.model).pack(doc_dicts)
+        logger.info(f"[Analyzer] Packed context: {packed.token_count} tokens from {packed.input_chunks} chunks")
 
         # Call the core logic with the reshaped data
         result = await analysis_generator.generate_analysis(  # Changed method name
             user_query=query_text,
             user_profile=user_profile_obj.model_dump(), 
-            retrieved_documents=combined_content or None
+            retrieved_documents=packed.text or None
         )
         
         return result
@@ -12,12 +12,12 @@ from typing import Optional
 
 
 class EligibilityChecker:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
             logger.info("Starting EligibilityChecker...")
-            logger.info(f"Initializing EligibilityChecker with model: {model}")
-            self.llm_client = LLMClient(model=model)
-            self.question_generator = QuestionGenerator(model=model)
+            self.llm_client = LLMClient(model=model, route="eligibility_check")
+            logger.info(f"Initializing EligibilityChecker with model: {self.llm_client.model}")
+            self.question_generator = QuestionGenerator(llm_client=self.llm_client)
         except Exception as e:
             logger.error(f"Failed to initialize EligibilityChecker: {e}")
             raise UdayamitraException("Failed to initialize EligibilityChecker", sys)
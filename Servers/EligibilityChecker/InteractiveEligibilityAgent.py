@@ -1,11 +1,10 @@
 from utility.model import EligibilityCheckRequest
 from .EligibilityChecker import EligibilityChecker
-from .QuestionGenerator import QuestionGenerator
 
 class InteractiveEligibilityAgent:
     def __init__(self, checker=None):
         self.checker = checker or EligibilityChecker()
-        self.question_generator = QuestionGenerator()
+        self.question_generator = self.checker.question_generator
 
         # Internal state
         self.collected_fields = {}
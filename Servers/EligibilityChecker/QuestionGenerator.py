@@ -1,8 +1,13 @@
+from typing import Optional
 from utility.LLM import LLMClient
 
 class QuestionGenerator:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
-        self.llm = LLMClient(model=model)
+    def __init__(self, model: Optional[str] = None, llm_client: LLMClient = None):
+        # Reuse the caller's connection when given so the checker doesn't hold two Groq clients.
+        if llm_client is not None and model is None:
+            self.llm = llm_client.with_route("question_generation")
+        else:
+            self.llm = LLMClient(model=model, route="question_generation")
 
     def generate_questions(self, missing_fields: list[str], scheme_name: str = None) -> list[str]:
         prompt = f"""
@@ -21,6 +26,12 @@ class QuestionGenerator:
             ]
         }}
         """
-        response = self.llm.run_json("Generate follow-up questions.", prompt)
-        return response["questions"]
+        return self.llm.run_json("Generate follow-up questions.", prompt, validate=self._questions)
+
+    @staticmethod
+    def _questions(response: dict) -> list[str]:
+        questions = response.get("questions")
+        if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+            raise ValueError("Expected a JSON object with a 'questions' list of strings.")
+        return questions
 
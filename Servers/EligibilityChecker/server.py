@@ -1,10 +1,13 @@
 import sys
+import asyncio
 from mcp.server.fastmcp import FastMCP
 from .EligibilityChecker import EligibilityChecker
+from Servers.resources import tool_resources
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from utility.register_tools import generate_tool_registry_entry, register_tool
 from utility.model import EligibilityCheckRequest
+from utility.ContextPacker import ContextPacker
 from fastmcp import Client
 from typing import Optional
 from dotenv import load_dotenv
@@ -12,6 +15,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 mcp = FastMCP("EligibilityChecker", stateless_http=True)
+tool_resources.register("EligibilityChecker", EligibilityChecker)
 
 RETRIEVER_URL = "http://127.0.0.1:10000/retrieve-scheme/mcp"
 RETRIEVER_TOOL_NAME = "retrieve_documents"
@@ -20,28 +24,36 @@ RETRIEVER_TOOL_NAME = "retrieve_documents"
 async def check_eligibility(schema_dict: dict) -> dict:
     try:
         logger.info(f"[EligibilityChecker] Received eligibility check request: {schema_dict}")
-        checker = EligibilityChecker()
+        checker = await tool_resources.get("EligibilityChecker")
         request_obj = EligibilityCheckRequest(**schema_dict)
 
-        query = request_obj.scheme_name.strip() or request_obj.model_dump_json()
+        scheme_name = request_obj.scheme_name.strip()
+        query = scheme_name or request_obj.model_dump_json()
         logger.debug(f"[EligibilityChecker] Querying retriever with: '{query}'")
 
-        # Retrieve documents
+        # Prefer the chunks of the scheme under discussion. Extracted names do not always match the
+        # stored ones, and a filter that matches nothing returns no documents: search again without it.
+        retriever_args = {"query": query, "caller_tool": mcp.name, "top_k": 5}
         async with Client(RETRIEVER_URL) as retriever_client:
-            response = await retriever_client.call_tool(
-                RETRIEVER_TOOL_NAME,
-                {"query": query, "caller_tool": mcp.name, "top_k": 5}
-            )
+            response = None
+            if scheme_name:
+                response = await retriever_client.call_tool(
+                    RETRIEVER_TOOL_NAME, {**retriever_args, "filters": {"scheme_name": scheme_name}})
+            if response is None or not response.data.result:
+                response = await retriever_client.call_tool(RETRIEVER_TOOL_NAME, retriever_args)
 
         logger.debug(f"[EligibilityChecker] Retriever response: {response}")
         docs = response.data.result or []
         doc_dicts = [vars(d) for d in docs]
-        combined_content = "\n\n".join(doc.get("content", "") for doc in doc_dicts)
+        packed = ContextPacker(model=checker.llm_client.model).pack(doc_dicts)
 
-        logger.info(f"[EligibilityChecker] Combined content length: {len(combined_content)}")
+        logger.info(f"[EligibilityChecker] Packed context: {packed.token_count} tokens from {packed.input_chunks} chunks")
 
         # Run checker
-        result = checker.check_eligibility(request=request_obj, retrieved_documents=combined_content or None)
+        result = await asyncio.to_thread(checker.check_eligibility, request=request_obj, retrieved_documents=packed.text or None)
+        eligibility = result.get("eligibility", {})
+        if not eligibility.get("sources"):
+            eligibility["sources"] = packed.sources
 
         # Return structured dict directly
         return result
@@ -58,8 +70,9 @@ async def interactive_check_eligibility(schema_dict: dict) -> dict:
         logger.info(f"[InteractiveEligibilityAgent] Starting interactive loop")
         request_obj = EligibilityCheckRequest(**schema_dict)
 
-        agent = InteractiveEligibilityAgent()
-        final_response = agent.rerun(prev_request=request_obj, prev_response=agent.checker.check_eligibility(request_obj))
+        agent = InteractiveEligibilityAgent(checker=await tool_resources.get("EligibilityChecker"))
+        final_response = await asyncio.to_thread(
+            lambda: agent.rerun(prev_request=request_obj, prev_response=agent.checker.check_eligibility(request_obj)))
 
         return {
     "output_text": final_response["explanation"] if isinstance(final_response, dict) and "explanation" in final_response else str(final_response),
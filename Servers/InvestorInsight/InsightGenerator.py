@@ -1,25 +1,21 @@
 """
 InsightGenerator.py - MCP server for generating personalized investor insights.
-Uses external embedding and reranker APIs to avoid loading heavy models locally.
+Retrieved documents are reranked by the retriever (see utility/Reranker.py) before they reach this class.
 """
 
 import sys
 import json
 import asyncio
-import httpx
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from utility.LLM import LLMClient
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from utility.model import InsightGeneratorInput, InsightGeneratorOutput, RetrievedDoc
 import nest_asyncio
 nest_asyncio.apply()
 
 
-# URL for your deployed reranker API
-RERANKER_API_URL = "https://adityapeopleplus-embedding-generator.hf.space/rerank"
-
 class InsightGenerator:
     JSON_FORMAT_INSTRUCTIONS = """
     {
@@ -45,39 +41,16 @@ class InsightGenerator:
     }
     """
 
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
             logger.info("Starting InsightGenerator...")
-            logger.info(f"Initializing InsightGenerator with model: {model}")
-            self.llm_client = LLMClient(model=model)
+            self.llm_client = LLMClient(model=model, route="investor_insight")
+            logger.info(f"Initializing InsightGenerator with model: {self.llm_client.model}")
             logger.info("InsightGenerator initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize InsightGenerator: {e}")
             raise UdayamitraException("Failed to initialize InsightGenerator", sys)
 
-    async def _rerank_documents(self, query: str, documents: List[Dict]) -> List[Dict]:
-        """Rerank documents using external reranker API."""
-        if not documents:
-            return []
-
-        # Prepare payload for API
-        payload = {
-            "query": query,
-            "documents": [{"content": doc.get("content", ""), **doc} for doc in documents]
-        }
-
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                resp = await client.post(RERANKER_API_URL, json=payload)
-                resp.raise_for_status()
-                ranked_docs = resp.json().get("documents", [])
-
-            return sorted(ranked_docs, key=lambda x: x.get("rerank_score", 0.0), reverse=True)
-        except Exception as e:
-            logger.error(f"Reranker API call failed: {e}", exc_info=True)
-            # fallback: return original order
-            return documents
-
     async def generate_insight(self, user_query: str, user_profile: dict, retrieved_documents: str = None) -> dict:
         try:
             system_prompt = """
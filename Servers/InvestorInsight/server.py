@@ -1,25 +1,28 @@
 import sys
 from mcp.server.fastmcp import FastMCP
 from .InsightGenerator import InsightGenerator
-from Logging.logger import logger
+from Servers.resources import tool_resources
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 from utility.register_tools import generate_tool_registry_entry, register_tool
 from fastmcp import Client
 from typing import List, Optional
 from dotenv import load_dotenv
 from utility.model import UserProfile, RetrievedDoc, InsightGeneratorInput, InsightGeneratorOutput
+from utility.ContextPacker import ContextPacker
 
 load_dotenv()
 
 mcp = FastMCP("InsightGenerator", stateless_http=True)
+tool_resources.register("InsightGenerator", InsightGenerator)
 RETRIEVER_URL = "http://127.0.0.1:10000/retrieve-scheme/mcp"
 RETRIEVER_TOOL_NAME = "retrieve_documents"
 
 @mcp.tool()
 async def generate_insight(schema_dict: dict, documents: Optional[str] = None) -> dict:
     try:
-        logger.info(f"[InsightGenerator] Received request: {schema_dict}")
-        insight_generator = InsightGenerator()
+        log_payload("[InsightGenerator] Received request", schema_dict)
+        insight_generator = await tool_resources.get("InsightGenerator")
 
         # Reshape the input dictionary into the required Pydantic model for the user profile
         user_profile_obj = UserProfile(**schema_dict.get("user_profile", {}))
@@ -33,7 +36,8 @@ async def generate_insight(schema_dict: dict, documents: Optional[str] = None) -
                 {
                     "query": query_text,
                     "caller_tool": mcp.name,
-                    "top_k": 5
+                    "top_k": 5,
+                    "rerank": True
                 }
             )
 
@@ -46,16 +50,18 @@ async def generate_insight(schema_dict: dict, documents: Optional[str] = None) -
         logger.info(f"[InsightGenerator] Retrieved {len(docs_from_retriever)} documents.")
 
         doc_dicts = [vars(d) for d in docs_from_retriever]
-        combined_content = "\n\n".join(doc.get("content", "") for doc in doc_dicts)
-        logger.info(f"[InsightGenerator] Combined content length: {len(combined_content)}")
+        packed = ContextPacker(model=insight_generator.llm_client.model).pack(doc_dicts)
+        logger.info(f"[InsightGenerator] Packed context: {packed.token_count} tokens from {packed.input_chunks} chunks")
         # --- End of reference logic ---
 
         # Call the core logic with the reshaped data, matching the reference pattern
-        result = insight_generator.generate_insight(
+        result = await insight_generator.generate_insight(
             user_query=query_text,
             user_profile=user_profile_obj.model_dump(), # Pass as dict, like in SchemeExplainer
-            retrieved_documents=combined_content or None
+            retrieved_documents=packed.text or None
         )
+        if not result.get("sources"):
+            result["sources"] = packed.sources
         
         return result
 
@@ -1,13 +1,20 @@
 import os
 import sys
+import json
+import asyncio
+from typing import Optional
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from langchain_astradb import AstraDBVectorStore
 from utility.register_tools import generate_tool_registry_entry, register_tool
-from utility.model import RetrievedDoc, RetrieverOutput
+from utility.model import RetrievedDoc, RetrieverOutput, RetrievalFilter
+from utility.MetadataFilter import search_with_filters
+from utility.SingleFlight import SingleFlight, flight_key
 from utility.Embedder import RemoteHFEmbeddings
+from utility.Reranker import get_reranker, RERANK_OVERFETCH
+from Servers.resources import tool_resources
 load_dotenv()
 ASTRA_DB_ENDPOINT = os.getenv("ASTRA_DB_ENDPOINT")
 ASTRA_DB_TOKEN    = os.getenv("ASTRA_DB_TOKEN")
@@ -56,11 +63,19 @@ COLLECTION_MAP = {
     "AnalysisGenerator": "Export_Chunks"
 }
 
+# Loading the cross-encoder is slow, so it is built during the host's warm-up.
+tool_resources.register("Reranker", get_reranker)
+
+retrieval_flight = SingleFlight("retriever")
+
 mcp = FastMCP("SchemeDB", stateless_http=True)
 
 @mcp.tool()
-async def retrieve_documents(query: str, caller_tool: str, top_k: int = 5) -> RetrieverOutput:
-    logger.info(f"[Retriever] Query received from '{caller_tool}' → query: '{query}' | top_k: {top_k}")
+async def retrieve_documents(query: str, caller_tool: str, top_k: int = 5, rerank: bool = False, filters: Optional[dict] = None) -> RetrieverOutput:
+    """
+    filters (optional): scheme_name, source_file, chunk_index_min, chunk_index_max, location.
+    """
+    logger.info(f"[Retriever] Query received from '{caller_tool}' → query: '{query}' | top_k: {top_k} | rerank: {rerank} | filters: {filters}")
     
     collection_name = COLLECTION_MAP.get(caller_tool)
     logger.info(f"[Retriever] Collection mapped for '{caller_tool}': {collection_name}")
@@ -73,21 +88,33 @@ async def retrieve_documents(query: str, caller_tool: str, top_k: int = 5) -> Re
         raise UdayamitraException(f"Server error: No vector store configured for collection '{collection_name}'", sys)
 
     try:
-        docs = store.similarity_search(query=query, k=top_k)
-        logger.info(f"[Retriever] Found {len(docs)} matching docs from '{collection_name}'.")
-        for i, doc in enumerate(docs):
-            logger.debug(f"[Retriever] Doc {i+1}: {doc.page_content[:120]!r} | Metadata: {doc.metadata}")
-        
-        logger.info(f"[Retriever] Successfully retrieved {len(docs)} documents for query: '{query}'")
-            
-        return RetrieverOutput(result=[
-            RetrievedDoc(content=d.page_content, metadata=d.metadata) for d in docs
-        ])
+        # Identical concurrent searches (a popular question asked by many users) share one run.
+        key = flight_key(collection_name, query, top_k, rerank, json.dumps(filters, sort_keys=True, default=str))
+        results = await retrieval_flight.do(key, lambda: _retrieve(store, collection_name, query, top_k, rerank, filters))
+
+        logger.info(f"[Retriever] Successfully retrieved {len(results)} documents for query: '{query}'")
+
+        return RetrieverOutput(result=[RetrievedDoc(**d) for d in results])
     
     except Exception as e:
         logger.error(f"[Retriever] Error fetching docs: {e}", exc_info=True)
         raise UdayamitraException("Failed to retrieve documents", sys)
 
+async def _retrieve(store, collection_name: str, query: str, top_k: int, rerank: bool, filters: Optional[dict]) -> list:
+    # Over-retrieve when reranking so the cross-encoder has candidates to promote.
+    fetch_k = top_k * RERANK_OVERFETCH if rerank else top_k
+    retrieval_filter = RetrievalFilter(**filters) if filters else None
+    docs = await asyncio.to_thread(search_with_filters, store, query, fetch_k, retrieval_filter)
+    logger.info(f"[Retriever] Found {len(docs)} matching docs from '{collection_name}'.")
+    for i, doc in enumerate(docs):
+        logger.debug(f"[Retriever] Doc {i+1}: {doc.page_content[:120]!r} | Metadata: {doc.metadata}")
+
+    results = [{"content": d.page_content, "metadata": d.metadata} for d in docs]
+    if rerank:
+        reranker = await tool_resources.get("Reranker")
+        results = await reranker.rerank(query, results, top_k=top_k)
+    return results
+
 if __name__ == "__main__":
     tool_info = generate_tool_registry_entry()
     register_tool(tool_info)
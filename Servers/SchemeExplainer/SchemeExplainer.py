@@ -3,17 +3,18 @@ SchemeExplainer.py - This is the source code for the MCP server that will be spe
 '''
 
 import sys
+from typing import Optional
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from utility.LLM import LLMClient
 from utility.model import SchemeMetadata, SchemeExplanationResponse
 
 class SchemeExplainer:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
             logger.info("Starting SchemeExplainer...")
-            logger.info(f"Initializing SchemeExplainer with model: {model}")
-            self.llm_client = LLMClient(model=model)
+            self.llm_client = LLMClient(model=model, route="scheme_explanation")
+            logger.info(f"Initializing SchemeExplainer with model: {self.llm_client.model}")
         except Exception as e:
             logger.error(f"Failed to initialize SchemeExplainer: {e}")
             raise UdayamitraException("Failed to initialize SchemeExplainer", sys)
@@ -1,10 +1,13 @@
 import sys
+import asyncio
 from mcp.server.fastmcp import FastMCP
 from .SchemeExplainer import SchemeExplainer
-from Logging.logger import logger
+from Servers.resources import tool_resources
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 from utility.register_tools import generate_tool_registry_entry, register_tool
 from utility.model import SchemeMetadata
+from utility.ContextPacker import ContextPacker
 from fastmcp import Client
 from typing import Optional
 from dotenv import load_dotenv
@@ -12,6 +15,7 @@ from dotenv import load_dotenv
 load_dotenv()
 
 mcp = FastMCP("SchemeExplainer", stateless_http=True)
+tool_resources.register("SchemeExplainer", SchemeExplainer)
 
 RETRIEVER_URL = "http://127.0.0.1:10000/retrieve-scheme/mcp"
 RETRIEVER_TOOL_NAME = "retrieve_documents"
@@ -19,8 +23,8 @@ RETRIEVER_TOOL_NAME = "retrieve_documents"
 @mcp.tool()
 async def explain_scheme(schema_dict: dict, documents: Optional[str] = None) -> dict:
     try:
-        logger.info(f"Received request to explain scheme: {schema_dict}")
-        scheme_explainer = SchemeExplainer()
+        log_payload("Received request to explain scheme", schema_dict)
+        scheme_explainer = await tool_resources.get("SchemeExplainer")
 
         reshaped_metadata = {
             "scheme_name": schema_dict.get("entities", {}).get("scheme_name", ""),
@@ -31,19 +35,21 @@ async def explain_scheme(schema_dict: dict, documents: Optional[str] = None) ->
         }
         metadata_obj = SchemeMetadata(**reshaped_metadata)
 
-        query = reshaped_metadata["scheme_name"].strip() or metadata_obj.model_dump()
-        logger.info(f"[Explainer] Querying retriever with: '{query}', with type: {type(query)}")
+        scheme_name = reshaped_metadata["scheme_name"].strip()
+        query = scheme_name or metadata_obj.query or ""
+        logger.info(f"[Explainer] Querying retriever with: '{query}'")
         logger.debug(f"[Explainer] Calling retriever with query: '{query}' | Collection: 'chunks'")
 
+        # Prefer the chunks of the scheme under discussion. Extracted names do not always match the
+        # stored ones, and a filter that matches nothing returns no documents: search again without it.
+        retriever_args = {"query": query, "caller_tool": mcp.name, "top_k": 5}
         async with Client(RETRIEVER_URL) as retriever_client:
-            response = await retriever_client.call_tool(
-                RETRIEVER_TOOL_NAME,
-                {
-                    "query": query["query"],
-                    "caller_tool": mcp.name,  
-                    "top_k": 5
-                }
-            )
+            response = None
+            if scheme_name:
+                response = await retriever_client.call_tool(
+                    RETRIEVER_TOOL_NAME, {**retriever_args, "filters": {"scheme_name": scheme_name}})
+            if response is None or not response.data.result:
+                response = await retriever_client.call_tool(RETRIEVER_TOOL_NAME, retriever_args)
 
         logger.debug(f"[Explainer] Raw retriever response: {response}")
         logger.warning(f"[Explainer] response.data → {response.data} (type={type(response.data)})")
@@ -59,13 +65,16 @@ async def explain_scheme(schema_dict: dict, documents: Optional[str] = None) ->
         logger.info(f"[Explainer] Retrieved {len(docs)} documents from 'Scheme_chunks'.")
 
         doc_dicts = [vars(d) for d in docs]
-        combined_content = "\n\n".join(doc.get("content", "") for doc in doc_dicts)
-        logger.info(f"[Explainer] Combined content length: {len(combined_content)}")
+        packed = ContextPacker(model=scheme_explainer.llm_client.model).pack(doc_dicts)
+        logger.info(f"[Explainer] Packed context: {packed.token_count} tokens from {packed.input_chunks} chunks")
 
-        result = scheme_explainer.explain_scheme(
+        result = await asyncio.to_thread(
+            scheme_explainer.explain_scheme,
             scheme_metadata=metadata_obj,
-            retrieved_documents=combined_content or None
+            retrieved_documents=packed.text or None
         )
+        if not result.sources:
+            result.sources = packed.sources
         return result
 
     except Exception as e:
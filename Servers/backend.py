@@ -1,12 +1,20 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from datetime import datetime
+from typing import Optional
 import json
 import sys 
 from .pipeline import Pipeline
-from utility.model import ConversationState, Message
-from utility.StateManager import StateManager
+from .jobs import Job, JobQueueFull, job_manager
+from utility.ConversationStore import Conversation, conversation_store, parse_etag
+from utility.ConversationSummary import conversation_summarizer
+from utility.Governor import GovernorRejected
+from utility.SemanticCache import semantic_cache
+from utility.RequestTrace import debug_traces
+from utility.Tracing import TraceMiddleware
+from utility.Metrics import MetricsMiddleware, registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
 from Logging.logger import logger 
 from Exception.exception import UdayamitraException 
 
@@ -22,13 +30,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id", "ETag"],
 )
+app.add_middleware(MetricsMiddleware, service="backend")
+app.add_middleware(TraceMiddleware, service="backend")
+
+metrics_registry.callback(
+    "semantic_cache_lookups_total", "Semantic cache lookups by result.", "counter",
+    lambda: {("hit",): semantic_cache.hits, ("miss",): semantic_cache.misses}, ("result",))
+metrics_registry.callback(
+    "semantic_cache_hit_ratio", "Share of semantic cache lookups served from cache.", "gauge",
+    lambda: {(): semantic_cache.stats()["hit_ratio"]})
+metrics_registry.callback(
+    "semantic_cache_entries", "Answers currently held by the semantic cache.", "gauge",
+    lambda: {(): semantic_cache.stats()["entries"]})
+metrics_registry.callback(
+    "pipeline_jobs", "Background pipeline jobs by status (finished ones while retained).", "gauge",
+    lambda: {(status,): count for status, count in job_manager.stats().items()}, ("status",))
+metrics_registry.callback(
+    "conversations_stored", "Conversations whose state is held server-side.", "gauge",
+    lambda: {(): len(conversation_store)})
 
 ERROR_MESSAGE = "I'm sorry, I'm not able to help with that request. Please try a different query."
 
-# Global conversation state
-conversation_state = ConversationState()
-state_manager = StateManager(initial_state=conversation_state)
+# Conversation state lives server-side (utility/ConversationStore.py); responses carry a compact,
+# versioned view of it, and only the sections that changed when the client sends its version.
 
 # Request schemas
 class StartRequest(BaseModel):
@@ -36,6 +62,18 @@ class StartRequest(BaseModel):
 
 class ContinueRequest(BaseModel):
     user_query: str
+    conversation_id: Optional[str] = None # required: the id returned by /start or /jobs (400 when missing)
+    state_version: Optional[int] = None # state version the client holds; enables delta responses
+
+class JobRequest(BaseModel):
+    user_query: str
+    conversation_id: Optional[str] = None # continues this conversation; a new one is started when omitted
+    state_version: Optional[int] = None
+
+# A dependency (Groq, embeddings) is saturated: tell the client when to come back.
+@app.exception_handler(GovernorRejected)
+async def governor_rejected_handler(request, exc: GovernorRejected):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": str(exc.retry_after)})
 
 @app.get("/")
 async def root():
@@ -43,82 +81,111 @@ async def root():
 
 # POST /start (starts a new conversation)
 @app.post("/start")
-async def start_pipeline(request: StartRequest):
-    global conversation_state, state_manager
+async def start_pipeline(request: StartRequest, response: Response):
+    conversation = conversation_store.create()
+    turn = await _run_turn(conversation, request.user_query)
+    return {**turn, "state": _state_view(conversation, response)}
 
-    # Reset full state
-    conversation_state = ConversationState()
-    state_manager = StateManager(initial_state=conversation_state)
-    state_manager.add_message(role="user", content=request.user_query)
+# POST /continue (adds a follow-up turn)
+@app.post("/continue")
+async def continue_pipeline(request: ContinueRequest, response: Response):
+    conversation = _require_conversation(request.conversation_id)
+    turn = await _run_turn(conversation, request.user_query)
+    return {**turn, "state": _state_view(conversation, response, request.state_version)}
 
-    try:
-        pipeline = Pipeline(request.user_query, state=state_manager.get_state())
-        output = await pipeline.run()
-        
-        # This handles the "no tools found" case where the pipeline
-        # runs but doesn't produce any tool results (empty dictionary)
-        if not output or "results" not in output or not output["results"]:
-             logger.warning(f"Pipeline ran but returned no results (no tools found) for query: {request.user_query}")
-             # We raise an exception to be caught by the 'except' block
-             raise UdayamitraException("No tools were found or no plan could be executed for this query.", sys)
-
-        assistant_response = _extract_response_from_results(output)
-        stage = pipeline.stage.name
-        results = output["results"]
-
-    except Exception as e:
-        # This catches any failure in the pipeline (crash, no tools, etc.)
-        logger.error(f"Pipeline failed for query '{request.user_query}': {e}", exc_info=True)
-        assistant_response = ERROR_MESSAGE
-        stage = "FAILED"
-        results = None
-        # The server doesn't crash; it just returns this error message
-    
-    state_manager.add_message(role="assistant", content=assistant_response)
+# POST /jobs (runs a turn in the background; poll /status/{job_id} or follow /status/{job_id}/events)
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    conversation = conversation_store.create() if request.conversation_id is None \
+        else _require_conversation(request.conversation_id)
+
+    async def run(job: Job) -> dict:
+        turn = await _run_turn(conversation, request.user_query, on_stage=job.set_stage)
+        return {**turn, "state": conversation.view(request.state_version)}
 
+    try:
+        job = job_manager.submit(run, conversation_id=conversation.conversation_id)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     return {
-        "message": assistant_response,
-        "stage": stage,
-        "results": results,
-        "state": state_manager.get_state().model_dump()
+        "job_id": job.job_id,
+        "conversation_id": conversation.conversation_id,
+        "status_url": f"/status/{job.job_id}",
+        "events_url": f"/status/{job.job_id}/events",
     }
 
-# POST /continue (adds a follow-up turn)
-@app.post("/continue")
-async def continue_pipeline(request: ContinueRequest):
-    global conversation_state, state_manager
+def _require_conversation(conversation_id: Optional[str]) -> Conversation:
+    """The conversation with this id. Never falls back to another one: each holds a user's profile and history."""
+    if not conversation_id:
+        raise HTTPException(status_code=400, detail="conversation_id is required.")
+    conversation = conversation_store.get(conversation_id)
+    if conversation is None:
+        # Expired, evicted or from before a restart; the client starts a new conversation.
+        raise HTTPException(status_code=404, detail=f"Conversation '{conversation_id}' not found.")
+    return conversation
 
-    state_manager.add_message(role="user", content=request.user_query)
+async def _run_turn(conversation: Conversation, user_query: str, on_stage=None) -> dict:
+    """Runs the pipeline for one user turn and records both sides of it in the conversation."""
+    async with conversation.turn_lock: # one turn at a time per conversation
+        state_manager = conversation.state_manager
+        messages_before = list(state_manager.get_state().messages)
+        state_manager.add_message(role="user", content=user_query)
 
-    try:
-        pipeline = Pipeline(request.user_query, state=state_manager.get_state())
-        output = await pipeline.run()
-
-        # This handles the "no tools found" case
-        if not output or "results" not in output or not output["results"]:
-             logger.warning(f"Pipeline ran but returned no results (no tools found) for query: {request.user_query}")
-             raise UdayamitraException("No tools were found or no plan could be executed for this query.", sys)
-
-        assistant_response = _extract_response_from_results(output)
-        stage = pipeline.stage.name
-        results = output["results"]
-
-    except Exception as e:
-        # This catches any failure in the pipeline
-        logger.error(f"Pipeline failed for query '{request.user_query}': {e}", exc_info=True)
-        assistant_response = ERROR_MESSAGE
-        stage = "FAILED"
-        results = None
-    
-    state_manager.add_message(role="assistant", content=assistant_response)
+        request_id = None
+        try:
+            pipeline = Pipeline(user_query, state=state_manager.get_state(), on_stage=on_stage)
+            output = await pipeline.run()
+            request_id = pipeline.request_id
+            if pipeline.rejected is not None:
+                # Turned away by admission control: forget the turn so the client can retry it.
+                state_manager.get_state().messages = messages_before
+                raise pipeline.rejected
+
+            # This handles the "no tools found" case where the pipeline
+            # runs but doesn't produce any tool results (empty dictionary)
+            if not output or "results" not in output or not output["results"]:
+                 logger.warning(f"Pipeline ran but returned no results (no tools found) for query: {user_query}")
+                 # We raise an exception to be caught by the 'except' block
+                 raise UdayamitraException("No tools were found or no plan could be executed for this query.", sys)
+
+            assistant_response = _extract_response_from_results(output)
+            stage = pipeline.stage.name
+            results = output["results"]
+
+        except GovernorRejected:
+            raise
+        except Exception as e:
+            # This catches any failure in the pipeline (crash, no tools, etc.)
+            logger.error(f"Pipeline failed for query '{user_query}': {e}", exc_info=True)
+            assistant_response = ERROR_MESSAGE
+            stage = "FAILED"
+            results = None
+            # The server doesn't crash; it just returns this error message
+
+        state_manager.add_message(role="assistant", content=assistant_response)
+        conversation_summarizer.schedule(state_manager.get_state())
 
     return {
         "message": assistant_response,
         "stage": stage,
         "results": results,
-        "state": state_manager.get_state().model_dump()
+        "conversation_id": conversation.conversation_id,
+        "request_id": request_id
     }
 
+def _state_view(conversation: Conversation, response: Response, since: Optional[int] = None) -> dict:
+    view = conversation.view(since)
+    response.headers["ETag"] = view["etag"]
+    return view
+
+def _resolve_conversation(conversation_id: Optional[str], since: Optional[int], if_none_match: Optional[str]):
+    """The conversation and client version named by the query parameters or the If-None-Match header."""
+    etag_id, etag_version = parse_etag(if_none_match)
+    conversation_id = conversation_id or etag_id
+    if since is None and etag_id == conversation_id:
+        since = etag_version
+    return _require_conversation(conversation_id), since
+
 # Helper function to extract assistant response from tool results
 def _extract_response_from_results(output: dict) -> str:
     # This check is now redundant because of our new error handling,
@@ -145,8 +212,10 @@ def _extract_response_from_results(output: dict) -> str:
 
 # GET /status
 @app.get("/status")
-async def get_status():
-    state = state_manager.get_state()
+async def get_status(response: Response, conversation_id: Optional[str] = None, since: Optional[int] = None,
+                     if_none_match: Optional[str] = Header(default=None)):
+    conversation, since = _resolve_conversation(conversation_id, since, if_none_match)
+    state = conversation.state_manager.get_state()
     last_tool = state.last_tool_used
 
     results = {}
@@ -179,5 +248,72 @@ async def get_status():
         "message": "Active pipeline status",
         "stage": stage, 
         "results": results if results else None,
-        "state": state.model_dump()
-    }
\ No newline at end of file
+        "conversation_id": conversation.conversation_id,
+        "state": _state_view(conversation, response, since)
+    }
+
+# GET /status/{job_id} (status of a background job; the result once it has finished)
+@app.get("/status/{job_id}")
+async def get_job_status(job_id: str):
+    job = _get_job(job_id)
+    return job.to_dict(job_manager.queue_position(job))
+
+# GET /status/{job_id}/events (server-sent events: one "status" event per change, until the job finishes)
+@app.get("/status/{job_id}/events")
+async def stream_job_status(job_id: str):
+    job = _get_job(job_id)
+
+    async def events():
+        last = None
+        while True:
+            snapshot = json.dumps(job.to_dict(job_manager.queue_position(job)), default=str)
+            if snapshot != last:
+                last = snapshot
+                yield f"event: status\ndata: {snapshot}\n\n"
+            else:
+                yield ": keep-alive\n\n" # keeps proxies from closing an idle stream
+            if job.finished:
+                return
+            await job.wait_changed(timeout=15)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def _get_job(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job '{job_id}' (unknown or expired).")
+    return job
+
+# GET /state (compact conversation state; 304 when the client's ETag is current)
+@app.get("/state")
+async def get_state(response: Response, conversation_id: Optional[str] = None, since: Optional[int] = None,
+                    if_none_match: Optional[str] = Header(default=None)):
+    conversation, since = _resolve_conversation(conversation_id, since, if_none_match)
+    conversation.refresh()
+    if if_none_match and if_none_match.strip().removeprefix("W/") == conversation.etag:
+        return Response(status_code=304, headers={"ETag": conversation.etag})
+    return _state_view(conversation, response, since)
+
+# GET /debug/trace/{request_id} (stages, metadata, plan, results and spans of one request; needs X-Debug-Token)
+@app.get("/debug/trace/{request_id}")
+async def get_debug_trace(request_id: str, x_debug_token: Optional[str] = Header(default=None)):
+    if not debug_traces.enabled:
+        raise HTTPException(status_code=404, detail="Debug traces are disabled (DEBUG_TRACE_SINK=off).")
+    if not debug_traces.authorized(x_debug_token):
+        raise HTTPException(status_code=403, detail="A valid X-Debug-Token header is required.")
+    trace = debug_traces.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"No debug trace for request '{request_id}'.")
+    return trace
+
+# GET /metrics (Prometheus text format)
+@app.get("/metrics")
+async def metrics():
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+# POST /cache/invalidate (drops cached answers, e.g. after a manual knowledge-base edit)
+@app.post("/cache/invalidate")
+async def invalidate_cache():
+    semantic_cache.invalidate()
+    return {"message": "Semantic cache cleared."}
@@ -0,0 +1,166 @@
+'''
+jobs.py - Background jobs for long pipeline runs.
+
+A full pipeline turn (or a slow tool such as AnalysisGenerator) can take tens of seconds, longer
+than proxies on the hosted deployment keep an idle request open. POST /jobs queues the turn and
+answers at once with a job id; clients then poll GET /status/{job_id} or follow
+GET /status/{job_id}/events (server-sent events) until the job finishes.
+
+Jobs run on JOB_WORKERS asyncio workers in the backend process. The queue holds at most
+JOB_QUEUE_SIZE waiting jobs; submit() raises JobQueueFull beyond that, which the backend turns
+into 429 with a Retry-After header. Finished jobs are kept for JOB_RESULT_TTL seconds (and at
+most JOB_MAX_RETAINED of them) so late polls still get the result.
+'''
+
+import os
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from Logging.logger import logger
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "32"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+JOB_MAX_RETAINED = int(os.getenv("JOB_MAX_RETAINED", "1000"))
+
+
+class JobQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full; retry after {retry_after}s.")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, run: Callable[["Job"], Awaitable[Any]], **info):
+        self.job_id = uuid.uuid4().hex
+        self.info = info  # returned with the status, e.g. the conversation id
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.stage: Optional[str] = None  # progress reported by the job itself
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._run = run
+        self._changed = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def set_stage(self, stage: str):
+        if stage != self.stage:
+            self.stage = stage
+            self.notify()
+
+    def notify(self):
+        self._changed.set()
+
+    async def wait_changed(self, timeout: float):
+        """Returns when the job changes or after `timeout` seconds, whichever is first."""
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._changed.clear()
+
+    def to_dict(self, position: Optional[int] = None) -> Dict[str, Any]:
+        data = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            **self.info,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if position is not None:
+            data["queue_position"] = position
+        if self.finished:
+            data["result"] = self.result
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    def __init__(self, workers: int = JOB_WORKERS, max_queue: int = JOB_QUEUE_SIZE,
+                 result_ttl: float = JOB_RESULT_TTL, max_retained: int = JOB_MAX_RETAINED):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.result_ttl = result_ttl
+        self.max_retained = max_retained
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list = []
+        self._avg_run_s = 10.0  # moving average, for Retry-After
+
+    def _ensure_workers(self):
+        # Created lazily, on the event loop that serves the requests.
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._workers = [w for w in self._workers if not w.done()]
+        while len(self._workers) < self.workers:
+            self._workers.append(asyncio.get_running_loop().create_task(self._worker()))
+
+    def submit(self, run: Callable[[Job], Awaitable[Any]], **info) -> Job:
+        """Queues `run(job)`; its return value becomes the job result. Raises JobQueueFull."""
+        self._ensure_workers()
+        self._purge()
+        job = Job(run, **info)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            retry_after = max(1, int(self._avg_run_s * self._queue.qsize() / max(self.workers, 1)))
+            raise JobQueueFull(retry_after)
+        self._jobs[job.job_id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def queue_position(self, job: Job) -> Optional[int]:
+        if job.status != "queued":
+            return None
+        return sum(1 for j in self._jobs.values() if j.status == "queued" and j.created_at < job.created_at)
+
+    def stats(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+    def _purge(self):
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_retained)]:
+            del self._jobs[job_id]
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            job.notify()
+            try:
+                job.result = await job._run(job)
+                job.status = "completed"
+            except Exception as e:
+                logger.error("[Jobs] Job %s failed: %s", job.job_id, e, exc_info=True)
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                self._avg_run_s = 0.8 * self._avg_run_s + 0.2 * (job.finished_at - job.started_at)
+                job.notify()
+                self._queue.task_done()
+
+
+job_manager = JobManager()
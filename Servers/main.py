@@ -1,17 +1,24 @@
 import os
 import sys
+import asyncio
 import contextlib
 import httpx
 import uvicorn
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import Response, JSONResponse
 from contextlib import AsyncExitStack
 import nest_asyncio
 nest_asyncio.apply()
 
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
+from utility.Tracing import TraceMiddleware
+from utility.Metrics import MetricsMiddleware, registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from utility.Governor import set_process
+
+# The tool servers draw on the same Groq account as the backend; take the MCP host's share.
+set_process("mcp")
 
 # Import the MCP servers
 from Servers.SchemeExplainer.server import mcp as scheme_explainer_mcp
@@ -20,6 +27,7 @@ from Servers.SchemeDB.server import mcp as scheme_db_retriever_mcp
 from Servers.MoSPI.server import mcp as db_retriever_mcp
 from Servers.InvestorInsight.server import mcp as investor_insight_mcp
 from Servers.Analyzer.server import mcp as analysis_generator_mcp
+from Servers.resources import tool_resources
 
 ALL_MCP_SERVERS = {
     "/explain-scheme": scheme_explainer_mcp,
@@ -38,8 +46,13 @@ async def lifespan(app: FastAPI):
             for route, mcp in ALL_MCP_SERVERS.items():
                 await stack.enter_async_context(mcp.session_manager.run())
                 logger.info(f"{mcp.name} MCP server started successfully at {route}")
+
+            # Build the tool objects once; handlers wait on readiness instead of constructing per call.
+            warm_up_task = asyncio.create_task(tool_resources.warm_up())
             yield
             logger.info("Shutting down all MCP servers...")
+            warm_up_task.cancel()
+            tool_resources.clear()
     except Exception as e:
         logger.error(f"Failed during MCP server lifespan: {e}")
         raise UdayamitraException("Failed to manage MCP servers", sys)
@@ -60,6 +73,9 @@ try:
         allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
         allow_headers=["*"],
     )
+    server.add_middleware(MetricsMiddleware, service="mcp-host")
+    # Continues the backend's trace (traceparent header) into the tool handlers.
+    server.add_middleware(TraceMiddleware, service="mcp-host")
     logger.info("FastAPI instance created successfully")
 except Exception as e:
     logger.error(f"Failed to create FastAPI instance: {e}")
@@ -70,6 +86,21 @@ except Exception as e:
 async def health_check():
     return {"status": "ok"}
 
+@server.get("/ready")
+async def readiness_check():
+    status = tool_resources.status()
+    return JSONResponse(content=status, status_code=200 if status["ready"] else 503)
+
+metrics_registry.callback(
+    "tool_resources", "Shared tool objects registered and built, and whether the host is ready.", "gauge",
+    lambda: {("initialized",): len(tool_resources.status()["initialized"]),
+             ("registered",): len(tool_resources.status()["registered"]),
+             ("ready",): int(tool_resources.is_ready())}, ("state",))
+
+@server.get("/metrics")
+async def metrics():
+    return Response(content=metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
+
 @server.get("/config")
 async def config():
     return {"message": "Udayamitra MCP Server Configuration", "endpoints": list(ALL_MCP_SERVERS.keys())}
@@ -1,6 +1,9 @@
+import copy
 import json
+import uuid
 import asyncio
 from enum import Enum, auto
+from typing import Callable
 
 from utility.model import Metadata, ExecutionPlan, ConversationState
 from Meta.pipeline import IntentPipeline
@@ -9,6 +12,16 @@ from router.ToolExecutor import ToolExecutor
 from Logging.logger import logger
 from Exception.exception import UdayamitraException
 from utility.StateManager import StateManager
+from utility.SemanticCache import semantic_cache
+from utility.Embedder import get_embedding
+from utility.Tracing import span
+from utility.RequestTrace import debug_traces
+from utility.SingleFlight import SingleFlight, flight_key
+from utility.ConversationSummary import context_summary
+from utility.Governor import GovernorRejected, rejection_in
+
+# Identical queries from identical conversation contexts (typically first turns) share one run.
+pipeline_flight = SingleFlight("pipeline")
 
 class PipelineStage(Enum):
     IDLE = auto()
@@ -19,36 +32,54 @@ class PipelineStage(Enum):
     ERROR = auto()
 
 class Pipeline:
-    def __init__(self, user_query: str, state: ConversationState = None, log_file: str = "pipeline_log.txt"):
+    def __init__(self, user_query: str, state: ConversationState = None, on_stage: Callable[[str], None] = None):
         self.user_query = user_query
-        self.log_file = log_file
+        self.on_stage = on_stage  # notified of each stage change, e.g. by a background job
+        self.request_id: str | None = None
+        self.trace = None  # RequestTrace while run() is active and debug traces are enabled
         self.stage = PipelineStage.IDLE
         self.status_message = "Initialized."
         self.metadata: Metadata | None = None
         self.plan: ExecutionPlan | None = None
         self.results = None
+        self.cache_hit = False
+        self.coalesced = False  # results were shared by an identical in-flight run
+        self.rejected: GovernorRejected | None = None  # set when admission control turned the run away
+        self.query_embedding = None
+        self.cache_context = None
+        self._loop: asyncio.AbstractEventLoop | None = None  # the loop run() is on, for on_stage
 
         # Maintain conversation state
         self.conversation_state = state if state is not None else ConversationState()
 
-        # Clear previous logs
-        open(self.log_file, "w").close()
-
-    def log(self, content: str):
-        with open(self.log_file, "a") as f:
-            f.write(content + "\n\n")
+    def log(self, label: str, data=None):
+        """Adds an entry to this request's debug trace (a no-op when debug traces are off)."""
+        if self.trace is not None:
+            self.trace.log(label, data)
 
     def set_stage(self, stage: PipelineStage, message: str):
         self.stage = stage
         self.status_message = message
         logger.info(f"[{stage.name}] {message}")
-        self.log(f"{stage.name}:\n{message}")
+        self.log(stage.name, message)
+        if self.on_stage is not None:
+            # Sync stages run in worker threads; the callback (e.g. a job's asyncio.Event) belongs to the loop.
+            if self._loop is not None and not self._on_loop():
+                self._loop.call_soon_threadsafe(self.on_stage, stage.name)
+            else:
+                self.on_stage(stage.name)
+
+    def _on_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
 
     def extract_metadata(self):
         self.set_stage(PipelineStage.METADATA_EXTRACTION, "Extracting metadata from user query...")
         extractor = IntentPipeline()
         self.metadata = extractor.run(self.user_query, state=self.conversation_state)
-        self.log(f"Extracted Metadata:\n{self.metadata.model_dump_json(indent=2)}")
+        self.log("metadata", self.metadata.model_dump() if self.trace is not None else None)
 
         # --- State-aware topic switch detection ---
         state_manager = StateManager(initial_state=self.conversation_state)
@@ -63,11 +94,110 @@ class Pipeline:
             logger.debug("[Pipeline] Detected topic switch. Resetting partial state.")
             state_manager.reset_on_topic_switch()
 
+    async def lookup_cache(self) -> bool:
+        """Serves the results of a near-identical earlier query for a compatible profile, if any."""
+        if not semantic_cache.is_cacheable(self.metadata.tools_required):
+            return False
+        try:
+            self.query_embedding = await get_embedding(self.metadata.query)
+        except Exception as e:
+            logger.warning(f"[Pipeline] Could not embed query for semantic cache: {e}")
+            return False
+
+        # Snapshot the context now; execution enriches it and the key must match the next lookup.
+        self.cache_context = dict(self.conversation_state.context_entities)
+        cached = semantic_cache.lookup(self.metadata, self.query_embedding, context_entities=self.cache_context)
+        if cached is None:
+            return False
+
+        # A private copy: later steps mutate results, and the cache entry is shared across requests.
+        self.results = copy.deepcopy(cached)
+        self.cache_hit = True
+        self.log("semantic_cache_hit", self.results)
+        self._apply_results_to_state()
+        return True
+
+    def _apply_results_to_state(self):
+        """Mirrors the state updates ToolExecutor makes, for results that did not come from it."""
+        state_manager = StateManager(initial_state=self.conversation_state)
+        if self.metadata.intents:
+            state_manager.set_last_intent(self.metadata.intents[0])
+        scheme = self.metadata.entities.get("scheme") if self.metadata.entities else None
+        if scheme:
+            state_manager.set_last_scheme(scheme)
+        for tool_name, result in self.results.items():
+            if not isinstance(result, dict):
+                continue
+            state_manager.set_last_tool(tool_name)
+            state_manager.set_tool_memory(tool_name, result.get("raw_output", {}))
+            state_manager.add_message(role="tool", content=result.get("output_text", ""), tool_used=tool_name)
+            state_manager.clear_missing_inputs(tool_name)
+        state_manager.update_context_entities({
+            **(self.metadata.entities or {}),
+            **(self.metadata.user_profile.model_dump() if self.metadata.user_profile else {})
+        })
+
+    def flight_key(self) -> str:
+        """Normalized query plus everything in the conversation state that shapes its answer."""
+        state = self.conversation_state
+        context = {
+            "user_profile": state.user_profile.model_dump(mode="json") if state.user_profile else None,
+            "context_entities": state.context_entities,
+            "last_intent": state.last_intent,
+            "last_scheme": state.last_scheme_mentioned,
+            "last_tool": state.last_tool_used,
+            "summary": context_summary(state),
+        }
+        return flight_key(" ".join(self.user_query.lower().split()), json.dumps(context, sort_keys=True, default=str))
+
+    async def compute_results(self):
+        # Extraction and planning make blocking LLM and Nominatim calls, which may also wait for a
+        # governor slot; they run in worker threads so the event loop keeps serving other requests.
+        with span("pipeline.metadata_extraction"):
+            await asyncio.to_thread(self.extract_metadata)
+        with span("pipeline.cache_lookup"):
+            cache_hit = await self.lookup_cache()
+        if not cache_hit:
+            with span("pipeline.planning"):
+                await asyncio.to_thread(self.plan_execution)
+            with span("pipeline.execution"):
+                await self.execute_plan()
+            self.store_in_cache()
+
+    async def coalesced_compute(self):
+        """compute_results(), or the outcome of an identical run already in flight."""
+        leader = False
+
+        async def lead():
+            nonlocal leader
+            leader = True
+            await self.compute_results()
+            return self.metadata, self.results
+
+        key = self.flight_key()
+        if pipeline_flight.is_in_flight(key):
+            self.set_stage(PipelineStage.EXECUTION, "Waiting for an identical query already in progress...")
+        metadata, results = await pipeline_flight.do(key, lead)
+        if not leader:
+            self.metadata = metadata
+            self.results = copy.deepcopy(results)  # the leader's object is shared
+            self.coalesced = True
+            self.log("coalesced_results", self.results)
+            self._apply_results_to_state()
+
+    def store_in_cache(self):
+        if self.query_embedding is None or not isinstance(self.results, dict):
+            return
+        # Only fully successful runs are worth replaying.
+        if not self.results or not all(isinstance(r, dict) and not r.get("error") for r in self.results.values()):
+            return
+        semantic_cache.store(self.metadata, self.query_embedding, self.results, context_entities=self.cache_context)
+
     def plan_execution(self):
         self.set_stage(PipelineStage.PLANNING, "Building execution plan...")
         planner = Planner()
         self.plan = planner.build_plan(self.metadata, state=self.conversation_state)
-        self.log(f"Execution Plan:\n{self.plan.model_dump_json(indent=2)}")
+        self.log("execution_plan", self.plan.model_dump() if self.trace is not None else None)
 
         # --- Update intent and scheme in state ---
         state_manager = StateManager(initial_state=self.conversation_state)
@@ -83,7 +213,7 @@ class Pipeline:
 
         executor = ToolExecutor(conversation_state=self.conversation_state)
         self.results = await executor.run_execution_plan(self.plan, self.metadata)
-        self.log(f"Execution Results:\n{json.dumps(self.results, indent=2)}")
+        self.log("execution_results", self.results)
 
         # --- Clear missing inputs for successful tools ---
         state_manager = StateManager(initial_state=self.conversation_state)
@@ -96,25 +226,36 @@ class Pipeline:
                 state_manager.clear_missing_inputs(tool_name)
 
     async def run(self):
+        with span("pipeline.run") as run_span:
+            # The trace id doubles as the request id, so X-Trace-Id finds the debug trace.
+            self.request_id = run_span.trace_id if run_span else uuid.uuid4().hex
+            self._loop = asyncio.get_running_loop()
+            self.trace = debug_traces.start(self.request_id, self.user_query)
+            try:
+                output = await self._run()
+            finally:
+                debug_traces.finish(self.trace)
+            if run_span:
+                run_span.set_attributes({"pipeline.stage": self.stage.name, "pipeline.cache_hit": self.cache_hit,
+                                         "pipeline.coalesced": self.coalesced})
+                if self.stage == PipelineStage.ERROR:
+                    run_span.status, run_span.status_message = "ERROR", self.status_message
+            return output
+
+    async def _run(self):
         try:
-            self.log(f"User Query:\n{self.user_query}")
-            self.extract_metadata()
-            self.plan_execution()
-            await self.execute_plan()
+            self.log("user_query", self.user_query)
+            await self.coalesced_compute()
 
             self.set_stage(PipelineStage.COMPLETED, "Pipeline execution completed successfully.")
 
-            with open("output.json", "w") as f:
-                json.dump(self.results, f, indent=2)
-
-            return {
-                "results": self.results,
-                "conversation_state": self.conversation_state.model_dump()
-            }
+            return {"results": self.results}
 
         except UdayamitraException as ue:
+            self.rejected = rejection_in(ue)
             self.set_stage(PipelineStage.ERROR, f"UdayamitraException: {str(ue)}")
         except Exception as e:
+            self.rejected = rejection_in(e)
             self.set_stage(PipelineStage.ERROR, f"Unexpected error: {str(e)}")
 
         return None
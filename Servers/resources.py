@@ -0,0 +1,98 @@
+'''
+resources.py - Process-wide registry of the expensive tool objects (LLM clients, Astra connections,
+location normalizers) used by the MCP tool handlers.
+
+Each tool server registers a factory at import time. Servers/main.py builds every registered object
+once during its lifespan (warm-up) and handlers fetch the shared instance instead of constructing
+a new one per call. Handlers wait on readiness so no request runs against a half-initialized tool.
+'''
+
+import sys
+import time
+import asyncio
+from typing import Any, Callable, Dict, Optional
+
+from Logging.logger import logger
+from Exception.exception import UdayamitraException
+
+READINESS_TIMEOUT = 60.0
+
+
+class ToolResources:
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._ready = asyncio.Event()
+        self._warming = False
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        """Registers a zero-argument factory for a shared tool object."""
+        self._factories[name] = factory
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.is_ready(),
+            "registered": sorted(self._factories.keys()),
+            "initialized": sorted(self._instances.keys()),
+        }
+
+    async def _build(self, name: str) -> Any:
+        lock = self._locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name in self._instances:
+                return self._instances[name]
+            factory = self._factories.get(name)
+            if factory is None:
+                raise UdayamitraException(f"No factory registered for tool resource '{name}'", sys)
+            start = time.perf_counter()
+            # Constructors do blocking network setup (Groq client, Astra connection), keep them off the loop.
+            instance = await asyncio.to_thread(factory)
+            self._instances[name] = instance
+            logger.info(f"[ToolResources] Built '{name}' in {time.perf_counter() - start:.2f}s")
+            return instance
+
+    async def warm_up(self):
+        """Builds every registered tool object once, then marks the registry ready."""
+        self._warming = True
+        logger.info(f"[ToolResources] Warming up {len(self._factories)} tool resources...")
+        try:
+            results = await asyncio.gather(
+                *(self._build(name) for name in self._factories),
+                return_exceptions=True
+            )
+            for name, result in zip(self._factories, results):
+                if isinstance(result, BaseException):
+                    # A failed resource is rebuilt lazily on first use instead of blocking the others.
+                    logger.error(f"[ToolResources] Warm-up failed for '{name}': {result}")
+        finally:
+            self._warming = False
+            self._ready.set()
+        logger.info("[ToolResources] Tool resources ready.")
+
+    async def get(self, name: str, timeout: Optional[float] = READINESS_TIMEOUT) -> Any:
+        """
+        Returns the shared instance for `name`. While warm-up is running the caller waits for
+        readiness; outside a lifespan (a server run standalone) the instance is built lazily.
+        """
+        if name in self._instances:
+            return self._instances[name]
+        if self._warming and not self._ready.is_set():
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise UdayamitraException(f"Tool resource '{name}' not ready after {timeout}s", sys)
+            if name in self._instances:
+                return self._instances[name]
+        return await self._build(name)
+
+    def clear(self):
+        """Drops all instances, used on shutdown."""
+        self._instances.clear()
+        self._ready.clear()
+
+
+tool_resources = ToolResources()
@@ -0,0 +1,12 @@
+// Stands in for the site's pager: "next" fetches the following page and swaps its rows into the
+// table in place, so the scraper sees the same DOM updates as on exportimportdata.in.
+var next = document.getElementById("nextpage");
+next.addEventListener("click", async function (event) {
+  event.preventDefault();
+  var response = await fetch(next.dataset.next);
+  var doc = new DOMParser().parseFromString(await response.text(), "text/html");
+  document.querySelector("div#datamodule tbody").innerHTML = doc.querySelector("div#datamodule tbody").innerHTML;
+  var following = doc.getElementById("nextpage");
+  next.dataset.next = following.dataset.next;
+  next.setAttribute("style", following.getAttribute("style"));
+});
@@ -0,0 +1,376 @@
+'''
+ingestion_benchmark.py - Offline throughput benchmark for the PDF ingestion path.
+
+Stages, each timed separately:
+- parse:   PDF text extraction (PyPDFLoader as in data/AstraDB.py, PyMuPDF pages as in data/PageStream.py)
+- chunk:   the AstraDB splitter and the PageStream page-streaming splitter
+- embed:   utility.Embedder.get_embedding over one shared client, against a local stub embedding server
+- ingest:  AstraDB._ingest_file (one embedding request and one insert per batch + manifest) into an in-memory collection
+
+Everything runs locally: a stub HTTP server stands in for the embedding Space and an in-memory
+collection for Astra, both with configurable latency. Reports chunks/sec, per-item latency
+percentiles and the Python memory high-water mark per stage. Parse stages are skipped when their
+PDF library is not installed; synthetic page text is used for the later stages then.
+
+tracemalloc stays on for the whole run, which slows allocation-heavy stages; compare numbers
+between runs of this script rather than against production throughput.
+
+With --baseline, exits non-zero if any stage's chunks/sec dropped by more than --tolerance, so
+the script can gate CI.
+
+Usage: python -m benchmarks.ingestion_benchmark [--pdf-dir DIR] [--docs 20] [--pages 10]
+       [--embed-latency-ms 5] [--insert-latency-ms 2] [--output report.json] [--baseline old.json]
+'''
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+import resource
+import tempfile
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.stats import summarize_ms, compare_to_baseline  # noqa: E402
+
+EMBEDDING_DIMENSION = 384
+WORDS = (
+    "scheme subsidy eligibility msme enterprise capital investment manufacturing export credit "
+    "guarantee incentive component semiconductor district cluster application approval"
+).split()
+
+
+# --- Local stand-ins ---
+
+def stub_vector(text: str) -> List[float]:
+    seed = hashlib.sha256(text.encode("utf-8")).digest()
+    rng = random.Random(seed)
+    return [rng.uniform(-1, 1) for _ in range(EMBEDDING_DIMENSION)]
+
+
+def start_embedding_server(latency_s: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like the pooled client expects
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if latency_s:
+                time.sleep(latency_s)
+            if self.path.endswith("/embed_batch"):
+                payload = json.dumps({"embeddings": [stub_vector(t) for t in body.get("texts", [])]}).encode("utf-8")
+            else:
+                payload = json.dumps({"embedding": stub_vector(body.get("text", ""))}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class InMemoryCollection:
+    """The subset of the astrapy Collection API used by data/AstraDB.py."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.docs: Dict[str, Dict[str, Any]] = {}
+        self.insert_latencies: List[float] = []
+        self._lock = threading.Lock()
+
+    def insert_many(self, docs, ordered: bool = False):
+        start = time.perf_counter()
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        with self._lock:
+            for doc in docs:
+                self.docs[doc["_id"]] = doc
+        self.insert_latencies.append(time.perf_counter() - start)
+
+    def delete_many(self, filter):
+        with self._lock:
+            for doc_id in filter.get("_id", {}).get("$in", []):
+                self.docs.pop(doc_id, None)
+
+
+# --- Inputs ---
+
+def synthetic_pages(docs: int, pages: int, words_per_page: int, seed: int = 7) -> List[List[str]]:
+    rng = random.Random(seed)
+    out = []
+    for _ in range(docs):
+        doc = []
+        for _ in range(pages):
+            sentences = []
+            for _ in range(words_per_page // 12):
+                sentences.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+            doc.append("\n\n".join(" ".join(sentences[i:i + 5]) for i in range(0, len(sentences), 5)))
+        out.append(doc)
+    return out
+
+
+def write_text_pdf(path: str, pages: List[str]):
+    """Writes a minimal text-only PDF (Helvetica, one line per 90 characters)."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for text in pages:
+        lines = [text[i:i + 90] for i in range(0, len(text), 90)][:60]
+        escaped = [l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)").replace("\n", " ") for l in lines]
+        stream = "BT /F1 9 Tf 40 800 Td 11 TL " + " ".join(f"({l}) '" for l in escaped) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        page_ids.append(len(objects))
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(f'{i} 0 R' for i in page_ids)}] /Count {len(page_ids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+# --- Stages ---
+
+class StageRecorder:
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, name: str, chunks: int, seconds: float, latencies: List[float], peak_bytes: int, **extra):
+        self.stages[name] = {
+            "chunks": chunks,
+            "seconds": round(seconds, 4),
+            "chunks_per_sec": round(chunks / seconds, 2) if seconds else 0.0,
+            "latency_ms": summarize_ms(latencies),
+            "peak_memory_mb": round(peak_bytes / 2 ** 20, 2),
+            **extra,
+        }
+
+    def skip(self, name: str, reason: str):
+        self.stages[name] = {"skipped": reason}
+
+
+def measure(fn):
+    """Runs fn() and returns (result, seconds, tracemalloc peak bytes during the call)."""
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start, tracemalloc.get_traced_memory()[1]
+
+
+def stage_parse(recorder: StageRecorder, pdf_paths: List[str]) -> List[List[str]]:
+    parsed: List[List[str]] = []
+    try:
+        from langchain_community.document_loaders import PyPDFLoader
+        import pypdf  # noqa: F401  (PyPDFLoader imports it lazily)
+
+        latencies: List[float] = []
+
+        def run():
+            for path in pdf_paths:
+                start = time.perf_counter()
+                parsed.append([d.page_content for d in PyPDFLoader(path).load()])
+                latencies.append(time.perf_counter() - start)
+
+        _, seconds, peak = measure(run)
+        recorder.record("parse_pypdf", sum(len(p) for p in parsed), seconds, latencies, peak, unit="pages")
+    except ImportError as e:
+        recorder.skip("parse_pypdf", f"not installed: {e.name}")
+
+    try:
+        from data.PageStream import iter_pdf_pages
+
+        pages_read = 0
+        latencies = []
+
+        def run_stream():
+            nonlocal pages_read
+            for path in pdf_paths:
+                start = time.perf_counter()
+                pages_read += sum(1 for _ in iter_pdf_pages(path))
+                latencies.append(time.perf_counter() - start)
+
+        _, seconds, peak = measure(run_stream)
+        recorder.record("parse_pymupdf", pages_read, seconds, latencies, peak, unit="pages")
+    except ImportError as e:
+        recorder.skip("parse_pymupdf", f"not installed: {e.name}")
+    return parsed
+
+
+def stage_chunk(recorder: StageRecorder, docs: List[List[str]]) -> List[List[str]]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+    from data.PageStream import iter_chunks
+
+    # Same settings as data/AstraDB.chunk_pdf_file.
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100, separators=["\n\n", ".", "!", "?"])
+    chunked: List[List[str]] = []
+    latencies: List[float] = []
+
+    def run():
+        for pages in docs:
+            start = time.perf_counter()
+            chunked.append([c.page_content.strip() for c in splitter.create_documents(pages)])
+            latencies.append(time.perf_counter() - start)
+
+    _, seconds, peak = measure(run)
+    recorder.record("chunk_astradb", sum(map(len, chunked)), seconds, latencies, peak)
+
+    streamed = 0
+    stream_latencies: List[float] = []
+
+    def run_stream():
+        nonlocal streamed
+        for pages in docs:
+            start = time.perf_counter()
+            streamed += sum(1 for _ in iter_chunks(iter(pages)))
+            stream_latencies.append(time.perf_counter() - start)
+
+    _, seconds, peak = measure(run_stream)
+    recorder.record("chunk_stream", streamed, seconds, stream_latencies, peak)
+    return chunked
+
+
+def stage_embed(recorder: StageRecorder, chunks: List[str], concurrency: int):
+    import httpx
+    from utility.Embedder import get_embedding
+
+    latencies: List[float] = []
+
+    async def run():
+        semaphore = asyncio.Semaphore(concurrency)
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            async def one(text):
+                async with semaphore:
+                    start = time.perf_counter()
+                    await get_embedding(text, client=client)
+                    latencies.append(time.perf_counter() - start)
+            await asyncio.gather(*(one(t) for t in chunks))
+
+    _, seconds, peak = measure(lambda: asyncio.run(run()))
+    recorder.record("embed", len(chunks), seconds, latencies, peak, concurrency=concurrency)
+
+
+def stage_ingest(recorder: StageRecorder, chunked: List[List[str]], concurrency: int, batch_size: int,
+                 insert_latency_s: float):
+    import httpx
+    from data.AstraDB import AstraDB
+    from data.IngestionManifest import IngestionManifest
+
+    db = AstraDB.__new__(AstraDB)  # skips the Astra client; only _ingest_file is exercised
+    collection = InMemoryCollection(insert_latency_s)
+    file_latencies: List[float] = []
+
+    async def run():
+        with tempfile.TemporaryDirectory() as manifest_dir:
+            manifest = IngestionManifest("benchmark", manifest_dir=manifest_dir)
+            semaphore = asyncio.Semaphore(concurrency)
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                for index, texts in enumerate(chunked):
+                    chunks = [{"file_name": f"doc{index}.pdf", "text": t, "metadata": {}} for t in texts]
+                    start = time.perf_counter()
+                    await db._ingest_file(collection, f"doc{index}.pdf", f"hash{index}", chunks,
+                                          manifest, client, semaphore, batch_size)
+                    file_latencies.append(time.perf_counter() - start)
+
+    _, seconds, peak = measure(lambda: asyncio.run(run()))
+    recorder.record("ingest", len(collection.docs), seconds, file_latencies, peak,
+                    insert_batch_latency_ms=summarize_ms(collection.insert_latencies),
+                    concurrency=concurrency, batch_size=batch_size)
+
+
+def print_table(stages: Dict[str, Dict[str, Any]]):
+    print(f"{'stage':<16}{'items':>8}{'items/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak MB':>10}")
+    for name, s in stages.items():
+        if "skipped" in s:
+            print(f"{name:<16}  skipped ({s['skipped']})")
+            continue
+        lat = s["latency_ms"]
+        print(f"{name:<16}{s['chunks']:>8}{s['chunks_per_sec']:>12,.1f}{lat.get('p50', 0):>10.2f}"
+              f"{lat.get('p95', 0):>10.2f}{lat.get('p99', 0):>10.2f}{s['peak_memory_mb']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion throughput benchmark.")
+    parser.add_argument("--pdf-dir", help="benchmark these PDFs instead of generated ones")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--words-per-page", type=int, default=400)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--insert-latency-ms", type=float, default=2.0)
+    parser.add_argument("--embed-concurrency", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed chunks/sec drop vs baseline")
+    args = parser.parse_args()
+
+    server = start_embedding_server(args.embed_latency_ms / 1000.0)
+    os.environ["EMBEDDING_API_URL"] = f"http://127.0.0.1:{server.server_address[1]}/embed"
+    tracemalloc.start()
+    recorder = StageRecorder()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        if args.pdf_dir:
+            pdf_paths = sorted(os.path.join(args.pdf_dir, f) for f in os.listdir(args.pdf_dir) if f.lower().endswith(".pdf"))
+            docs: List[List[str]] = []
+        else:
+            docs = synthetic_pages(args.docs, args.pages, args.words_per_page)
+            pdf_paths = []
+            for index, pages in enumerate(docs):
+                path = os.path.join(workdir, f"doc{index}.pdf")
+                write_text_pdf(path, pages)
+                pdf_paths.append(path)
+
+        parsed = stage_parse(recorder, pdf_paths)
+        if parsed:
+            docs = parsed
+        if not docs:
+            sys.exit("No PDF parser installed and no synthetic text to fall back on.")
+
+        chunked = stage_chunk(recorder, docs)
+        stage_embed(recorder, [c for chunks in chunked for c in chunks], args.embed_concurrency)
+        stage_ingest(recorder, chunked, args.embed_concurrency, args.batch_size, args.insert_latency_ms / 1000.0)
+
+    server.shutdown()
+    tracemalloc.stop()
+    report = {
+        "config": vars(args),
+        "stages": recorder.stages,
+        "rss_high_water_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    print_table(recorder.stages)
+    print(f"process RSS high-water mark: {report['rss_high_water_mb']} MB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        regressions = compare_to_baseline(recorder.stages, args.baseline, "chunks_per_sec", args.tolerance)
+        if regressions:
+            print("Throughput regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No throughput regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
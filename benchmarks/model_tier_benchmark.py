@@ -0,0 +1,364 @@
+'''
+model_tier_benchmark.py - Latency and output quality of each model tier on the routed LLM call sites.
+
+Runs the real call sites (MetadataExtractor, Planner, SchemaGenerator, QuestionGenerator and the
+AnalysisGenerator intent classifier) over a fixed set of labelled cases. Each tier in
+Meta/model_routing.json runs the cases once, with escalation turned off, so each tier is measured
+without help from the next. For every route and tier the report gives:
+- valid:   share of cases whose structured output the call site accepted, i.e. 1 - escalation rate
+- correct: share of cases that match the expected answer (location and intent, tools, scheme, ...)
+- latency p50/p95 of the call site (geocoding is replaced by a pass-through)
+- routed:  latency and correctness with escalation on. For each case this adds the next tier's
+           result whenever this tier's output was rejected
+
+It needs the real Groq API (GROQ_API_KEY). Calls run one at a time, --pause-s apart, to stay
+inside the on-demand quota. --stub answers every tier with the local Groq stand-in from
+pipeline_benchmark instead; that only checks the harness, since all tiers get the same answers.
+
+Usage: python -m benchmarks.model_tier_benchmark [--routes metadata_extraction,planning]
+       [--tiers small,large] [--repeat 1] [--pause-s 2.0] [--stub] [--output-dir Artifacts/benchmarks]
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from benchmarks.stats import summarize_ms  # noqa: E402
+from benchmarks.pipeline_benchmark import git_revision, start_stub_server  # noqa: E402
+
+# (query, expected location substring, expected intent or None)
+METADATA_CASES = [
+    ("Explain the PMEGP scheme for a first-time manufacturer in Bengaluru", "bengaluru", None),
+    ("Am I eligible for the Stand-Up India scheme as a woman entrepreneur in Pune?", "pune", "check_eligibility"),
+    ("What subsidies are available for semiconductor units in Gujarat?", "gujarat", None),
+    ("Check my eligibility for the Karnataka ESDM policy incentives", "karnataka", "check_eligibility"),
+    ("Analyse export trends of printed circuit boards from Chennai", "chennai", None),
+    ("What is the credit guarantee scheme for micro enterprises?", "", None),
+]
+
+# (query, intents, tools_required)
+PLANNING_CASES = [
+    ("Explain the PMEGP scheme", ["explain_scheme"], ["SchemeExplainer"]),
+    ("Am I eligible for Stand-Up India?", ["check_eligibility"], ["EligibilityChecker"]),
+    ("Explain the ESDM scheme and check if I am eligible", ["explain_scheme", "check_eligibility"],
+     ["SchemeExplainer", "EligibilityChecker"]),
+    ("Give me an investment insight on electronics component manufacturing", ["generate_investor_insight"],
+     ["InsightGenerator"]),
+    ("Which countries import capacitors from India?", ["list_importers"], ["Analyzer"]),
+]
+
+# (query, scheme entity, expected scheme substring)
+SCHEMA_CASES = [
+    ("Explain the PMEGP scheme for a manufacturer in Bengaluru", "PMEGP", "pmegp"),
+    ("Tell me about Stand-Up India for women entrepreneurs", "Stand-Up India", "stand"),
+    ("What does the credit guarantee scheme for micro enterprises offer?", "credit guarantee", "credit guarantee"),
+]
+
+# (missing fields, scheme)
+QUESTION_CASES = [
+    (["annual_turnover", "business_age_years"], "PMEGP"),
+    (["gender", "caste_category", "loan_amount"], "Stand-Up India"),
+    (["udyam_registration"], "ESDM incentives"),
+]
+
+# (query, expected intent)
+ANALYSIS_INTENT_CASES = [
+    ("which are the top countries importing capacitors from india", "table_required"),
+    ("does middle east import capacitor from india?", "direct_answer"),
+    ("list the main ports exporting printed circuit boards", "table_required"),
+    ("is india an exporter of solar cells?", "direct_answer"),
+]
+
+_outcomes: List[bool] = []  # one per structured LLM call: did the call site accept the output?
+
+
+class _RawLocation:
+    """Stands in for LocationNormalizer so extraction latency does not include Nominatim."""
+
+    def normalize(self, raw_location: str) -> Dict[str, Any]:
+        return {"raw": raw_location, "city": None, "state": None, "country": "India"}
+
+
+def _profile():
+    from utility.model import UserProfile, Location
+    return UserProfile(user_type="entrepreneur", location=Location(raw="Bengaluru", city="Bengaluru",
+                                                                    state="Karnataka", country="India"))
+
+
+def _metadata(query: str, intents: List[str], tools: List[str], entities: Optional[Dict[str, Any]] = None):
+    from utility.model import Metadata
+    return Metadata(query=query, intents=intents, tools_required=tools, entities=entities or {},
+                    user_profile=_profile())
+
+
+# --- Routes: (factory(model) -> component, call(component, case) -> output, check(output, case) -> bool) ---
+
+def _metadata_route():
+    from Meta.extractor import MetadataExtractor
+
+    def factory(model: str):
+        extractor = MetadataExtractor(model=model)
+        extractor.location_normalizer = _RawLocation()
+        return extractor
+
+    def check(metadata, case) -> bool:
+        _, location, intent = case
+        raw = metadata.user_profile.location.raw.lower()
+        location_ok = location in raw if location else raw in ("", "unknown", "india", "n/a")
+        return location_ok and (intent is None or intent in metadata.intents)
+
+    return factory, lambda extractor, case: extractor.extract_metadata(case[0]), check, METADATA_CASES
+
+
+def _planning_route():
+    from router.planner import Planner
+
+    def call(planner, case):
+        query, intents, tools = case
+        return planner.build_plan(_metadata(query, intents, tools))
+
+    def check(plan, case) -> bool:
+        return {task.tool_name for task in plan.task_list} == set(case[2])
+
+    return lambda model: Planner(model=model), call, check, PLANNING_CASES
+
+
+def _schema_route():
+    from router.SchemaGenerator import SchemaGenerator
+    from utility.model import SchemeMetadata
+
+    def call(generator, case):
+        query, scheme, _ = case
+        metadata = _metadata(query, ["explain_scheme"], ["SchemeExplainer"], {"scheme": scheme}).model_dump()
+        plan = {"execution_type": "sequential", "tasks": [{"tool": "SchemeExplainer", "input": {"query": query}}]}
+        return generator.generate_instance(metadata, plan, SchemeMetadata)
+
+    def check(instance, case) -> bool:
+        return case[2] in instance.scheme_name.lower()
+
+    return lambda model: SchemaGenerator(model=model), call, check, SCHEMA_CASES
+
+
+def _question_route():
+    from Servers.EligibilityChecker.QuestionGenerator import QuestionGenerator
+
+    def check(questions, case) -> bool:
+        return len(questions) >= len(case[0])
+
+    return (lambda model: QuestionGenerator(model=model),
+            lambda generator, case: generator.generate_questions(case[0], case[1]), check, QUESTION_CASES)
+
+
+def _analysis_intent_route():
+    from utility.LLM import LLMClient
+    from Servers.AnalysisGenerator.AnalysisGenerator import AnalysisGenerator
+
+    def factory(model: str):
+        # __init__ connects to Astra; the intent classifier only needs its LLM client.
+        generator = AnalysisGenerator.__new__(AnalysisGenerator)
+        generator.intent_client = LLMClient(model=model, route="analysis_intent")
+        return generator
+
+    return (factory, lambda generator, case: generator._classify_query_intent(case[0]),
+            lambda intent, case: intent == case[1], ANALYSIS_INTENT_CASES)
+
+
+ROUTES: Dict[str, Callable[[], Tuple[Callable, Callable, Callable, List]]] = {
+    "metadata_extraction": _metadata_route,
+    "planning": _planning_route,
+    "schema_generation": _schema_route,
+    "question_generation": _question_route,
+    "analysis_intent": _analysis_intent_route,
+}
+
+
+def record_outcomes():
+    """Wraps LLMClient.run_structured to note whether each output passed the call site's validation."""
+    from utility.LLM import LLMClient
+    original = LLMClient.run_structured
+
+    def run_structured(self, system_message, user_message, parse, call_site=None):
+        def checked(output):
+            try:
+                result = parse(output)
+            except ValueError:
+                _outcomes.append(False)
+                raise
+            _outcomes.append(True)
+            return result
+        return original(self, system_message, user_message, checked, call_site=call_site or self.route)
+
+    LLMClient.run_structured = run_structured
+
+
+# --- Measurement ---
+
+def run_case(component: Any, call: Callable, check: Callable, case: Any) -> Dict[str, Any]:
+    _outcomes.clear()
+    start = time.perf_counter()
+    error = None
+    try:
+        output = call(component, case)
+    except Exception as e:
+        output, error = None, f"{type(e).__name__}: {e}"
+    elapsed = time.perf_counter() - start
+    # Call sites that swallow their errors (the intent classifier) still show up as invalid here.
+    valid = error is None and all(_outcomes)
+    correct = False
+    if error is None:
+        try:
+            correct = bool(check(output, case))
+        except Exception:
+            correct = False
+    return {"latency_s": elapsed, "valid": valid, "correct": correct, "error": error}
+
+
+def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    count = len(records) or 1
+    return {
+        "cases": len(records),
+        "valid": round(sum(r["valid"] for r in records) / count, 3),
+        "correct": round(sum(r["correct"] for r in records) / count, 3),
+        "latency_ms": summarize_ms(r["latency_s"] for r in records),
+        "errors": sorted({r["error"] for r in records if r["error"]})[:5],
+    }
+
+
+def routed(records: List[Dict[str, Any]], fallback: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """What escalation would deliver: rejected cases also pay for (and get the answer of) the next tier."""
+    latencies, correct = [], 0
+    for i, record in enumerate(records):
+        latency, ok = record["latency_s"], record["correct"]
+        if not record["valid"] and fallback is not None:
+            latency += fallback[i]["latency_s"]
+            ok = fallback[i]["correct"]
+        latencies.append(latency)
+        correct += ok
+    return {"correct": round(correct / (len(records) or 1), 3), "latency_ms": summarize_ms(latencies)}
+
+
+def run_route(route: str, tiers: List[str], repeat: int, pause_s: float) -> Dict[str, Any]:
+    from utility.ModelRouter import model_router
+
+    factory, call, check, cases = ROUTES[route]()
+    cases = [case for case in cases for _ in range(repeat)]
+    per_tier: Dict[str, List[Dict[str, Any]]] = {}
+    for tier in tiers:
+        component = factory(model_router.tiers[tier])
+        records = []
+        for case in cases:
+            records.append(run_case(component, call, check, case))
+            if pause_s:
+                time.sleep(pause_s)
+        per_tier[tier] = records
+        summary = summarize(records)
+        print(f"{route:20s} {tier:8s} valid {summary['valid']:.0%}  correct {summary['correct']:.0%}  "
+              f"p50 {summary['latency_ms'].get('p50', 0):8.1f} ms")
+
+    order = model_router.escalation
+    results = {}
+    for tier, records in per_tier.items():
+        results[tier] = summarize(records)
+        larger = order[order.index(tier) + 1] if tier in order[:-1] else None
+        if larger in per_tier:
+            results[tier]["routed"] = routed(records, per_tier[larger])
+    return {
+        "configured_tier": model_router.tier_for(route),
+        "models": {tier: model_router.tiers[tier] for tier in tiers},
+        "tiers": results,
+    }
+
+
+def render_markdown(report: Dict[str, Any]) -> str:
+    lines = [
+        "# Model tier benchmark",
+        "",
+        f"Revision: `{report['revision'] or 'unknown'}`",
+        "",
+        "| setting | value |",
+        "|---|---|",
+    ]
+    lines += [f"| {key} | {value} |" for key, value in sorted(report["config"].items())]
+    lines += [
+        "",
+        "| route | tier | model | cases | valid | correct | p50 ms | p95 ms | routed correct | routed p50 ms | routed p95 ms |",
+        "|---|---|---|---:|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for route, r in report["results"].items():
+        for tier, t in r["tiers"].items():
+            marker = " (configured)" if tier == r["configured_tier"] else ""
+            via = t.get("routed")
+            routed_cells = (f"{via['correct']:.0%} | {via['latency_ms'].get('p50', 0):.1f} | "
+                            f"{via['latency_ms'].get('p95', 0):.1f}") if via else "- | - | -"
+            lines.append(f"| {route} | {tier}{marker} | {r['models'][tier]} | {t['cases']} | {t['valid']:.0%} | "
+                         f"{t['correct']:.0%} | {t['latency_ms'].get('p50', 0):.1f} | "
+                         f"{t['latency_ms'].get('p95', 0):.1f} | {routed_cells} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and quality of each model tier per routed call site.")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated routes to measure")
+    parser.add_argument("--tiers", help="comma-separated tiers (default: every tier in the routing file)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case and tier")
+    parser.add_argument("--pause-s", type=float, default=2.0, help="pause between calls (Groq allows 30/min)")
+    parser.add_argument("--stub", action="store_true", help="use the local Groq stand-in (harness check only)")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's INFO logging")
+    parser.add_argument("--output-dir", default=os.path.join("Artifacts", "benchmarks"))
+    args = parser.parse_args()
+
+    stub = None
+    if args.stub:
+        stub = start_stub_server(0.0, 0.0, 0.0)
+        os.environ["GROQ_BASE_URL"] = f"http://127.0.0.1:{stub.server_address[1]}"
+        os.environ.setdefault("GROQ_API_KEY", "benchmark")
+        args.pause_s = 0.0
+    elif not os.getenv("GROQ_API_KEY"):
+        sys.exit("GROQ_API_KEY is not set (use --stub to check the harness without it).")
+
+    import logging
+    from Logging.logger import logger
+    from utility.Governor import governor
+    from utility.ModelRouter import model_router
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.stub:
+        governor.limiter("groq").configure(rate=0)
+    model_router.escalation_enabled = False  # measure each tier on its own
+    record_outcomes()
+
+    routes = [r.strip() for r in args.routes.split(",") if r.strip()]
+    unknown = [r for r in routes if r not in ROUTES]
+    if unknown:
+        sys.exit(f"Unknown routes {unknown}; choose from {list(ROUTES)}.")
+    tiers = [t.strip() for t in args.tiers.split(",")] if args.tiers else list(model_router.escalation or model_router.tiers)
+    missing = [t for t in tiers if t not in model_router.tiers]
+    if missing:
+        sys.exit(f"Unknown tiers {missing}; the routing file defines {list(model_router.tiers)}.")
+
+    results = {route: run_route(route, tiers, args.repeat, args.pause_s) for route in routes}
+    if stub is not None:
+        stub.shutdown()
+
+    report = {
+        "revision": git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output_dir", "verbose")},
+        "results": results,
+    }
+    output_dir = os.path.abspath(args.output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "model_tier_benchmark.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(output_dir, "model_tier_benchmark.md"), "w", encoding="utf-8") as f:
+        f.write(render_markdown(report))
+    print(f"Reports written to {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,544 @@
+'''
+pipeline_benchmark.py - End-to-end latency benchmark for the query path (Pipeline.run and POST /start).
+
+Every external dependency is replaced by a deterministic local stand-in:
+- Groq:       an OpenAI-compatible /openai/v1/chat/completions stub (GROQ_BASE_URL) that answers the
+              extractor, planner, schema generator and formatter prompts
+- embeddings: the /embed stub of benchmarks/ingestion_benchmark.py (EMBEDDING_API_URL)
+- Nominatim:  a /search stub (LocationNormalizer.NOMINATIM_URL)
+- MCP + Astra: one local FastMCP server per registry endpoint; each tool sleeps for the configured
+              vector-search latency and returns a canned payload, so the real MCP client path
+              (session handshake, list_tools, call_tool) is exercised
+
+The benchmark runs from a scratch directory holding a copy of Meta/tool_registry.json that points
+at the local MCP servers, so the logs, traces and debug traces under Artifacts/ stay out of the tree.
+
+Per-request stage timings (wall clock, summed when a stage runs more than once per request):
+metadata_extraction (includes geocoding), geocoding, tool_mapper_init, tool_mapping, cache_lookup,
+planning, schema_generation, mcp_connect, mcp_list_tools, mcp_call, formatting. Stages that block
+the event loop are charged for whatever else the loop ran meanwhile, which is exactly how
+concurrent users experience them.
+
+Each concurrency level (1-256 by default) is run against Pipeline.run and/or the FastAPI /start
+endpoint (in-process over httpx.ASGITransport). Results go to a JSON report and a Markdown
+summary with stable ordering, so two reports diff cleanly across versions. With --baseline, exits
+non-zero if requests/sec dropped or p95 latency grew by more than --tolerance at any level.
+
+Usage: python -m benchmarks.pipeline_benchmark [--mode both] [--concurrency 1,4,16,64,256]
+       [--llm-latency-ms 40] [--tool-latency-ms 30] [--output-dir Artifacts/benchmarks]
+       [--baseline old.json]
+'''
+
+import io
+import os
+import re
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+import tempfile
+import functools
+import threading
+import contextlib
+import subprocess
+import contextvars
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+from benchmarks.stats import summarize_ms, compare_to_baseline  # noqa: E402
+from benchmarks.ingestion_benchmark import stub_vector  # noqa: E402
+
+STAGES = (
+    "metadata_extraction", "geocoding", "tool_mapper_init", "tool_mapping", "cache_lookup",
+    "planning", "schema_generation", "mcp_connect", "mcp_list_tools", "mcp_call", "formatting",
+)
+
+QUERIES = (
+    "Explain the PMEGP scheme for a first-time manufacturer in Bengaluru",
+    "Am I eligible for the Stand-Up India scheme as a woman entrepreneur in Pune?",
+    "Which are the top countries importing capacitors from India?",
+    "What subsidies are available for semiconductor units in Gujarat?",
+    "Give me an investment insight on the electronics component manufacturing scheme",
+    "Analyse export trends of printed circuit boards from Chennai",
+    "What is the credit guarantee scheme for micro enterprises?",
+    "Check my eligibility for the Karnataka ESDM policy incentives",
+)
+
+PLACES = {
+    "bengaluru": ("Bengaluru", "Karnataka"), "pune": ("Pune", "Maharashtra"),
+    "gujarat": (None, "Gujarat"), "chennai": ("Chennai", "Tamil Nadu"), "karnataka": (None, "Karnataka"),
+}
+
+SCHEMES = ("PMEGP", "Stand-Up India", "ESDM", "credit guarantee", "electronics component manufacturing")
+
+
+# --- Stub responses ---
+
+def _current_query(user_message: str) -> str:
+    marker = "Current query:"
+    return user_message.rsplit(marker, 1)[-1].strip() if marker in user_message else user_message.strip()
+
+
+def stub_metadata(query: str) -> Dict[str, Any]:
+    low = query.lower()
+    if "eligib" in low:
+        intents = ["check_eligibility"]
+    elif "import" in low or "export" in low:
+        intents = ["fetch_trade_data"]
+    elif "insight" in low or "invest" in low:
+        intents = ["generate_insight"]
+    elif "explain" in low or "what is" in low:
+        intents = ["explain_scheme"]
+    else:
+        intents = ["general_inquiry"]
+    entities: Dict[str, Any] = {}
+    for scheme in SCHEMES:
+        if scheme.lower() in low:
+            entities["scheme"] = scheme
+            break
+    location = next((place for place in PLACES if place in low), "unknown")
+    return {
+        "expanded_query": query,
+        "intents": intents,
+        "entities": entities,
+        "user_profile": {"user_type": "entrepreneur", "location": location},
+    }
+
+
+def stub_plan(user_message: str) -> Dict[str, Any]:
+    match = re.search(r'"tools_required":\s*(\[[^\]]*\])', user_message)
+    tools = json.loads(match.group(1)) if match else []
+    query = re.search(r'"query":\s*"([^"]*)"', user_message)
+    return {
+        "execution_type": "sequential",
+        "tasks": [{"tool": tool, "input": {"query": query.group(1) if query else ""}} for tool in tools],
+    }
+
+
+def stub_instance(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """Smallest value that validates against a (pydantic-generated) JSON schema."""
+    if "$ref" in schema:
+        return stub_instance(defs[schema["$ref"].rsplit("/", 1)[-1]], defs)
+    for key in ("anyOf", "allOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return stub_instance(options[0], defs)
+    kind = schema.get("type")
+    if kind == "object" or "properties" in schema:
+        required = set(schema.get("required", []))
+        return {name: stub_instance(prop, defs) for name, prop in schema.get("properties", {}).items()
+                if name in required}
+    if kind == "array":
+        return [stub_instance(schema.get("items", {"type": "string"}), defs)]
+    return {"integer": 1, "number": 1.0, "boolean": True, "null": None}.get(kind, "benchmark")
+
+
+def stub_schema_input(user_message: str) -> Dict[str, Any]:
+    match = re.search(r"fill the input for this schema:\s*(\{.*\})\s*Return only", user_message, re.S)
+    if not match:
+        return {}
+    schema = json.loads(match.group(1))
+    return stub_instance(schema, schema.get("$defs", {}))
+
+
+def stub_completion(system_message: str, user_message: str) -> str:
+    if "query understanding assistant" in system_message:
+        return json.dumps(stub_metadata(_current_query(user_message)))
+    if "planning assistant" in system_message:
+        return json.dumps(stub_plan(user_message))
+    if "populate structured input schemas" in system_message:
+        return json.dumps(stub_schema_input(user_message))
+    if "formats a tool's raw JSON output" in system_message:
+        return ("**Benchmark answer**\n\nA deterministic explanation used for latency measurement.\n\n"
+                "- point one\n- point two\n\n1. step one\n2. step two\n\nSources: benchmark.pdf")
+    return "OK"
+
+
+def stub_tool_output(tool_name: str) -> Dict[str, Any]:
+    return {
+        "insight_summary": f"{tool_name} benchmark result",
+        "detailed_explanation": "Deterministic tool output. " * 20,
+        "data_summary": ["item one", "item two", "item three"],
+        "actionable_steps": ["step one", "step two"],
+        "sources": ["benchmark.pdf"],
+    }
+
+
+# --- Local stand-ins ---
+
+def start_stub_server(llm_latency_s: float, embed_latency_s: float, geocode_latency_s: float) -> ThreadingHTTPServer:
+    """One HTTP server for the Groq, embedding and Nominatim stubs, routed by path."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, payload: Any):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.endswith("/chat/completions"):
+                messages = {m["role"]: m["content"] for m in body.get("messages", [])}
+                content = stub_completion(messages.get("system", ""), messages.get("user", ""))
+                if llm_latency_s:
+                    time.sleep(llm_latency_s)
+                self._send_json({
+                    "id": "chatcmpl-benchmark", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model", ""),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+                })
+            else:
+                if embed_latency_s:
+                    time.sleep(embed_latency_s)
+                self._send_json({"embedding": stub_vector(body.get("text", ""))})
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query).get("q", [""])[0].lower()
+            if geocode_latency_s:
+                time.sleep(geocode_latency_s)
+            place = next((PLACES[p] for p in PLACES if p in query), None)
+            if place is None:
+                self._send_json([])
+                return
+            self._send_json([{"address": {"city": place[0], "state": place[1], "country": "India"}}])
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_tool_servers(registry: Dict[str, Dict[str, Any]], latency_s: float) -> Dict[str, Dict[str, Any]]:
+    """
+    Serves one stub MCP tool per registry endpoint on a local uvicorn and returns a copy of the
+    registry pointing at it.
+    """
+    import uvicorn
+    from mcp.server.fastmcp import FastMCP
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+
+    def make_server(tool_name: str) -> FastMCP:
+        mcp = FastMCP(tool_name, stateless_http=True, log_level="WARNING")
+
+        @mcp.tool(name=tool_name)
+        async def stub_tool(schema_dict: dict) -> dict:
+            if latency_s:
+                await asyncio.sleep(latency_s)
+            return stub_tool_output(tool_name)
+
+        return mcp
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+
+    servers: Dict[str, FastMCP] = {}
+    local_registry = {}
+    for tool_name, entry in registry.items():
+        route = urlparse(entry["endpoint"]).path.rstrip("/")
+        route = route[:-len("/mcp")] if route.endswith("/mcp") else route
+        servers.setdefault(route, make_server(tool_name))
+        local_registry[tool_name] = {**entry, "endpoint": f"http://127.0.0.1:{port}{route}/mcp/"}
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        async with contextlib.AsyncExitStack() as stack:
+            for mcp in servers.values():
+                await stack.enter_async_context(mcp.session_manager.run())
+            yield
+
+    app = Starlette(routes=[Mount(route, mcp.streamable_http_app()) for route, mcp in servers.items()],
+                    lifespan=lifespan)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="warning", lifespan="on"))
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return local_registry
+
+
+# --- Stage instrumentation ---
+
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None)
+
+
+def _charge(stage: str, seconds: float):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def instrument(owner: Any, attr: str, stage: str, when: Optional[Callable[..., bool]] = None):
+    """Replaces owner.attr with a wrapper charging its wall time to `stage` of the current request."""
+    original = getattr(owner, attr)
+
+    if asyncio.iscoroutinefunction(original):
+        @functools.wraps(original)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await original(*args, **kwargs)
+            finally:
+                if when is None or when(*args, **kwargs):
+                    _charge(stage, time.perf_counter() - start)
+    else:
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                if when is None or when(*args, **kwargs):
+                    _charge(stage, time.perf_counter() - start)
+
+    setattr(owner, attr, wrapper)
+
+
+def install_instrumentation(geocode_delay_s: float, nominatim_url: str):
+    from mcp import ClientSession
+    from Meta.extractor import MetadataExtractor
+    from Meta.location_normalizer import LocationNormalizer
+    from Meta.tool_mapper import ToolMapper
+    from router.planner import Planner
+    from router.SchemaGenerator import SchemaGenerator
+    from Servers.pipeline import Pipeline
+    from utility.LLM import LLMClient
+    from utility.Governor import governor
+
+    LocationNormalizer.NOMINATIM_URL = nominatim_url
+    # The stubs have no provider quotas; keep the concurrency limits, pace geocoding as asked.
+    governor.limiter("groq").configure(rate=0)
+    governor.limiter("nominatim").configure(rate=1.0 / geocode_delay_s if geocode_delay_s > 0 else 0)
+
+    instrument(MetadataExtractor, "extract_metadata", "metadata_extraction")
+    instrument(LocationNormalizer, "normalize", "geocoding")
+    instrument(ToolMapper, "__init__", "tool_mapper_init")
+    instrument(ToolMapper, "map_tools", "tool_mapping")
+    instrument(Pipeline, "lookup_cache", "cache_lookup")
+    instrument(Planner, "build_plan", "planning")
+    instrument(SchemaGenerator, "generate_instance", "schema_generation")
+    instrument(ClientSession, "initialize", "mcp_connect")
+    instrument(ClientSession, "list_tools", "mcp_list_tools")
+    instrument(ClientSession, "call_tool", "mcp_call")
+    instrument(LLMClient, "run_chat", "formatting",
+               when=lambda self, system_message, *a, **k: "formats a tool's raw JSON output" in system_message)
+
+
+# --- Load generation ---
+
+async def run_level(mode: str, concurrency: int, total: int, client=None) -> Dict[str, Any]:
+    from Servers.pipeline import Pipeline
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    stage_samples: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    errors = 0
+
+    async def one(index: int):
+        nonlocal errors
+        query = QUERIES[index % len(QUERIES)]
+        async with semaphore:
+            timings: Dict[str, float] = {}
+            _request_timings.set(timings)  # each gathered coroutine runs in its own task/context
+            start = time.perf_counter()
+            try:
+                if mode == "pipeline":
+                    ok = await Pipeline(query).run() is not None
+                else:
+                    response = await client.post("/start", json={"user_query": query})
+                    ok = response.status_code == 200 and response.json().get("stage") != "FAILED"
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+            for stage, seconds in timings.items():
+                stage_samples.setdefault(stage, []).append(seconds)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    seconds = time.perf_counter() - start
+
+    latency = summarize_ms(latencies)
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "requests_per_sec": round(total / seconds, 3) if seconds else 0.0,
+        "p95_ms": latency.get("p95", 0.0),
+        "latency_ms": latency,
+        "stages_ms": {stage: summarize_ms(samples) for stage, samples in stage_samples.items() if samples},
+    }
+
+
+async def run_sweep(modes: List[str], levels: List[int], requests_per_user: int, min_requests: int,
+                    quiet: bool = True) -> Dict[str, Dict]:
+    import httpx
+    from Servers.backend import app
+
+    results: Dict[str, Dict] = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark",
+                                 timeout=None) as client:
+        for mode in modes:
+            for level in levels:
+                total = max(level * requests_per_user, min_requests)
+                # LLMClient prints every raw response; keep the progress lines readable.
+                with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                    result = await run_level(mode, level, total, client)
+                results[f"{mode}@{level}"] = result
+                print(f"{mode:<9} c={level:<4} {total:>5} req  {result['requests_per_sec']:>8.2f} req/s  "
+                      f"p50 {result['latency_ms'].get('p50', 0):>9.1f} ms  p95 {result['p95_ms']:>9.1f} ms  "
+                      f"errors {result['errors']}", flush=True)
+    return results
+
+
+# --- Reports ---
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def render_markdown(report: Dict[str, Any]) -> str:
+    results = report["results"]
+    lines = [
+        "# Pipeline latency benchmark",
+        "",
+        f"Revision: `{report['revision'] or 'unknown'}`",
+        "",
+        "| setting | value |",
+        "|---|---|",
+    ]
+    lines += [f"| {key} | {value} |" for key, value in sorted(report["config"].items())]
+    lines += [
+        "",
+        "## Throughput and latency",
+        "",
+        "| run | requests | errors | req/s | p50 ms | p95 ms | p99 ms | max ms |",
+        "|---|---:|---:|---:|---:|---:|---:|---:|",
+    ]
+    for name, r in results.items():
+        lat = r["latency_ms"]
+        lines.append(f"| {name} | {r['requests']} | {r['errors']} | {r['requests_per_sec']:.2f} | "
+                     f"{lat.get('p50', 0):.1f} | {lat.get('p95', 0):.1f} | {lat.get('p99', 0):.1f} | "
+                     f"{lat.get('max', 0):.1f} |")
+
+    stages = [s for s in STAGES if any(s in r["stages_ms"] for r in results.values())]
+    lines += [
+        "",
+        "## Stage p50 / p95 (ms)",
+        "",
+        "| run | " + " | ".join(stages) + " |",
+        "|---|" + "---:|" * len(stages),
+    ]
+    for name, r in results.items():
+        cells = []
+        for stage in stages:
+            s = r["stages_ms"].get(stage)
+            cells.append(f"{s['p50']:.1f} / {s['p95']:.1f}" if s else "-")
+        lines.append(f"| {name} | " + " | ".join(cells) + " |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline latency benchmark with local stubs.")
+    parser.add_argument("--mode", choices=["pipeline", "api", "both"], default="both")
+    parser.add_argument("--concurrency", default="1,4,16,64,256", help="comma-separated concurrent users")
+    parser.add_argument("--requests-per-user", type=int, default=1)
+    parser.add_argument("--min-requests", type=int, default=16, help="lower bound on requests per level")
+    parser.add_argument("--llm-latency-ms", type=float, default=40.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=5.0)
+    parser.add_argument("--geocode-latency-ms", type=float, default=50.0)
+    parser.add_argument("--geocode-delay-s", type=float, default=0.0,
+                        help="minimum interval between Nominatim requests (production default is 1.0)")
+    parser.add_argument("--tool-latency-ms", type=float, default=30.0, help="MCP tool body / Astra search time")
+    parser.add_argument("--semantic-cache", action="store_true", help="leave the semantic cache enabled")
+    parser.add_argument("--verbose", action="store_true", help="keep the application's INFO logging and prints")
+    parser.add_argument("--output-dir", default=os.path.join("Artifacts", "benchmarks"))
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed regression vs baseline")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    modes = ["pipeline", "api"] if args.mode == "both" else [args.mode]
+    output_dir = os.path.abspath(args.output_dir)
+    baseline = os.path.abspath(args.baseline) if args.baseline else None
+
+    with open(os.path.join(REPO_ROOT, "Meta", "tool_registry.json"), "r", encoding="utf-8") as f:
+        registry = json.load(f)
+
+    stub = start_stub_server(args.llm_latency_ms / 1000.0, args.embed_latency_ms / 1000.0,
+                             args.geocode_latency_ms / 1000.0)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    os.environ["GROQ_BASE_URL"] = stub_url
+    os.environ.setdefault("GROQ_API_KEY", "benchmark")
+    os.environ["EMBEDDING_API_URL"] = f"{stub_url}/embed"
+    os.environ["SEMANTIC_CACHE_ENABLED"] = "true" if args.semantic_cache else "false"
+    local_registry = start_tool_servers(registry, args.tool_latency_ms / 1000.0)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "Meta"))
+        with open(os.path.join(workdir, "Meta", "tool_registry.json"), "w", encoding="utf-8") as f:
+            json.dump(local_registry, f, indent=2)
+        os.chdir(workdir)  # before the project imports: the logger and registry resolve paths from cwd
+
+        import logging
+        from Logging.logger import logger
+        if not args.verbose:
+            logger.setLevel(logging.WARNING)
+            logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        install_instrumentation(args.geocode_delay_s, f"{stub_url}/search")
+        results = asyncio.run(run_sweep(modes, levels, args.requests_per_user, args.min_requests,
+                                      quiet=not args.verbose))
+        os.chdir(REPO_ROOT)
+
+    stub.shutdown()
+    report = {
+        "revision": git_revision(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output_dir", "baseline", "verbose")},
+        "results": results,
+        "rss_high_water_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    json_path = os.path.join(output_dir, "pipeline_benchmark.json")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    with open(os.path.join(output_dir, "pipeline_benchmark.md"), "w", encoding="utf-8") as f:
+        f.write(render_markdown(report))
+    print(f"Reports written to {output_dir}")
+
+    if baseline:
+        regressions = compare_to_baseline(results, baseline, "requests_per_sec", args.tolerance)
+        regressions += compare_to_baseline(results, baseline, "p95_ms", args.tolerance, higher_is_better=False)
+        if regressions:
+            print("Regressions:\n  " + "\n  ".join(regressions))
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+'''
+stats.py - Shared helpers for the benchmark scripts: latency summaries and baseline comparison.
+'''
+
+import json
+from typing import Dict, Iterable, List, Optional
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100.0
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+def summarize_ms(latencies_s: Iterable[float]) -> Dict[str, float]:
+    values = sorted(v * 1000.0 for v in latencies_s)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(values[-1], 3),
+    }
+
+
+def compare_to_baseline(current: Dict[str, Dict], baseline_path: str, metric: str, tolerance: float,
+                        higher_is_better: bool = True) -> List[str]:
+    """
+    Compares `metric` of every entry in `current` with the same entry in a previous JSON report.
+    Returns one message per regression beyond `tolerance` (a fraction, e.g. 0.2 = 20%).
+    """
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    baseline_entries: Dict[str, Dict] = baseline.get("stages") or baseline.get("results") or {}
+
+    regressions = []
+    for name, entry in current.items():
+        old: Optional[float] = (baseline_entries.get(name) or {}).get(metric)
+        new: Optional[float] = entry.get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        if regressed:
+            regressions.append(f"{name}: {metric} {old:.3f} -> {new:.3f} ({change:+.1%})")
+    return regressions
@@ -0,0 +1,123 @@
+'''
+trade_parser_benchmark.py - Rows/sec of data.trade_parser versus the BeautifulSoup parser it replaced.
+
+Runs over recorded table pages (*.html files holding the `div#datamodule tbody` markup) when
+--pages is given, otherwise over synthetic pages shaped like the site's tables (links, entities,
+thousands separators and a few malformed rows). Both parsers must produce identical records.
+
+Usage: python -m benchmarks.trade_parser_benchmark [--pages DIR] [--num-pages 2000] [--repeat 3]
+'''
+
+import os
+import sys
+import glob
+import time
+import random
+import argparse
+from typing import List
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data.trade_parser import parse_rows  # noqa: E402
+
+PORTS = ["Nhava Sheva Sea", "Chennai Sea", "Delhi Air Cargo", "Mundra", "Bangalore Air"]
+DESTINATIONS = ["Singapore", "Dubai", "Hamburg", "New York", "Colombo", "Jebel Ali"]
+ITEMS = [
+    "CERAMIC CAPACITOR 10UF 25V X5R 0805",
+    "ELECTROLYTIC CAPACITOR &amp; ACCESSORIES (PARTS)",
+    "<a href=\"/product/capacitor\">FILM CAPACITOR</a> 0.1UF 630V",
+    "TANTALUM CAPACITOR, SMD &quot;TYPE-B&quot;",
+]
+
+
+def reference_parse(html_content):
+    """The BeautifulSoup html.parser implementation previously in data/ingestion.py."""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    rows = soup.find_all('tr')
+    scraped_data = []
+    for row in rows:
+        cols = [ele.text.strip() for ele in row.find_all('td')]
+        if len(cols) == 9:
+            try:
+                scraped_data.append({
+                    "trade_date": cols[0],
+                    "indian_port": cols[1],
+                    "cth": int(cols[2]),
+                    "item_description": cols[3],
+                    "quantity": int(cols[4].replace(',', '')),
+                    "uqc": cols[5],
+                    "unit_price_usd": float(cols[6].replace(',', '')),
+                    "fob_usd": float(cols[7].replace(',', '')),
+                    "destination_port": cols[8]
+                })
+            except (ValueError, IndexError):
+                pass
+    return scraped_data
+
+
+def synthetic_page(rng: random.Random, rows: int = 25) -> str:
+    out = []
+    for _ in range(rows):
+        quantity = rng.randint(1, 250000)
+        price = round(rng.uniform(0.01, 900), 2)
+        cells = [
+            f"{rng.randint(1, 28):02d}-{rng.choice(['Jan', 'Feb', 'Mar', 'Apr'])}-2024",
+            rng.choice(PORTS),
+            str(rng.choice([85321000, 85322100, 85322200, 85329000])),
+            rng.choice(ITEMS),
+            f"{quantity:,}",
+            rng.choice(["NOS", "KGS", "PCS"]),
+            f"{price:,.2f}",
+            f"{quantity * price:,.2f}",
+            rng.choice(DESTINATIONS),
+        ]
+        if rng.random() < 0.02:
+            cells[4] = "N/A"  # rejected by both parsers
+        out.append("<tr class=\"row\">" + "".join(f"<td class=\"c{i}\">\n  {c}\n</td>" for i, c in enumerate(cells)) + "</tr>")
+    return "<tr><th>Date</th><th>Port</th></tr>" + "\n".join(out)
+
+
+def load_pages(args) -> List[str]:
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append(f.read())
+        if not pages:
+            sys.exit(f"No *.html pages found in {args.pages}")
+        return pages
+    rng = random.Random(42)
+    return [synthetic_page(rng) for _ in range(args.num_pages)]
+
+
+def run(name: str, parser, pages: List[str], repeat: int):
+    best, rows = float("inf"), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = sum(len(parser(page)) for page in pages)
+        best = min(best, time.perf_counter() - start)
+    print(f"{name:<16} {rows:>8} rows  {best:8.3f}s  {rows / best:>12,.0f} rows/s")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--pages", help="directory of recorded table HTML pages")
+    parser.add_argument("--num-pages", type=int, default=2000, help="synthetic pages when --pages is not given")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args)
+    mismatches = sum(reference_parse(page) != parse_rows(page) for page in pages)
+    if mismatches:
+        sys.exit(f"Parsers disagree on {mismatches}/{len(pages)} pages")
+    print(f"{len(pages)} pages, outputs identical.")
+
+    slow = run("beautifulsoup", reference_parse, pages, args.repeat)
+    fast = run("trade_parser", parse_rows, pages, args.repeat)
+    print(f"speedup: {slow / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
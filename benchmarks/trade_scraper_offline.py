@@ -0,0 +1,188 @@
+'''
+trade_scraper_offline.py - Runs data/ingestion.py against saved exportimportdata.in pages.
+
+A local HTTP server serves the fixtures in benchmarks/fixtures/trade (one directory per HS code,
+page-N.html; any other page is the site's empty table) at the site's URLs, and pager.js stands
+in for the site's "next" button. Rows go to an in-memory collection, the checkpoint to a
+temporary file. Scenarios:
+
+- fanout:        pages fetched by direct URL (TRADE_PAGE_URL_TEMPLATE) across all contexts
+- fanout_slow:   the same, with one page whose table never loads in time; that page must be left
+                 for the next run without truncating its HS code
+- fanout_resume: a second run over the fanout_slow checkpoint picks up only the missed page
+- walk:          pages walked with the "next" button
+- walk_resume:   a second run over a complete checkpoint scrapes nothing
+
+Each scenario checks the stored rows and the checkpoint against the fixtures, and the script
+exits non-zero on any mismatch. Needs Playwright's Chromium (`playwright install chromium`).
+
+Usage: python -m benchmarks.trade_scraper_offline [--concurrency 3] [--slow-page 8541:2]
+'''
+
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.ingestion_benchmark import InMemoryCollection  # noqa: E402
+from data import ingestion  # noqa: E402
+from data.trade_parser import parse_rows, record_id  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "trade")
+PAGE_PATH_RE = re.compile(r"/export-(\d+)-hs-code")
+# A slow page's table must miss the scraper's deadline, so the stalled request outlives it.
+TABLE_TIMEOUT_MS = 1500
+STALL_S = 5.0
+
+
+def fixture_pages() -> Dict[str, int]:
+    """HS code -> number of fixture pages."""
+    pages = {}
+    for hs_code in sorted(os.listdir(FIXTURE_DIR)):
+        directory = os.path.join(FIXTURE_DIR, hs_code)
+        if os.path.isdir(directory):
+            pages[hs_code] = len([f for f in os.listdir(directory) if re.fullmatch(r"page-\d+\.html", f)])
+    return pages
+
+
+def expected_ids(hs_code: str) -> set:
+    ids = set()
+    for page in range(1, fixture_pages()[hs_code] + 1):
+        with open(os.path.join(FIXTURE_DIR, hs_code, f"page-{page}.html"), encoding="utf-8") as f:
+            records = ingestion.normalize_records(parse_rows(f.read()))
+        ids.update(record_id(r) for r in records)
+    return ids
+
+
+def start_fixture_server(slow_page: Optional[Tuple[str, int]]) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/stall":
+                # Keeps the slow page from finishing its load, like a table still being fetched.
+                time.sleep(STALL_S)
+                return self._send(b"", "image/gif")
+            if url.path == "/pager.js":
+                return self._send(self._read(os.path.join(FIXTURE_DIR, "pager.js")), "application/javascript")
+            match = PAGE_PATH_RE.fullmatch(url.path)
+            if not match:
+                self.send_error(404)
+                return
+            hs_code = match.group(1)
+            page = int(parse_qs(url.query).get("page", ["1"])[0])
+            path = os.path.join(FIXTURE_DIR, hs_code, f"page-{page}.html")
+            if not os.path.exists(path):
+                path = os.path.join(FIXTURE_DIR, "empty.html")
+            body = self._read(path)
+            if slow_page == (hs_code, page):
+                body = re.sub(rb"(<tbody>).*?(</tbody>)", rb"\1\2", body, flags=re.S)
+                body = body.replace(b"</body>", b'<img src="/stall"></body>')
+            self._send(body, "text/html; charset=utf-8")
+
+        @staticmethod
+        def _read(path: str) -> bytes:
+            with open(path, "rb") as f:
+                return f.read()
+
+        def _send(self, body: bytes, content_type: str):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def configure(base_url: str, fanout: bool):
+    ingestion.TRADE_BASE_URL = base_url
+    ingestion.TRADE_PAGE_URL_TEMPLATE = "{base}/export-{hs_code}-hs-code?page={page}" if fanout else None
+    ingestion.TRADE_REQUEST_INTERVAL = 0.0
+    ingestion.TRADE_TABLE_TIMEOUT_MS = TABLE_TIMEOUT_MS
+
+
+def check(name: str, collection: InMemoryCollection, checkpoint, hs_codes: List[str],
+          missing: Optional[Tuple[str, int]] = None) -> List[str]:
+    """Compares stored rows and checkpoint state with the fixtures, allowing for one missed page."""
+    failures = []
+    pages = fixture_pages()
+    for hs_code in hs_codes:
+        want = expected_ids(hs_code)
+        if missing and missing[0] == hs_code:
+            with open(os.path.join(FIXTURE_DIR, hs_code, f"page-{missing[1]}.html"), encoding="utf-8") as f:
+                want -= {record_id(r) for r in ingestion.normalize_records(parse_rows(f.read()))}
+        got = {doc_id for doc_id, doc in collection.docs.items() if str(doc["cth"]).startswith(hs_code)}
+        if got != want:
+            failures.append(f"{name}: {hs_code} stored {len(got)} rows, expected {len(want)}")
+        if checkpoint.last_page(hs_code) != pages[hs_code]:
+            failures.append(f"{name}: {hs_code} last_page {checkpoint.last_page(hs_code)}, expected {pages[hs_code]}")
+        complete = not (missing and missing[0] == hs_code)
+        if checkpoint.is_complete(hs_code) != complete:
+            failures.append(f"{name}: {hs_code} complete={checkpoint.is_complete(hs_code)}, expected {complete}")
+    return failures
+
+
+async def run_scenarios(hs_codes: List[str], concurrency: int, slow_page: Tuple[str, int]) -> List[str]:
+    failures = []
+    max_pages = max(fixture_pages().values()) + 2
+
+    async def scrape(name, server, fanout, collection, checkpoint, missing=None):
+        configure(f"http://127.0.0.1:{server.server_address[1]}", fanout)
+        start = time.perf_counter()
+        report = await ingestion.scrape_hs_codes(hs_codes, collection, concurrency=concurrency,
+                                                 max_pages=max_pages, checkpoint=checkpoint)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<14}{report.scraped:>8}{report.new:>6}{report.rejected:>10}{elapsed:>10.2f}")
+        failures.extend(check(name, collection, checkpoint, hs_codes, missing))
+        return report
+
+    print(f"{'scenario':<14}{'scraped':>8}{'new':>6}{'rejected':>10}{'seconds':>10}")
+    fast, slow = start_fixture_server(None), start_fixture_server(slow_page)
+    with tempfile.TemporaryDirectory() as workdir:
+        await scrape("fanout", fast, True, InMemoryCollection(),
+                     ingestion.ScrapeCheckpoint(os.path.join(workdir, "fanout.json")))
+
+        collection = InMemoryCollection()
+        checkpoint = ingestion.ScrapeCheckpoint(os.path.join(workdir, "slow.json"))
+        await scrape("fanout_slow", slow, True, collection, checkpoint, missing=slow_page)
+        await scrape("fanout_resume", fast, True, collection, checkpoint)
+
+        collection = InMemoryCollection()
+        checkpoint = ingestion.ScrapeCheckpoint(os.path.join(workdir, "walk.json"))
+        await scrape("walk", fast, False, collection, checkpoint)
+        report = await scrape("walk_resume", fast, False, collection, checkpoint)
+        if report.scraped:
+            failures.append(f"walk_resume: scraped {report.scraped} rows from a complete checkpoint")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline run of the trade scraper against saved pages.")
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--slow-page", default="8541:2", help="HS_CODE:PAGE whose table never loads in time")
+    args = parser.parse_args()
+
+    hs_code, page = args.slow_page.split(":")
+    failures = asyncio.run(run_scenarios(list(fixture_pages()), args.concurrency, (hs_code, int(page))))
+    if failures:
+        print("Failures:\n  " + "\n  ".join(failures))
+        sys.exit(1)
+    print("All scenarios match the fixtures.")
+
+
+if __name__ == "__main__":
+    main()
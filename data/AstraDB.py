@@ -1,5 +1,7 @@
 import sys
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 from Logging.logger import logger
@@ -9,13 +11,38 @@ from astrapy.constants import VectorMetric
 from astrapy.info import CollectionDefinition, CollectionVectorOptions
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from utility.Embedder import HFAPIEmbeddings
+from utility.Embedder import HFAPIEmbeddings, get_embeddings
+from utility.SemanticCache import mark_ingestion
+from data.IngestionManifest import (
+    IngestionManifest, file_sha256, chunk_id, insert_many_skip_existing, STATUS_DONE, STATUS_FAILED
+)
+import httpx
 import asyncio
 import nest_asyncio
 nest_asyncio.apply()
 load_dotenv()
 
 
+def chunk_pdf_file(file_path: str, chunk_size: int = 500, chunk_overlap: int = 100) -> List[Dict[str, Any]]:
+    """Loads and splits one PDF. Module-level so it can run in a worker process."""
+    loader = PyPDFLoader(file_path)
+    documents = loader.load()
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=["\n\n", ".", "!", "?"]
+    )
+    split_docs = splitter.split_documents(documents)
+    chunks = []
+    for doc in split_docs:
+        chunks.append({
+            "file_name": os.path.basename(file_path),
+            "text": doc.page_content.strip(),
+            "metadata": doc.metadata,
+        })
+    return chunks
+
+
 class AstraDB:
     DEFAULT_DIMENSION = 384
 
@@ -55,21 +82,7 @@ class AstraDB:
     def load_and_chunk_pdf(self, file_path: str, chunk_size: int = 500, chunk_overlap: int = 100) -> List[Dict[str, Any]]:
         try:
             logger.info(f"Loading and splitting PDF: {file_path}")
-            loader = PyPDFLoader(file_path)
-            documents = loader.load()
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=chunk_size,
-                chunk_overlap=chunk_overlap,
-                separators=["\n\n", ".", "!", "?"]
-            )
-            split_docs = splitter.split_documents(documents)
-            chunks = []
-            for doc in split_docs:
-                chunks.append({
-                    "file_name": os.path.basename(file_path),
-                    "text": doc.page_content.strip(),
-                    "metadata": doc.metadata,
-                })
+            chunks = chunk_pdf_file(file_path, chunk_size, chunk_overlap)
             logger.info(f"Split {os.path.basename(file_path)} into {len(chunks)} chunks.")
             return chunks
         except Exception as e:
@@ -81,7 +94,7 @@ class AstraDB:
             logger.info(f"Vectorizing {len(chunks)} text chunks via HF API...")
             texts = [chunk["text"] for chunk in chunks]
             # Call HF API for embeddings
-            embeddings = asyncio.run(self.embedding_model.embed_documents(texts))
+            embeddings = self.embedding_model.embed_documents(texts)
             vectorized_docs = []
             for i, chunk in enumerate(chunks):
                 doc = {
@@ -110,21 +123,132 @@ class AstraDB:
             logger.error(f"Failed to push data to AstraDB: {e}")
             raise UdayamitraException("Failed to push data to AstraDB", sys)
 
+    async def _embed_and_insert(self, collection, file_name: str, batch: List[Dict[str, Any]],
+                                manifest: IngestionManifest, client: httpx.AsyncClient,
+                                semaphore: asyncio.Semaphore) -> int:
+        async with semaphore:
+            # One embedding request per insert batch, not one per chunk.
+            vectors = await get_embeddings([c["text"] for c in batch], client=client)
+            docs = [{**c, "$vector": v} for c, v in zip(batch, vectors)]
+            await asyncio.to_thread(insert_many_skip_existing, collection, docs)
+        # Record progress per batch so a crash only repeats the batches in flight.
+        manifest.add_chunks(file_name, [d["_id"] for d in docs])
+        return len(docs)
+
+    async def _ingest_file(self, collection, file_name: str, content_hash: str, chunks: List[Dict[str, Any]],
+                           manifest: IngestionManifest, client: httpx.AsyncClient,
+                           semaphore: asyncio.Semaphore, batch_size: int) -> int:
+        stale_ids = manifest.stale_chunk_ids(file_name, content_hash)
+        if stale_ids:
+            await asyncio.to_thread(collection.delete_many, {"_id": {"$in": stale_ids}})
+            logger.info(f"Deleted {len(stale_ids)} chunks of the previous version of {file_name}.")
+        done_ids = set(manifest.start(file_name, content_hash))
+
+        pending = []
+        for index, chunk in enumerate(chunks):
+            cid = chunk_id(file_name, index, chunk["text"])
+            if cid not in done_ids:
+                pending.append({**chunk, "_id": cid, "chunk_index": index})
+        if done_ids:
+            logger.info(f"Resuming {file_name}: {len(done_ids)} chunks already stored, {len(pending)} to go.")
+
+        batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        counts = await asyncio.gather(
+            *(self._embed_and_insert(collection, file_name, batch, manifest, client, semaphore) for batch in batches)
+        )
+        manifest.finish(file_name, STATUS_DONE, chunk_count=len(chunks))
+        return sum(counts)
+
+    async def ingest_directory(self, directory_path: str, max_workers: int = 4, embed_concurrency: int = 4,
+                               batch_size: int = 32) -> Dict[str, int]:
+        """
+        Streaming ingestion: PDFs are parsed in a process pool, chunks are embedded in bounded
+        concurrent batches and inserted batch by batch. Progress is tracked in a local manifest,
+        so unchanged files are skipped and an interrupted run resumes where it stopped.
+        """
+        self.create_collection()
+        collection = self.database.get_collection(self.collection_name)
+        manifest = IngestionManifest(self.collection_name)
+
+        pdf_files = sorted(
+            os.path.join(directory_path, f)
+            for f in os.listdir(directory_path)
+            if f.lower().endswith(".pdf")
+        )
+        present = {os.path.basename(p) for p in pdf_files}
+        removed = 0
+        for source in manifest.sources():
+            if source not in present:
+                stale_ids = manifest.get(source).get("chunk_ids", [])
+                if stale_ids:
+                    await asyncio.to_thread(collection.delete_many, {"_id": {"$in": stale_ids}})
+                removed += len(stale_ids)
+                manifest.remove(source)
+                logger.info(f"{source} was removed from {directory_path}; deleted its {len(stale_ids)} chunks.")
+
+        todo = []
+        for path in pdf_files:
+            content_hash = await asyncio.to_thread(file_sha256, path)
+            if manifest.is_done(os.path.basename(path), content_hash):
+                continue
+            todo.append((path, content_hash))
+        logger.info(f"Found {len(pdf_files)} PDFs in {directory_path}; {len(todo)} new or changed.")
+
+        summary = {"files": len(pdf_files), "skipped": len(pdf_files) - len(todo), "ingested": 0, "failed": 0,
+                   "chunks": 0, "deleted": removed}
+        if not todo:
+            if removed:
+                mark_ingestion()
+            return summary
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(embed_concurrency)
+        # Bounds how many parsed-but-not-yet-ingested files are held in memory.
+        parse_slots = asyncio.Semaphore(max_workers * 2)
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            async def parse(path: str, content_hash: str):
+                await parse_slots.acquire()
+                try:
+                    return path, content_hash, await loop.run_in_executor(pool, chunk_pdf_file, path), None
+                except Exception as e:
+                    return path, content_hash, None, e
+
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                parse_tasks = [asyncio.create_task(parse(path, content_hash)) for path, content_hash in todo]
+                # Handle files as soon as their parse finishes; the pool keeps parsing the rest meanwhile.
+                for finished in asyncio.as_completed(parse_tasks):
+                    path, content_hash, chunks, error = await finished
+                    file_name = os.path.basename(path)
+                    try:
+                        if error:
+                            raise error
+                        count = await self._ingest_file(
+                            collection, file_name, content_hash, chunks, manifest, client, semaphore, batch_size
+                        )
+                        summary["ingested"] += 1
+                        summary["chunks"] += count
+                        logger.info(f"Ingested {count} chunks from {file_name}.")
+                    except Exception as e:
+                        summary["failed"] += 1
+                        logger.error(f"Failed to ingest {file_name}: {e}", exc_info=True)
+                        manifest.finish(file_name, STATUS_FAILED, error=str(e))
+                    finally:
+                        parse_slots.release()
+
+        if summary["chunks"] or removed:
+            mark_ingestion()
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"Ingestion finished in {elapsed:.1f}s: {summary['ingested']} files, {summary['chunks']} chunks, "
+            f"{summary['skipped']} skipped, {summary['failed']} failed."
+        )
+        return summary
+
     def process_and_push_directory(self, directory_path: str):
         try:
-            pdf_files = [
-                os.path.join(directory_path, f)
-                for f in os.listdir(directory_path)
-                if f.lower().endswith(".pdf")
-            ]
-            logger.info(f"Found {len(pdf_files)} PDFs in {directory_path}.")
-            all_docs = []
-            for file in pdf_files:
-                chunks = self.load_and_chunk_pdf(file)
-                vectorized = self.vectorize_chunks(chunks)
-                all_docs.extend(vectorized)
-            self.push_to_collection(all_docs)
-            logger.info(f"Successfully ingested {len(all_docs)} chunks from {len(pdf_files)} PDFs into AstraDB.")
+            return asyncio.run(self.ingest_directory(directory_path))
         except Exception as e:
             logger.error(f"Failed to process directory '{directory_path}': {e}")
-            raise UdayamitraException("Failed to process directory", sys)
\ No newline at end of file
+            raise UdayamitraException("Failed to process directory", sys)
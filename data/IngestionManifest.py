@@ -0,0 +1,224 @@
+'''
+IngestionManifest.py - Local record of what has been ingested into a collection.
+
+Maps each source file to its content hash, ingestion status and the ids of the chunks already
+written, so reruns skip unchanged files and a crashed run resumes where it stopped.
+
+sync_source / prune_sources apply the same bookkeeping to LangChain vector stores: only chunks
+whose deterministic id is new are upserted, chunks that disappeared are deleted, and sources
+that no longer exist on disk lose all their chunks.
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+
+from astrapy.exceptions import CollectionInsertManyException
+
+from Logging.logger import logger
+
+MANIFEST_DIR = os.getenv("INGESTION_MANIFEST_DIR", os.path.join("Artifacts", "ingestion"))
+
+STATUS_PENDING = "pending"
+STATUS_IN_PROGRESS = "in_progress"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def combined_hash(hashes: Iterable[str]) -> str:
+    """Content hash of a source built from several files."""
+    return hashlib.sha256("".join(sorted(hashes)).encode("utf-8")).hexdigest()
+
+
+def chunk_id(source: str, chunk_index: int, content: str) -> str:
+    """Deterministic chunk id: the same chunk of the same file always maps to the same document."""
+    payload = f"{source}\x00{chunk_index}\x00{content}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+def insert_many_skip_existing(collection, docs: List[Dict[str, Any]]) -> Tuple[int, int]:
+    """
+    Unordered insert_many that treats documents whose _id already exists as done (a batch retried
+    after a crash, or a record stored by an earlier run). Returns (inserted, already_present);
+    any other failure is re-raised.
+    """
+    try:
+        collection.insert_many(docs, ordered=False)
+        return len(docs), 0
+    except CollectionInsertManyException as e:
+        codes = [d.error_code for exc in e.exceptions for d in getattr(exc, "error_descriptors", [])]
+        if codes and all(code == "DOCUMENT_ALREADY_EXISTS" for code in codes):
+            return len(e.inserted_ids), len(docs) - len(e.inserted_ids)
+        raise
+
+
+class IngestionManifest:
+    def __init__(self, collection_name: str, manifest_dir: str = MANIFEST_DIR):
+        os.makedirs(manifest_dir, exist_ok=True)
+        self.path = os.path.join(manifest_dir, f"{collection_name}.json")
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logger.warning(f"[Manifest] Could not read {self.path} ({e}); starting fresh.")
+
+    def save(self):
+        # Write to a temp file and swap it in, so a crash never leaves a half-written manifest.
+        directory = os.path.dirname(self.path)
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp", encoding="utf-8") as f:
+            json.dump(self.entries, f, indent=2)
+            tmp_path = f.name
+        os.replace(tmp_path, self.path)
+
+    def get(self, source: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(source)
+
+    def is_done(self, source: str, content_hash: str) -> bool:
+        entry = self.entries.get(source)
+        return bool(entry) and entry.get("hash") == content_hash and entry.get("status") == STATUS_DONE
+
+    def stale_chunk_ids(self, source: str, content_hash: str) -> List[str]:
+        """Chunk ids written for a previous version of the file, if its content changed."""
+        entry = self.entries.get(source)
+        if entry and entry.get("hash") != content_hash:
+            return list(entry.get("chunk_ids", []))
+        return []
+
+    def start(self, source: str, content_hash: str) -> List[str]:
+        """
+        Marks a file in progress and returns the chunk ids already written for this exact content.
+        A changed hash resets the entry; the caller is responsible for deleting the stale chunks.
+        """
+        entry = self.entries.get(source)
+        if entry and entry.get("hash") == content_hash:
+            entry["status"] = STATUS_IN_PROGRESS
+            done_ids = list(entry.get("chunk_ids", []))
+        else:
+            self.entries[source] = {"hash": content_hash, "status": STATUS_IN_PROGRESS, "chunk_ids": []}
+            done_ids = []
+        self.entries[source]["updated_at"] = datetime.utcnow().isoformat()
+        self.save()
+        return done_ids
+
+    def add_chunks(self, source: str, chunk_ids: List[str]):
+        entry = self.entries[source]
+        known = set(entry["chunk_ids"])
+        entry["chunk_ids"].extend(cid for cid in chunk_ids if cid not in known)
+        entry["updated_at"] = datetime.utcnow().isoformat()
+        self.save()
+
+    def finish(self, source: str, status: str = STATUS_DONE, error: Optional[str] = None, **extra):
+        # A file can fail before start() (e.g. it could not be parsed), so the entry may not exist yet.
+        entry = self.entries.setdefault(source, {"chunk_ids": []})
+        entry["status"] = status
+        entry["updated_at"] = datetime.utcnow().isoformat()
+        entry.update(extra)
+        if error:
+            entry["error"] = error
+        else:
+            entry.pop("error", None)
+        self.save()
+
+    def record(self, source: str, content_hash: str, chunk_ids: List[str], **extra):
+        """Replaces a source's entry with the complete set of chunk ids now stored for it."""
+        self.entries[source] = {
+            "hash": content_hash,
+            "status": STATUS_DONE,
+            "chunk_ids": list(chunk_ids),
+            "updated_at": datetime.utcnow().isoformat(),
+            **extra,
+        }
+        self.save()
+
+    def remove(self, source: str):
+        self.entries.pop(source, None)
+        self.save()
+
+    def sources(self) -> List[str]:
+        return list(self.entries.keys())
+
+
+def sync_source(vectorstore, manifest: IngestionManifest, source: str, content_hash: str,
+                documents: Iterable[Any], legacy_filter: Optional[Dict[str, Any]] = None,
+                batch_size: int = 64) -> Tuple[int, int]:
+    """
+    Brings one source's chunks in `vectorstore` in line with `documents` (LangChain Documents
+    carrying a chunk_index in their metadata). `documents` may be a generator: new chunks are
+    upserted in batches as they arrive, so only ids are kept for the whole source.
+    Returns (upserted, deleted). Raises ValueError if `documents` is empty: a source that yields
+    no chunks is more likely a failed extraction than an empty file, so its stored chunks and
+    manifest entry are left alone.
+
+    legacy_filter matches chunks written before deterministic ids existed; they are deleted the
+    first time the manifest sees the source so the switch-over does not leave duplicates behind.
+    The delete runs only once the new chunks are stored, and spares them: upserted chunks carry
+    the source's content_hash in their metadata.
+    """
+    entry = manifest.get(source)
+    previous = set(entry.get("chunk_ids", [])) if entry else set()
+
+    ids: List[str] = []
+    pending: List[Tuple[str, Any]] = []
+    upserted = 0
+
+    def flush():
+        nonlocal pending, upserted
+        if pending:
+            # Explicit ids make add_documents an upsert, so a retried run never duplicates.
+            vectorstore.add_documents([doc for _, doc in pending], ids=[cid for cid, _ in pending])
+            upserted += len(pending)
+            pending = []
+
+    for i, doc in enumerate(documents):
+        cid = chunk_id(source, doc.metadata.get("chunk_index", i), doc.page_content)
+        ids.append(cid)
+        if cid not in previous:
+            doc.metadata["content_hash"] = content_hash
+            pending.append((cid, doc))
+            if len(pending) >= batch_size:
+                flush()
+    flush()
+    if not ids:
+        raise ValueError(f"No chunks extracted from {source}; keeping its stored chunks.")
+
+    if entry is None and legacy_filter:
+        removed = vectorstore.delete_by_metadata_filter(
+            {"$and": [legacy_filter, {"content_hash": {"$ne": content_hash}}]})
+        if removed:
+            logger.info(f"[Manifest] Removed {removed} legacy chunks of {source}.")
+
+    obsolete = previous - set(ids)
+    if obsolete:
+        vectorstore.delete(ids=list(obsolete))
+
+    manifest.record(source, content_hash, ids)
+    return upserted, len(obsolete)
+
+
+def prune_sources(vectorstore, manifest: IngestionManifest, present: Iterable[str]) -> int:
+    """Deletes the chunks of every source in the manifest that is no longer present. Returns chunks deleted."""
+    present = set(present)
+    deleted = 0
+    for source in manifest.sources():
+        if source in present:
+            continue
+        stale = manifest.get(source).get("chunk_ids", [])
+        if stale:
+            vectorstore.delete(ids=stale)
+        deleted += len(stale)
+        manifest.remove(source)
+        logger.info(f"[Manifest] {source} was removed; deleted its {len(stale)} chunks.")
+    return deleted
@@ -0,0 +1,86 @@
+'''
+PageStream.py - Page-by-page text extraction and chunking with bounded memory.
+
+PDFs are read one page at a time (PyMuPDF loads pages lazily) and fed through a splitter that
+only ever holds the current page plus the unfinished tail of the previous one, so a bundle of
+large PDFs is never materialized as a single string.
+'''
+
+from typing import Iterable, Iterator, List, Tuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from Logging.logger import logger
+
+
+def iter_pdf_pages(filepath: str) -> Iterator[str]:
+    """
+    Yields the text of each page of a PDF. Raises if the file cannot be opened, so an unreadable
+    file is never mistaken for one without text (which would prune its stored chunks).
+    """
+    import fitz  # PyMuPDF, imported here so the text helpers work without it
+
+    doc = fitz.open(filepath)
+    try:
+        for page in doc:
+            yield page.get_text()
+    finally:
+        doc.close()
+
+
+def iter_text_blocks(filepath: str, block_chars: int = 20000) -> Iterator[str]:
+    """Yields a text file in blocks of roughly block_chars, split on line boundaries."""
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            block: List[str] = []
+            size = 0
+            for line in f:
+                block.append(line)
+                size += len(line)
+                if size >= block_chars:
+                    yield "".join(block)
+                    block, size = [], 0
+            if block:
+                yield "".join(block)
+    except Exception as e:
+        logger.error(f"Failed to read text file {filepath}: {e}")
+
+
+def iter_chunks(pages: Iterable[str], chunk_size: int = 700, chunk_overlap: int = 100) -> Iterator[str]:
+    """
+    Splits a stream of page texts into chunks. The last (possibly incomplete) chunk of each page
+    is carried into the next one, so chunks flow across page boundaries like they would over the
+    concatenated text.
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    carry = ""
+    for page_text in pages:
+        if not page_text or not page_text.strip():
+            continue
+        pieces = splitter.split_text(carry + "\n" + page_text if carry else page_text)
+        if not pieces:
+            continue
+        yield from pieces[:-1]
+        carry = pieces[-1]
+    if carry.strip():
+        yield carry
+
+
+def iter_pdf_chunks(filepath: str, chunk_size: int = 700, chunk_overlap: int = 100) -> Iterator[str]:
+    return iter_chunks(iter_pdf_pages(filepath), chunk_size, chunk_overlap)
+
+
+def iter_batches(chunks: Iterable[str], max_chars: int) -> Iterator[Tuple[int, List[str]]]:
+    """Groups chunks into (batch_index, chunks) batches of at most max_chars characters."""
+    batch: List[str] = []
+    size = 0
+    index = 0
+    for chunk in chunks:
+        if batch and size + len(chunk) > max_chars:
+            yield index, batch
+            index += 1
+            batch, size = [], 0
+        batch.append(chunk)
+        size += len(chunk)
+    if batch:
+        yield index, batch
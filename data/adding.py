@@ -1,13 +1,15 @@
 import os
 import json
-import fitz
 import sys
 from dotenv import load_dotenv
 from Logging.logger import logger
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_astradb import AstraDBVectorStore
 from langchain_core.documents import Document
+from utility.SemanticCache import mark_ingestion
 from utility.Embedder import HFAPIEmbeddings
+from utility.Governor import set_process
+from data.IngestionManifest import IngestionManifest, file_sha256, sync_source, prune_sources
+from data.PageStream import iter_pdf_chunks
 import nest_asyncio
 nest_asyncio.apply()
 
@@ -25,27 +27,6 @@ vectorstore = AstraDBVectorStore(
 )
 
 
-def extract_text_from_pdf(filepath):
-    """Extracts text from a PDF file using fitz (PyMuPDF)."""
-    try:
-        if not hasattr(fitz, 'open'):
-            logger.error("fitz module does not have 'open' attribute. Is PyMuPDF installed correctly?")
-            raise ImportError("fitz.open not found. Check PyMuPDF installation.")
-
-        logger.debug(f"Loading PDF with fitz: {filepath}")
-        doc = fitz.open(filepath)
-        full_text = "\n".join(page.get_text() for page in doc)
-        doc.close()
-        logger.debug(f"Extracted {len(full_text)} characters from {filepath}")
-        return full_text
-    except ImportError as ie:
-        logger.error(f"ImportError reading {filepath}: {ie}")
-        return ""
-    except Exception as e:
-        logger.error(f"Error reading {filepath} with fitz: {e}", exc_info=True)
-        return ""
-
-
 def extract_text_from_txt(filepath):
     try:
         with open(filepath, "r", encoding="utf-8") as f:
@@ -55,25 +36,23 @@ def extract_text_from_txt(filepath):
         return ""
 
 
-def chunk_text(text, metadata):
-    """Chunks text and returns LangChain Document objects with metadata."""
-    splitter = RecursiveCharacterTextSplitter(chunk_size=700, chunk_overlap=100)
-    chunks = splitter.split_text(text)
-    documents = []
+def chunk_documents(chunks, metadata):
+    """Wraps a stream of chunks into LangChain Document objects with metadata, lazily."""
     for i, chunk in enumerate(chunks):
-        doc = Document(
+        yield Document(
             page_content=chunk,
             metadata={
                 **metadata,
                 "chunk_index": i
             }
         )
-        documents.append(doc)
-    return documents
 
 
 def ingest_all():
-    """Finds PDFs in PDF_DIR, chunks them, and adds them to the vector store."""
+    """
+    Finds PDFs in PDF_DIR, chunks them, and syncs them into the vector store. Unchanged files are
+    skipped, changed files only upsert their new chunks, and files removed from PDF_DIR are deleted.
+    """
     groups = {}
     all_pdf_paths = []
 
@@ -90,52 +69,52 @@ def ingest_all():
 
     logger.info(f"Found {len(all_pdf_paths)} PDF files to process in '{PDF_DIR}': {all_pdf_paths}")
 
+    manifest = IngestionManifest(COLLECTION_NAME)
+    deleted_chunks_count = prune_sources(vectorstore, manifest, [os.path.basename(p) for p in all_pdf_paths])
+
     if not groups:
         logger.warning(f"No PDF files found in '{PDF_DIR}'. Ingestion will not proceed.")
+        if deleted_chunks_count:
+            mark_ingestion()
         return
 
     processed_chunks_count = 0
     for doc_id, files in groups.items():
-        logger.info(f"\nProcessing document: {doc_id}")
-        text = ""
-
         pdf_path = files["pdfs"][0]
-        pdf_content = extract_text_from_pdf(pdf_path)
-        if pdf_content:
-            text += pdf_content
-            logger.info(f"  - Extracted text from PDF: {pdf_path}")
-        else:
-            logger.warning(f"  - Failed to extract text from PDF: {pdf_path}. Skipping.")
-            continue
-
-        if not text.strip():
-            logger.warning(f"No text extracted for document '{doc_id}', skipping.")
+        source = os.path.basename(pdf_path)
+        content_hash = file_sha256(pdf_path)
+        if manifest.is_done(source, content_hash):
+            logger.info(f"Unchanged, skipping: {source}")
             continue
 
+        logger.info(f"\nProcessing document: {doc_id}")
         metadata = {
             "id": doc_id,
             "source_file": os.path.abspath(pdf_path),
             "original_filename": os.path.basename(pdf_path)
         }
 
-        documents = chunk_text(text, metadata)
-        logger.info(f"  - Split text into {len(documents)} chunks.")
-
-        if documents:
-            try:
-                embeddings = embedding_model.embed_documents_sync([doc.page_content for doc in documents])
-                vectorstore.add_documents(documents, embeddings=embeddings)
-                logger.info(f"  - Successfully embedded and ADDED {len(documents)} chunks for '{doc_id}' to '{COLLECTION_NAME}'.")
-                processed_chunks_count += len(documents)
-            except Exception as e:
-                logger.error(f"  - Failed to insert chunks for '{doc_id}': {e}", exc_info=True)
-        else:
-            logger.warning(f"  - No chunks generated for '{doc_id}', nothing to insert.")
-
-    logger.info(f"\nIngestion finished. Total new chunks added: {processed_chunks_count}")
+        # Pages are read and chunked as they are upserted; the full text is never held in memory.
+        documents = chunk_documents(iter_pdf_chunks(pdf_path, chunk_size=700, chunk_overlap=100), metadata)
+        try:
+            upserted, deleted = sync_source(
+                vectorstore, manifest, source, content_hash, documents,
+                legacy_filter={"original_filename": source}
+            )
+            chunk_count = len(manifest.get(source)["chunk_ids"])
+            logger.info(f"  - {chunk_count} chunks: upserted {upserted} and deleted {deleted} for '{doc_id}' in '{COLLECTION_NAME}'.")
+            processed_chunks_count += upserted
+            deleted_chunks_count += deleted
+        except Exception as e:
+            logger.error(f"  - Failed to insert chunks for '{doc_id}': {e}", exc_info=True)
+
+    if processed_chunks_count or deleted_chunks_count:
+        mark_ingestion()
+    logger.info(f"\nIngestion finished. Chunks upserted: {processed_chunks_count}, deleted: {deleted_chunks_count}")
 
 
 if __name__ == "__main__":
+    set_process("batch")  # a small share of the API quotas, in the batch lane
     logger.info(f"Starting ingestion process to ADD documents to collection '{COLLECTION_NAME}'...")
     ingest_all()
     logger.info("Ingestion process complete.")
\ No newline at end of file
@@ -6,7 +6,10 @@ from Logging.logger import logger
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_astradb import AstraDBVectorStore
 from langchain_core.documents import Document
+from utility.SemanticCache import mark_ingestion
 from utility.Embedder import HFAPIEmbeddings 
+from utility.Governor import set_process
+from data.IngestionManifest import IngestionManifest, file_sha256, combined_hash, sync_source, prune_sources
 import nest_asyncio
 nest_asyncio.apply()
 
@@ -27,12 +30,9 @@ vectorstore = AstraDBVectorStore(
 
 
 def extract_text_from_pdf(filepath):
-    try:
-        doc = fitz.open(filepath)
+    # Raises on an unreadable file: returning "" would drop that PDF's chunks from its group.
+    with fitz.open(filepath) as doc:
         return "\n".join(page.get_text() for page in doc)
-    except Exception as e:
-        logger.error(f"Error reading {filepath}: {e}")
-        return ""
 
 
 def extract_text_from_txt(filepath):
@@ -77,15 +77,28 @@ def ingest_all():
     #         key = os.path.splitext(fname)[0]
     #         groups.setdefault(key, {})["txt"] = os.path.join(TXT_DIR, fname)
 
+    manifest = IngestionManifest(COLLECTION_NAME)
+    changed_any = prune_sources(vectorstore, manifest, groups.keys()) > 0
+
     for doc_id, files in groups.items():
+        paths = files.get("pdfs", []) + ([files["txt"]] if "txt" in files else [])
+        content_hash = combined_hash(file_sha256(p) for p in paths)
+        if manifest.is_done(doc_id, content_hash):
+            logger.info(f"Unchanged, skipping group: {doc_id}")
+            continue
+
         logger.info(f"\nProcessing document group: {doc_id}")
         text = ""
 
         if "txt" in files:
             text += extract_text_from_txt(files["txt"])
 
-        for pdf_path in files.get("pdfs", []):
-            text += "\n" + extract_text_from_pdf(pdf_path)
+        try:
+            for pdf_path in files.get("pdfs", []):
+                text += "\n" + extract_text_from_pdf(pdf_path)
+        except Exception as e:
+            logger.error(f"Could not read {doc_id} ({e}); keeping its stored chunks.")
+            continue
 
         if not text.strip():
             logger.warning(f"No text found for group {doc_id}, skipping.")
@@ -102,12 +115,19 @@ def ingest_all():
 
         if documents:
             try:
-                embeddings = embedding_model.embed_documents_sync([doc.page_content for doc in documents])
-                vectorstore.add_documents(documents, embeddings=embeddings)
-                logger.info(f"Inserted {len(documents)} chunks for {doc_id}")
+                upserted, deleted = sync_source(
+                    vectorstore, manifest, doc_id, content_hash, documents,
+                    legacy_filter={"id": doc_id}
+                )
+                logger.info(f"Upserted {upserted} and deleted {deleted} chunks for {doc_id}")
+                changed_any = changed_any or bool(upserted or deleted)
             except Exception as e:
                 logger.error(f"Failed to insert chunks for {doc_id}: {e}")
 
+    if changed_any:
+        mark_ingestion()
+
 
 if __name__ == "__main__":
+    set_process("batch")  # a small share of the API quotas, in the batch lane
     ingest_all()
\ No newline at end of file
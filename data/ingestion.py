@@ -1,288 +1,512 @@
+'''
+ingestion.py - Scrapes exportimportdata.in shipment tables into the export_import_data collection.
+
+Several HS codes are scraped concurrently, each in its own browser context, behind one global
+rate limiter so the site sees a polite request rate. Parsed rows are streamed through a bounded
+queue into batched inserts, and every page is checkpointed once its rows are stored, so an
+interrupted run resumes where it stopped.
+
+Each row's _id is a hash of its natural key (date, ports, CTH, description, quantity, unit
+price), so re-scraping never duplicates shipments: rows already stored are counted as
+duplicates in the ingestion report alongside new and rejected rows.
+
+Point TRADE_BASE_URL at a local server to run offline; benchmarks/trade_scraper_offline.py does
+this against the saved pages in benchmarks/fixtures/trade. When the site, or the fixture server,
+serves pages at a direct URL, set TRADE_PAGE_URL_TEMPLATE (e.g.
+"{base}/export-{hs_code}-hs-code?page={page}") and pages are fanned out across all contexts
+instead of being walked with the "next" button.
+
+A page whose table does not load in time is neither checkpointed nor taken as the end of the
+data; only a table that loaded without rows ends an HS code. The next run retries the page.
+
+Usage: python -m data.ingestion --hs-codes 8532 8541 --concurrency 3 --max-pages 100
+'''
+
 import os
-import uuid
-import asyncio
-import uuid
+import json
+import time
 import asyncio
-from dotenv import load_dotenv
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
-from logging import getLogger, INFO, StreamHandler, Formatter
+import argparse
+import tempfile
 from datetime import datetime
-from astrapy import DataAPIClient
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 
-# --- 1. Basic Logging Setup ---
-logger = getLogger(__name__)
-logger.setLevel(INFO)
-handler = StreamHandler()
-formatter = Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-if not logger.handlers:
-    logger.addHandler(handler)
-
-# --- 2. Load Environment Variables ---
-from bs4 import BeautifulSoup
+from dotenv import load_dotenv
 from playwright.async_api import async_playwright
-from logging import getLogger, INFO, StreamHandler, Formatter
-from datetime import datetime
 from astrapy import DataAPIClient
 
-# --- 1. Basic Logging Setup ---
-logger = getLogger(__name__)
-logger.setLevel(INFO)
-handler = StreamHandler()
-formatter = Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-if not logger.handlers:
-    logger.addHandler(handler)
+from Logging.logger import logger
+from utility.SemanticCache import mark_ingestion
+from data.trade_parser import COLUMNS, iter_rows, parse_rows, record_id
+from data.IngestionManifest import insert_many_skip_existing
 
-# --- 2. Load Environment Variables ---
 load_dotenv()
 
-ASTRA_DB_ENDPOINT = os.getenv("ASTRA_DB_ENDPOINT") 
-ASTRA_DB_TOKEN = os.getenv("ASTRA_DB_TOKEN")
-COLLECTION_NAME = "export_import_data"
-TARGET_URL = "https://www.exportimportdata.in/export-8532-hs-code"
-ASTRA_DB_ENDPOINT = os.getenv("ASTRA_DB_ENDPOINT") 
+ASTRA_DB_ENDPOINT = os.getenv("ASTRA_DB_ENDPOINT")
 ASTRA_DB_TOKEN = os.getenv("ASTRA_DB_TOKEN")
 COLLECTION_NAME = "export_import_data"
-TARGET_URL = "https://www.exportimportdata.in/export-8532-hs-code"
 
-# --- 3. Async Scraping and Parsing Functions ---
-
-def parse_table_data(html_content):
+TRADE_BASE_URL = os.getenv("TRADE_BASE_URL", "https://www.exportimportdata.in").rstrip("/")
+FIRST_PAGE_URL_TEMPLATE = "{base}/export-{hs_code}-hs-code"
+TRADE_PAGE_URL_TEMPLATE = os.getenv("TRADE_PAGE_URL_TEMPLATE")
+DEFAULT_HS_CODES = [c.strip() for c in os.getenv("TRADE_HS_CODES", "8532").split(",") if c.strip()]
+# Minimum seconds between any two page requests, across all browser contexts.
+TRADE_REQUEST_INTERVAL = float(os.getenv("TRADE_REQUEST_INTERVAL", "1.0"))
+# How long a page may take to show its table before it counts as not loaded.
+TRADE_TABLE_TIMEOUT_MS = int(os.getenv("TRADE_TABLE_TIMEOUT_MS", "30000"))
+CHECKPOINT_FILE = os.getenv("TRADE_CHECKPOINT_FILE", os.path.join("Artifacts", "ingestion", "trade_checkpoint.json"))
+REPORT_FILE = os.getenv("TRADE_REPORT_FILE", os.path.join("Artifacts", "ingestion", "trade_report.json"))
+
+TABLE_BODY_SELECTOR = "div#datamodule tbody"
+NEXT_BUTTON_SELECTOR = "a#nextpage"
+
+
+# --- Parsing ---
+
+class IngestionReport:
+    """Row counts for one run: scraped, new, duplicate (already stored or repeated) and rejected."""
+
+    def __init__(self):
+        self.scraped = 0
+        self.new = 0
+        self.duplicate = 0
+        self.rejected = 0
+        self.rejected_samples: List[Dict[str, Any]] = []
+
+    def reject(self, row: Any, reason: str):
+        self.rejected += 1
+        if len(self.rejected_samples) < 20:
+            self.rejected_samples.append({"row": row, "reason": reason})
+        logger.warning(f"Rejected row {row}: {reason}")
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "scraped": self.scraped,
+            "new": self.new,
+            "duplicate": self.duplicate,
+            "rejected": self.rejected,
+            "rejected_samples": self.rejected_samples,
+        }
+
+    def save(self, path: str = REPORT_FILE):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**self.as_dict(), "finished_at": datetime.utcnow().isoformat()}, f, indent=2)
+
+
+def parse_table_data(html_content, report: Optional[IngestionReport] = None):
     """Parses the HTML of the table body and extracts structured row data."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    rows = soup.find_all('tr')
-    scraped_data = []
-    for row in rows:
-        cols = [ele.text.strip() for ele in row.find_all('td')]
-        if len(cols) == 9:
-            try:
-                scraped_data.append({
-                    "_id": str(uuid.uuid4()),
-                    "trade_date": cols[0],
-                    "indian_port": cols[1],
-                    "cth": int(cols[2]),
-                    "item_description": cols[3],
-                    "quantity": int(cols[4].replace(',', '')),
-                    "uqc": cols[5],
-                    "unit_price_usd": float(cols[6].replace(',', '')),
-                    "fob_usd": float(cols[7].replace(',', '')),
-                    "destination_port": cols[8]
-                })
-            except (ValueError, IndexError) as e:
-                logger.warning(f"Could not parse row: {cols}. Error: {e}")
-    return scraped_data
-
-async def scrape_all_pages(url, max_pages=100):
-    """Uses Playwright's async API to navigate and scrape pages up to a limit."""
-    all_records = []
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        logger.info(f"Navigating to {url}")
-        await page.goto(url, wait_until="networkidle", timeout=60000)
+    rejected = []
 
-        page_num = 1
-        while True:
-            if page_num > max_pages:
-                logger.info(f"Reached the maximum page limit of {max_pages}. Stopping scrape.")
-                break
-            
-            logger.info(f"Scraping page {page_num}...")
-            table_body_html = await page.inner_html('div#datamodule tbody')
-            records_on_page = parse_table_data(table_body_html)
-            all_records.extend(records_on_page)
-            logger.info(f"Found {len(records_on_page)} records. Total: {len(all_records)}")
-            
-            next_button = page.locator("a#nextpage")
-            style = await next_button.get_attribute("style")
-            if style and "display: none" in style:
-                logger.info("Reached the end of the data.")
-                break
-                
-            try:
-                await next_button.click()
-                await page.wait_for_load_state("networkidle", timeout=30000)
-                await asyncio.sleep(2)
-                page_num += 1
-            except Exception as e:
-                logger.error(f"Could not click next button. Assuming end of data. Error: {e}")
-                break
+    def on_reject(cols, e):
+        rejected.append(cols)
+        if report is not None:
+            report.reject(cols, str(e))
+        else:
+            logger.warning(f"Could not parse row: {cols}. Error: {e}")
 
-        await browser.close()
-    return all_records
+    records = parse_rows(html_content, on_reject=on_reject)
+    if report is not None:
+        report.scraped += len(records) + len(rejected)
+    return records
 
-# --- 4. Main Async Function ---
 
-async def main():
-    """Main function to orchestrate the scraping and ingestion process."""
-    if not all([ASTRA_DB_ENDPOINT, ASTRA_DB_TOKEN]):
-        logger.error("Missing environment variables. Check your .env file.")
-        return
+def is_empty_table(html_content: str) -> bool:
+    """True when the table has no shipment rows at all (rejected rows still count as rows)."""
+    return not any(len(cells) == len(COLUMNS) for cells in iter_rows(html_content))
 
-    try:
-        # --- Connect to Astra DB using DataAPIClient ---
-        client = DataAPIClient(ASTRA_DB_TOKEN)
-        db = client.get_database(ASTRA_DB_ENDPOINT)
-
-        # --- Ensure collection exists ---
-        existing_collections = [c.name for c in db.list_collections()]
-        if COLLECTION_NAME not in existing_collections:
-            collection = db.create_collection(COLLECTION_NAME)
-            logger.info(f"Created collection '{COLLECTION_NAME}'")
-        else:
-            collection = db.get_collection(COLLECTION_NAME)
-            logger.info(f"Using existing collection '{COLLECTION_NAME}'")
-
-        # --- Scrape the data ---
-        scraped_records = await scrape_all_pages(TARGET_URL, max_pages=100)
-        
-        if not scraped_records:
-            logger.warning("No records were scraped.")
-            return
-
-        # --- Normalize and Insert Data in Batches ---
-        docs_to_insert = []
-        for record in scraped_records:
-            try:
-                trade_date_obj = datetime.strptime(record['trade_date'], '%d-%b-%Y')
-                record['trade_date'] = trade_date_obj.isoformat()
-                docs_to_insert.append(record)
-            except ValueError:
+
+def normalize_records(records: List[Dict[str, Any]], report: Optional[IngestionReport] = None) -> List[Dict[str, Any]]:
+    """Converts trade dates to ISO format and assigns the natural-key _id, dropping rows with bad dates."""
+    normalized = []
+    for record in records:
+        try:
+            record['trade_date'] = datetime.strptime(record['trade_date'], '%d-%b-%Y').isoformat()
+        except ValueError:
+            if report is not None:
+                report.reject(record, f"invalid date {record['trade_date']!r}")
+            else:
                 logger.warning(f"Invalid date format for {record['trade_date']}. Skipping record.")
+            continue
+        record["_id"] = record_id(record)
+        normalized.append(record)
+    return normalized
 
-        logger.info(f"Ingesting {len(docs_to_insert)} records in batches...")
-        if docs_to_insert:
-            batch_size = 500
-            for i in range(0, len(docs_to_insert), batch_size):
-                batch = docs_to_insert[i:i + batch_size]
-                # --- FIXED: Removed 'await' from the next line ---
-                collection.insert_many(batch)
-                logger.info(f"  ... inserted batch {i//batch_size + 1}")
-        logger.info("Ingestion complete.")
 
-# --- 3. Async Scraping and Parsing Functions ---
+# --- Scrape coordination ---
 
-def parse_table_data(html_content):
-    """Parses the HTML of the table body and extracts structured row data."""
-    soup = BeautifulSoup(html_content, 'html.parser')
-    rows = soup.find_all('tr')
-    scraped_data = []
-    for row in rows:
-        cols = [ele.text.strip() for ele in row.find_all('td')]
-        if len(cols) == 9:
-            try:
-                scraped_data.append({
-                    "_id": str(uuid.uuid4()),
-                    "trade_date": cols[0],
-                    "indian_port": cols[1],
-                    "cth": int(cols[2]),
-                    "item_description": cols[3],
-                    "quantity": int(cols[4].replace(',', '')),
-                    "uqc": cols[5],
-                    "unit_price_usd": float(cols[6].replace(',', '')),
-                    "fob_usd": float(cols[7].replace(',', '')),
-                    "destination_port": cols[8]
-                })
-            except (ValueError, IndexError) as e:
-                logger.warning(f"Could not parse row: {cols}. Error: {e}")
-    return scraped_data
-
-async def scrape_all_pages(url, max_pages=100):
-    """Uses Playwright's async API to navigate and scrape pages up to a limit."""
-    all_records = []
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        logger.info(f"Navigating to {url}")
-        await page.goto(url, wait_until="networkidle", timeout=60000)
+class RateLimiter:
+    """Spaces requests at least `interval` seconds apart, shared by every worker."""
 
-        page_num = 1
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = asyncio.Lock()
+        self._next_slot = 0.0
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ScrapeCheckpoint:
+    """
+    Per-HS-code progress: the pages whose rows are stored, and the last page once the end of
+    the data has been seen. Saved atomically after every flushed batch.
+    """
+
+    def __init__(self, path: str = CHECKPOINT_FILE):
+        self.path = path
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.state = json.load(f)
+            except Exception as e:
+                logger.warning(f"Could not read checkpoint {path} ({e}); starting fresh.")
+
+    def _entry(self, hs_code: str) -> Dict[str, Any]:
+        return self.state.setdefault(hs_code, {"pages_done": [], "last_page": None, "rows": 0})
+
+    def is_page_done(self, hs_code: str, page: int) -> bool:
+        return page in self._entry(hs_code)["pages_done"]
+
+    def last_page(self, hs_code: str) -> Optional[int]:
+        return self._entry(hs_code)["last_page"]
+
+    def is_complete(self, hs_code: str) -> bool:
+        entry = self._entry(hs_code)
+        return entry["last_page"] is not None and len(entry["pages_done"]) >= entry["last_page"]
+
+    def mark_pages(self, pages: List[Tuple[str, int, int]]):
+        for hs_code, page, row_count in pages:
+            entry = self._entry(hs_code)
+            if page not in entry["pages_done"]:
+                entry["pages_done"].append(page)
+                entry["rows"] += row_count
+        self.save()
+
+    def mark_last_page(self, hs_code: str, page: int):
+        entry = self._entry(hs_code)
+        entry["last_page"] = page if entry["last_page"] is None else min(entry["last_page"], page)
+        # Pages past the end were probed concurrently but never hold data.
+        entry["pages_done"] = [p for p in entry["pages_done"] if p <= entry["last_page"]]
+        self.save()
+
+    def reset(self):
+        self.state = {}
+        self.save()
+
+    def save(self):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+            tmp_path = f.name
+        os.replace(tmp_path, self.path)
+
+
+class BatchWriter:
+    """
+    Consumes (hs_code, page, records) from a bounded queue and inserts them in batches, up to
+    `insert_concurrency` batches at a time. A page is checkpointed only after all of its rows are
+    written, so a crash never skips unstored rows.
+
+    If an insert fails the writer stops, and put() and close() re-raise its error instead of
+    waiting on a queue nobody drains any more.
+    """
+
+    def __init__(self, collection, checkpoint: ScrapeCheckpoint, report: Optional[IngestionReport] = None,
+                 batch_size: int = 100, insert_concurrency: int = 4, queue_size: int = 20):
+        self.collection = collection
+        self.checkpoint = checkpoint
+        self.report = report or IngestionReport()
+        self.batch_size = batch_size
+        self.insert_concurrency = insert_concurrency
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._buffer: List[Dict[str, Any]] = []
+        self._pending_pages: List[Tuple[str, int, int]] = []
+        # Ids seen this run: repeats are dropped before they cost a round trip.
+        self._seen_ids: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def inserted(self) -> int:
+        return self.report.new
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    def _raise_if_stopped(self):
+        if self._task.done():
+            self._task.result()  # re-raises the writer's error
+            raise RuntimeError("BatchWriter has already stopped.")
+
+    async def _send(self, item):
+        self._raise_if_stopped()
+        put = asyncio.ensure_future(self.queue.put(item))
+        try:
+            # A full queue only drains while the writer runs; stop waiting as soon as it dies.
+            await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            if not put.done():
+                put.cancel()
+        if not put.done() or put.cancelled():
+            self._raise_if_stopped()
+
+    async def put(self, hs_code: str, page: int, records: List[Dict[str, Any]]):
+        await self._send((hs_code, page, records))
+
+    async def close(self):
+        """Flushes what is queued and waits for the writer; re-raises its error if it failed."""
+        if not self._task.done():
+            await self._send(None)
+        await self._task
+
+    async def _flush(self):
+        if self._buffer:
+            batches = [self._buffer[i:i + self.batch_size] for i in range(0, len(self._buffer), self.batch_size)]
+            results = await asyncio.gather(
+                *(asyncio.to_thread(insert_many_skip_existing, self.collection, batch) for batch in batches)
+            )
+            new = sum(r[0] for r in results)
+            self.report.new += new
+            self.report.duplicate += sum(r[1] for r in results)
+            logger.info(f"Inserted {new}/{len(self._buffer)} rows ({self.report.new} new, {self.report.duplicate} duplicates so far).")
+        if self._pending_pages:
+            self.checkpoint.mark_pages(self._pending_pages)
+        self._buffer, self._pending_pages = [], []
+
+    async def run(self):
         while True:
-            if page_num > max_pages:
-                logger.info(f"Reached the maximum page limit of {max_pages}. Stopping scrape.")
+            item = await self.queue.get()
+            if item is None:
                 break
-            
-            logger.info(f"Scraping page {page_num}...")
-            table_body_html = await page.inner_html('div#datamodule tbody')
-            records_on_page = parse_table_data(table_body_html)
-            all_records.extend(records_on_page)
-            logger.info(f"Found {len(records_on_page)} records. Total: {len(all_records)}")
-            
-            next_button = page.locator("a#nextpage")
-            style = await next_button.get_attribute("style")
+            hs_code, page, records = item
+            for record in normalize_records(records, self.report):
+                if record["_id"] in self._seen_ids:
+                    self.report.duplicate += 1
+                    continue
+                self._seen_ids.add(record["_id"])
+                self._buffer.append(record)
+            self._pending_pages.append((hs_code, page, len(records)))
+            if len(self._buffer) >= self.batch_size * self.insert_concurrency:
+                await self._flush()
+        await self._flush()
+
+
+def first_page_url(hs_code: str) -> str:
+    return FIRST_PAGE_URL_TEMPLATE.format(base=TRADE_BASE_URL, hs_code=hs_code)
+
+
+def page_url(hs_code: str, page: int) -> str:
+    if page == 1 or not TRADE_PAGE_URL_TEMPLATE:
+        return first_page_url(hs_code)
+    return TRADE_PAGE_URL_TEMPLATE.format(base=TRADE_BASE_URL, hs_code=hs_code, page=page)
+
+
+async def _read_table(page) -> Optional[str]:
+    """
+    The table body's HTML once it has cells, or once the page finished loading without any (an
+    empty table). None if neither happens in time: a slow page says nothing about the data.
+    """
+    try:
+        await page.wait_for_function(
+            "sel => { const b = document.querySelector(sel);"
+            " return !!b && (b.querySelector('td') !== null || document.readyState === 'complete'); }",
+            arg=TABLE_BODY_SELECTOR, timeout=TRADE_TABLE_TIMEOUT_MS
+        )
+    except Exception:
+        return None
+    return await page.inner_html(TABLE_BODY_SELECTOR)
+
+
+async def walk_hs_code(context, hs_code: str, limiter: RateLimiter, writer: BatchWriter,
+                       checkpoint: ScrapeCheckpoint, max_pages: int):
+    """Walks one HS code page by page with the site's "next" button, skipping checkpointed pages."""
+    page = await context.new_page()
+    try:
+        await limiter.wait()
+        logger.info(f"[{hs_code}] Navigating to {first_page_url(hs_code)}")
+        await page.goto(first_page_url(hs_code), wait_until="domcontentloaded", timeout=60000)
+
+        page_num = 1
+        while page_num <= max_pages:
+            table_html = await _read_table(page)
+            if table_html is None:
+                # Later pages are only reachable from this one; the next run resumes here.
+                raise TimeoutError(f"Page {page_num} did not load its table in {TRADE_TABLE_TIMEOUT_MS} ms.")
+            if not checkpoint.is_page_done(hs_code, page_num):
+                records = parse_table_data(table_html, writer.report)
+                logger.info(f"[{hs_code}] Page {page_num}: {len(records)} records.")
+                await writer.put(hs_code, page_num, records)
+
+            next_button = page.locator(NEXT_BUTTON_SELECTOR)
+            style = await next_button.get_attribute("style") if await next_button.count() else "display: none"
             if style and "display: none" in style:
-                logger.info("Reached the end of the data.")
+                logger.info(f"[{hs_code}] Reached the end of the data at page {page_num}.")
+                checkpoint.mark_last_page(hs_code, page_num)
                 break
-                
+
+            await limiter.wait()
             try:
+                # Wait for the table to change instead of a fixed sleep after networkidle.
                 await next_button.click()
-                await page.wait_for_load_state("networkidle", timeout=30000)
-                await asyncio.sleep(2)
+                await page.wait_for_function(
+                    "prev => { const b = document.querySelector('div#datamodule tbody');"
+                    " return b && b.innerHTML !== prev; }",
+                    arg=table_html, timeout=30000
+                )
                 page_num += 1
             except Exception as e:
-                logger.error(f"Could not click next button. Assuming end of data. Error: {e}")
+                logger.error(f"[{hs_code}] Could not move past page {page_num}. Assuming end of data. Error: {e}")
                 break
+        else:
+            logger.info(f"[{hs_code}] Reached the maximum page limit of {max_pages}.")
+    finally:
+        await page.close()
 
-        await browser.close()
-    return all_records
 
-# --- 4. Main Async Function ---
+async def fetch_pages(context, jobs: Iterator[Tuple[str, int]], limiter: RateLimiter, writer: BatchWriter,
+                      checkpoint: ScrapeCheckpoint):
+    """Pulls (hs_code, page) jobs from a shared iterator and loads each page by its direct URL."""
+    page = await context.new_page()
+    try:
+        for hs_code, page_num in jobs:
+            last = checkpoint.last_page(hs_code)
+            if last is not None and page_num > last:
+                continue
+            await limiter.wait()
+            try:
+                await page.goto(page_url(hs_code, page_num), wait_until="domcontentloaded", timeout=60000)
+                table_html = await _read_table(page)
+            except Exception as e:
+                logger.error(f"[{hs_code}] Failed to load page {page_num}: {e}")
+                continue
+            if table_html is None:
+                logger.warning(f"[{hs_code}] Page {page_num} did not load its table in time; left for the next run.")
+                continue
+            if is_empty_table(table_html):
+                logger.info(f"[{hs_code}] Page {page_num} is empty; end of data.")
+                checkpoint.mark_last_page(hs_code, page_num - 1)
+                continue
+            records = parse_table_data(table_html, writer.report)
+            logger.info(f"[{hs_code}] Page {page_num}: {len(records)} records.")
+            await writer.put(hs_code, page_num, records)
+    finally:
+        await page.close()
+
+
+def page_jobs(hs_codes: List[str], checkpoint: ScrapeCheckpoint, max_pages: int) -> Iterator[Tuple[str, int]]:
+    """Interleaves pages across HS codes so every context stays busy, skipping checkpointed pages."""
+    for page_num in range(1, max_pages + 1):
+        for hs_code in hs_codes:
+            last = checkpoint.last_page(hs_code)
+            if (last is None or page_num <= last) and not checkpoint.is_page_done(hs_code, page_num):
+                yield hs_code, page_num
+
+
+async def scrape_hs_codes(hs_codes: List[str], collection, concurrency: int = 3, max_pages: int = 100,
+                          checkpoint: Optional[ScrapeCheckpoint] = None, batch_size: int = 100,
+                          insert_concurrency: int = 4) -> IngestionReport:
+    """Scrapes every HS code into `collection` and returns the row counts."""
+    checkpoint = checkpoint or ScrapeCheckpoint()
+    report = IngestionReport()
+    todo = [code for code in hs_codes if not checkpoint.is_complete(code)]
+    if len(todo) < len(hs_codes):
+        logger.info(f"Skipping completed HS codes: {sorted(set(hs_codes) - set(todo))}")
+    if not todo:
+        return report
+
+    limiter = RateLimiter(TRADE_REQUEST_INTERVAL)
+    writer = BatchWriter(collection, checkpoint, report, batch_size=batch_size, insert_concurrency=insert_concurrency)
+    writer_task = writer.start()
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        contexts = [await browser.new_context() for _ in range(max(1, concurrency))]
+        try:
+            if TRADE_PAGE_URL_TEMPLATE:
+                jobs = page_jobs(todo, checkpoint, max_pages)
+                producers = asyncio.gather(*(fetch_pages(ctx, jobs, limiter, writer, checkpoint) for ctx in contexts))
+            else:
+                queue: asyncio.Queue = asyncio.Queue()
+                for code in todo:
+                    queue.put_nowait(code)
+
+                async def worker(ctx):
+                    while not queue.empty():
+                        code = queue.get_nowait()
+                        try:
+                            await walk_hs_code(ctx, code, limiter, writer, checkpoint, max_pages)
+                        except Exception as e:
+                            logger.error(f"[{code}] Scrape failed: {e}", exc_info=True)
+
+                producers = asyncio.gather(*(worker(ctx) for ctx in contexts))
+
+            # If the writer dies (a database error), stop scraping: close() below raises its error.
+            await asyncio.wait({producers, writer_task}, return_when=asyncio.FIRST_COMPLETED)
+            if producers.done():
+                producers.result()
+            else:
+                logger.error("Batch writer failed; cancelling the page scrapers.")
+                producers.cancel()
+                await asyncio.wait({producers})
+        finally:
+            try:
+                await writer.close()
+            finally:
+                for ctx in contexts:
+                    await ctx.close()
+                await browser.close()
+
+    return report
+
 
-async def main():
+def get_collection():
+    client = DataAPIClient(ASTRA_DB_TOKEN)
+    db = client.get_database(ASTRA_DB_ENDPOINT)
+    existing_collections = [c.name for c in db.list_collections()]
+    if COLLECTION_NAME not in existing_collections:
+        logger.info(f"Created collection '{COLLECTION_NAME}'")
+        return db.create_collection(COLLECTION_NAME)
+    logger.info(f"Using existing collection '{COLLECTION_NAME}'")
+    return db.get_collection(COLLECTION_NAME)
+
+
+async def main(hs_codes: List[str], concurrency: int, max_pages: int, restart: bool = False):
     """Main function to orchestrate the scraping and ingestion process."""
     if not all([ASTRA_DB_ENDPOINT, ASTRA_DB_TOKEN]):
         logger.error("Missing environment variables. Check your .env file.")
         return
 
     try:
-        # --- Connect to Astra DB using DataAPIClient ---
-        client = DataAPIClient(ASTRA_DB_TOKEN)
-        db = client.get_database(ASTRA_DB_ENDPOINT)
-
-        # --- Ensure collection exists ---
-        existing_collections = [c.name for c in db.list_collections()]
-        if COLLECTION_NAME not in existing_collections:
-            collection = db.create_collection(COLLECTION_NAME)
-            logger.info(f"Created collection '{COLLECTION_NAME}'")
-        else:
-            collection = db.get_collection(COLLECTION_NAME)
-            logger.info(f"Using existing collection '{COLLECTION_NAME}'")
-
-        # --- Scrape the data ---
-        scraped_records = await scrape_all_pages(TARGET_URL, max_pages=100)
-        
-        if not scraped_records:
-            logger.warning("No records were scraped.")
-            return
-
-        # --- Normalize and Insert Data in Batches ---
-        docs_to_insert = []
-        for record in scraped_records:
-            try:
-                trade_date_obj = datetime.strptime(record['trade_date'], '%d-%b-%Y')
-                record['trade_date'] = trade_date_obj.isoformat()
-                docs_to_insert.append(record)
-            except ValueError:
-                logger.warning(f"Invalid date format for {record['trade_date']}. Skipping record.")
-
-        logger.info(f"Ingesting {len(docs_to_insert)} records in batches...")
-        if docs_to_insert:
-            batch_size = 500
-            for i in range(0, len(docs_to_insert), batch_size):
-                batch = docs_to_insert[i:i + batch_size]
-                # --- FIXED: Removed 'await' from the next line ---
-                collection.insert_many(batch)
-                logger.info(f"  ... inserted batch {i//batch_size + 1}")
-        logger.info("Ingestion complete.")
-
+        collection = get_collection()
+        checkpoint = ScrapeCheckpoint()
+        if restart:
+            checkpoint.reset()
+        report = await scrape_hs_codes(hs_codes, collection, concurrency=concurrency,
+                                       max_pages=max_pages, checkpoint=checkpoint)
+        report.save()
+        if report.new:
+            mark_ingestion()
+        logger.info(
+            f"Ingestion complete for HS codes {hs_codes}: {report.scraped} scraped, {report.new} new, "
+            f"{report.duplicate} duplicate, {report.rejected} rejected (report: {REPORT_FILE})."
+        )
     except Exception as e:
         logger.error(f"The process failed: {e}", exc_info=True)
 
-# --- 5. Run the main async function ---
-        logger.error(f"The process failed: {e}", exc_info=True)
 
-# --- 5. Run the main async function ---
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Scrape trade data for HS codes into Astra DB.")
+    parser.add_argument("--hs-codes", nargs="+", default=DEFAULT_HS_CODES)
+    parser.add_argument("--concurrency", type=int, default=3, help="number of browser contexts")
+    parser.add_argument("--max-pages", type=int, default=100)
+    parser.add_argument("--restart", action="store_true", help="ignore the checkpoint and scrape from page 1")
+    args = parser.parse_args()
+    asyncio.run(main(args.hs_codes, args.concurrency, args.max_pages, args.restart))
@@ -1,51 +1,272 @@
+'''
+scrape.py - Scrapes government scheme pages and their linked PDFs into processed_scheme_docs.json.
+
+Pages are scraped concurrently. Linked PDFs are downloaded over one pooled HTTP client with a
+concurrency limit, parsed in memory by a process pool and cached by content hash (a re-run sends
+conditional requests and reuses the stored bytes and extracted text). Scheme metadata is then
+extracted by the LLM several pages per call.
+'''
+
 import os
-import json
 import re
-import requests
-from bs4 import BeautifulSoup
+import json
+import asyncio
+import hashlib
+import tempfile
 from urllib.parse import urljoin, urlparse
-from typing import List, Dict
-from langchain_community.document_loaders import PlaywrightURLLoader, PyMuPDFLoader
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import fitz
+import httpx
+from bs4 import BeautifulSoup
+from langchain_community.document_loaders import PlaywrightURLLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+
 from utility.LLM import LLMClient
+from utility.Governor import set_process
+from Logging.logger import logger
+
+PAGE_CONCURRENCY = int(os.getenv("SCRAPE_PAGE_CONCURRENCY", "4"))
+DOWNLOAD_CONCURRENCY = int(os.getenv("SCRAPE_DOWNLOAD_CONCURRENCY", "8"))
+EXTRACT_WORKERS = int(os.getenv("SCRAPE_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+METADATA_BATCH_SIZE = int(os.getenv("SCRAPE_METADATA_BATCH_SIZE", "4"))
+LLM_CONCURRENCY = int(os.getenv("SCRAPE_LLM_CONCURRENCY", "2"))
+CACHE_DIR = os.getenv("SCRAPE_CACHE_DIR", os.path.join("Artifacts", "cache", "scrape"))
+PAGE_TEXT_LIMIT = 8000  # Trimming for LLM safety
+
+
+def extract_pdf_text(data: bytes) -> str:
+    """Extracts the text of a PDF held in memory. Module-level so it can run in a worker process."""
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        return "\n".join(page.get_text() for page in doc)
+
+
+class DownloadCache:
+    """
+    Stores downloaded PDFs and their extracted text by content hash, plus a URL index with the
+    validators (ETag / Last-Modified) used to revalidate them on the next run.
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.blob_dir = os.path.join(cache_dir, "blobs")
+        self.text_dir = os.path.join(cache_dir, "text")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.text_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.index: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                logger.warning(f"[Scrape] Could not read cache index ({e}); starting fresh.")
+
+    def validators(self, url: str) -> Dict[str, str]:
+        entry = self.index.get(url) or {}
+        if not os.path.exists(os.path.join(self.blob_dir, entry.get("hash", "-"))):
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def cached_bytes(self, url: str) -> Optional[bytes]:
+        entry = self.index.get(url)
+        if not entry:
+            return None
+        with open(os.path.join(self.blob_dir, entry["hash"]), "rb") as f:
+            return f.read()
 
-def get_clean_web_content(url: str) -> str:
-    try:
-        loader = PlaywrightURLLoader(urls=[url], remove_selectors=["header", "footer", "nav", ".navbar", ".footer"])
-        docs = loader.load()
-        if docs:
-            return docs[0].page_content[:8000]  # Trimming for LLM safety
-    except Exception as e:
-        print(f"[ERROR] Web scrape failed for {url} → {e}")
-    return ""
-
-def extract_pdfs_from_page(url: str) -> List[str]:
-    try:
-        html = requests.get(url, timeout=15).text
-        soup = BeautifulSoup(html, "html.parser")
-        base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
-        return [urljoin(base_url, a['href']) for a in soup.find_all('a', href=True) if a['href'].lower().endswith('.pdf')]
-    except Exception as e:
-        print(f"[ERROR] Failed to extract PDFs from {url} → {e}")
-        return []
-
-def extract_pdf_content(pdf_urls: List[str]) -> str:
-    combined_text = ""
-    for pdf_url in pdf_urls:
+    def put(self, url: str, data: bytes, headers: httpx.Headers) -> str:
+        content_hash = hashlib.sha256(data).hexdigest()
+        blob_path = os.path.join(self.blob_dir, content_hash)
+        if not os.path.exists(blob_path):
+            with open(blob_path, "wb") as f:
+                f.write(data)
+        self.index[url] = {
+            "hash": content_hash,
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+        }
+        return content_hash
+
+    def hash_of(self, url: str) -> Optional[str]:
+        return (self.index.get(url) or {}).get("hash")
+
+    def get_text(self, content_hash: str) -> Optional[str]:
+        path = os.path.join(self.text_dir, f"{content_hash}.txt")
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return f.read()
+        return None
+
+    def put_text(self, content_hash: str, text: str):
+        with open(os.path.join(self.text_dir, f"{content_hash}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def save(self):
+        with tempfile.NamedTemporaryFile("w", dir=self.cache_dir, delete=False, suffix=".tmp", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2)
+            tmp_path = f.name
+        os.replace(tmp_path, self.index_path)
+
+
+class SchemeScraper:
+    def __init__(self, llm: Optional[LLMClient] = None, cache: Optional[DownloadCache] = None):
+        self.llm = llm or LLMClient()
+        self.cache = cache or DownloadCache()
+        self.page_semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+        self.download_semaphore = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+        self.llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        # One task per PDF URL, so a PDF linked from several pages is fetched and parsed once.
+        self._pdf_tasks: Dict[str, asyncio.Task] = {}
+        self._text_tasks: Dict[str, asyncio.Task] = {}
+        self.client: Optional[httpx.AsyncClient] = None
+        self.pool: Optional[ProcessPoolExecutor] = None
+
+    async def get_clean_web_content(self, url: str) -> str:
         try:
-            response = requests.get(pdf_url, timeout=10)
-            filename = f"temp_{os.path.basename(pdf_url).split('?')[0]}"
-            with open(filename, 'wb') as f:
-                f.write(response.content)
+            loader = PlaywrightURLLoader(urls=[url], remove_selectors=["header", "footer", "nav", ".navbar", ".footer"])
+            async with self.page_semaphore:
+                docs = await loader.aload()
+            if docs:
+                return docs[0].page_content[:PAGE_TEXT_LIMIT]
+        except Exception as e:
+            logger.error(f"[Scrape] Web scrape failed for {url} → {e}")
+        return ""
+
+    async def extract_pdfs_from_page(self, url: str) -> List[str]:
+        try:
+            async with self.download_semaphore:
+                resp = await self.client.get(url, timeout=15)
+            soup = BeautifulSoup(resp.text, "html.parser")
+            base_url = f"{urlparse(url).scheme}://{urlparse(url).netloc}"
+            links = [urljoin(base_url, a['href']) for a in soup.find_all('a', href=True) if a['href'].lower().endswith('.pdf')]
+            return list(dict.fromkeys(links))
+        except Exception as e:
+            logger.error(f"[Scrape] Failed to extract PDFs from {url} → {e}")
+            return []
 
-            loader = PyMuPDFLoader(filename)
-            docs = loader.load()
-            combined_text += "\n".join([doc.page_content for doc in docs])
-            os.remove(filename)
+    async def _download(self, pdf_url: str) -> Optional[str]:
+        """Downloads (or revalidates) a PDF and returns its content hash."""
+        async with self.download_semaphore:
+            resp = await self.client.get(pdf_url, headers=self.cache.validators(pdf_url), timeout=30)
+        if resp.status_code == 304:
+            logger.info(f"[Scrape] Not modified, using cache: {pdf_url}")
+            return self.cache.hash_of(pdf_url)
+        resp.raise_for_status()
+        return self.cache.put(pdf_url, resp.content, resp.headers)
 
+    async def _extract(self, content_hash: str, pdf_url: str) -> str:
+        text = self.cache.get_text(content_hash)
+        if text is None:
+            data = self.cache.cached_bytes(pdf_url)
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(self.pool, extract_pdf_text, data)
+            self.cache.put_text(content_hash, text)
+        return text
+
+    async def _pdf_text(self, pdf_url: str) -> str:
+        try:
+            content_hash = await self._download(pdf_url)
+            if content_hash not in self._text_tasks:
+                self._text_tasks[content_hash] = asyncio.ensure_future(self._extract(content_hash, pdf_url))
+            return await self._text_tasks[content_hash]
         except Exception as e:
-            print(f"[WARN] Skipping PDF {pdf_url} → {e}")
-    return combined_text.strip()
+            logger.warning(f"[Scrape] Skipping PDF {pdf_url} → {e}")
+            return ""
+
+    async def extract_pdf_content(self, pdf_urls: List[str]) -> str:
+        for pdf_url in pdf_urls:
+            if pdf_url not in self._pdf_tasks:
+                self._pdf_tasks[pdf_url] = asyncio.ensure_future(self._pdf_text(pdf_url))
+        texts = await asyncio.gather(*(self._pdf_tasks[u] for u in pdf_urls))
+        return "\n".join(t for t in texts if t).strip()
+
+    async def scrape_page(self, url: str) -> Optional[Dict[str, Any]]:
+        logger.info(f"[Scrape] Processing {url}...")
+        if urlparse(url).path.lower().endswith(".pdf"):
+            # A direct PDF link is its own page content.
+            pdf_text = await self.extract_pdf_content([url])
+            return {"url": url, "web_text": pdf_text[:PAGE_TEXT_LIMIT], "pdf_urls": [], "pdf_text": pdf_text} if pdf_text else None
+
+        web_text, pdf_urls = await asyncio.gather(self.get_clean_web_content(url), self.extract_pdfs_from_page(url))
+        if not web_text:
+            logger.warning(f"[Scrape] Skipped {url} due to page scrape failure.")
+            return None
+        pdf_text = await self.extract_pdf_content(pdf_urls)
+        return {"url": url, "web_text": web_text, "pdf_urls": pdf_urls, "pdf_text": pdf_text}
+
+    def _extract_metadata_batch(self, pages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """One LLM call for several pages; returns metadata keyed by source_url."""
+        if len(pages) == 1:
+            page = pages[0]
+            prompt = PROMPT_TEMPLATE.format(source_url=page["url"], page_content=page["web_text"])
+            return {page["url"]: self.llm.run_json(SYSTEM_MSG, prompt)}
+
+        sections = "\n\n".join(
+            BATCH_PAGE_TEMPLATE.format(source_url=page["url"], page_content=page["web_text"])
+            for page in pages
+        )
+        result = self.llm.run_json(SYSTEM_MSG, BATCH_PROMPT_TEMPLATE.format(count=len(pages), pages=sections))
+        return {item.get("source_url"): item for item in result.get("results", []) if isinstance(item, dict)}
+
+    async def extract_metadata(self, pages: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        batches = [pages[i:i + METADATA_BATCH_SIZE] for i in range(0, len(pages), METADATA_BATCH_SIZE)]
+
+        async def run(batch):
+            async with self.llm_semaphore:
+                try:
+                    found = await asyncio.to_thread(self._extract_metadata_batch, batch)
+                except Exception as e:
+                    logger.error(f"[Scrape] Batched metadata extraction failed → {e}")
+                    found = {}
+                # Pages the batch answer missed get an individual call.
+                for page in batch:
+                    if page["url"] not in found:
+                        try:
+                            found.update(await asyncio.to_thread(self._extract_metadata_batch, [page]))
+                        except Exception as e:
+                            logger.error(f"[Scrape] Metadata extraction failed for {page['url']} → {e}")
+                return found
+
+        metadata: Dict[str, Dict[str, Any]] = {}
+        for found in await asyncio.gather(*(run(b) for b in batches)):
+            metadata.update(found)
+        return metadata
+
+    async def run(self, url_list: List[str]) -> List[Dict[str, Any]]:
+        limits = httpx.Limits(max_connections=DOWNLOAD_CONCURRENCY, max_keepalive_connections=DOWNLOAD_CONCURRENCY)
+        async with httpx.AsyncClient(limits=limits, follow_redirects=True) as client:
+            self.client = client
+            with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS) as pool:
+                self.pool = pool
+                pages = [p for p in await asyncio.gather(*(self.scrape_page(u) for u in url_list)) if p]
+        self.cache.save()
+
+        metadata = await self.extract_metadata(pages)
+        records = []
+        for page in pages:
+            meta = metadata.get(page["url"])
+            if not meta:
+                continue
+            raw_text = page["web_text"] + "\n\n" + page["pdf_text"]
+            records.append({
+                "id": re.sub(r'\W+', '_', meta.get("scheme_name", "unnamed").lower()),
+                "scheme_name": meta.get("scheme_name", ""),
+                "aliases": [],
+                "source_urls": [page["url"]] + page["pdf_urls"],
+                "raw_text": raw_text[:5000],
+                "chunks": chunk_text(raw_text),
+                "metadata": {k: v for k, v in meta.items() if k not in ["scheme_name", "source_url"]}
+            })
+            logger.info(f"[Scrape] Completed {records[-1]['id']}")
+        return records
+
 
 def chunk_text(text: str) -> List[str]:
     splitter = RecursiveCharacterTextSplitter(chunk_size=700, chunk_overlap=150)
@@ -53,10 +274,7 @@ def chunk_text(text: str) -> List[str]:
 
 # === PROMPT & METADATA ===
 SYSTEM_MSG = "You extract structured metadata from government scheme webpages."
-PROMPT_TEMPLATE = """
-Extract JSON metadata from the scheme page below using this schema:
-
-{{
+METADATA_SCHEMA = """{{
   "scheme_name": ...,
   "scheme_type": "National" or "State",
   "admin_body": ...,
@@ -67,7 +285,12 @@ Extract JSON metadata from the scheme page below using this schema:
   "user_stage": [...],
   "pre_approval_required": true or false,
   "source_url": "{source_url}"
-}}
+}}"""
+
+PROMPT_TEMPLATE = """
+Extract JSON metadata from the scheme page below using this schema:
+
+""" + METADATA_SCHEMA + """
 
 Only return a clean JSON object. Do not explain anything. Skip missing fields.
 
@@ -76,8 +299,25 @@ Only return a clean JSON object. Do not explain anything. Skip missing fields.
 --- PAGE CONTENT END ---
 """
 
+BATCH_PAGE_TEMPLATE = """--- PAGE START (source_url: {source_url}) ---
+{page_content}
+--- PAGE END ---"""
+
+BATCH_PROMPT_TEMPLATE = """
+Extract JSON metadata for each of the {count} scheme pages below. For every page produce one object
+using this schema, with "source_url" copied exactly from the page header:
+
+""" + METADATA_SCHEMA.format(source_url="<source_url of the page>").replace("{", "{{").replace("}", "}}") + """
+
+Return a single JSON object of the form {{"results": [ ...one object per page... ]}}.
+Only return the JSON. Do not explain anything. Skip missing fields.
+
+{pages}
+"""
+
 # === MAIN ===
 if __name__ == "__main__":
+    set_process("batch")  # a small share of the API quotas, in the batch lane
     url_list = [
         "https://ism.gov.in/design-linked-incentive",
         "https://www.meity.gov.in/offerings/schemes-and-services/details/production-linked-incentive-scheme-pli-2-0-for-it-hardware-wM0MDOtQWa",
@@ -97,49 +337,11 @@ if __name__ == "__main__":
         "http://www.kitven.in/funds/karsemven-fund",
         "https://itbtst.karnataka.gov.in/storage/pdf-files/EoI%20for%20Anchor%20Units%20FOR%20emc2ENG.pdf",
         "https://www.coe-iot.com/"
-    ]    
-    llm = LLMClient()
-    final_records = []
-
-    for url in url_list:
-        print(f"\nProcessing {url}...")
-        web_text = get_clean_web_content(url)
-        if not web_text:
-            print("Skipped due to page scrape failure.")
-            continue
-
-        # Extract metadata
-        try:
-            prompt = PROMPT_TEMPLATE.format(source_url=url, page_content=web_text)
-            metadata = llm.run_json(SYSTEM_MSG, prompt)
-        except Exception as e:
-            print(f"[ERROR] Metadata extraction failed for {url} → {e}")
-            continue
-
-        # Extract PDF content
-        pdf_urls = extract_pdfs_from_page(url)
-        pdf_text = extract_pdf_content(pdf_urls)
-
-        # Combine all raw text and chunk
-        raw_text = web_text + "\n\n" + pdf_text
-        chunks = chunk_text(raw_text)
-
-        # Prepare output
-        record = {
-            "id": re.sub(r'\W+', '_', metadata.get("scheme_name", "unnamed").lower()),
-            "scheme_name": metadata.get("scheme_name", ""),
-            "aliases": [],
-            "source_urls": [url] + pdf_urls,
-            "raw_text": raw_text[:5000], 
-            "chunks": chunks,
-            "metadata": {k: v for k, v in metadata.items() if k not in ["scheme_name", "source_url"]}
-        }
-
-        final_records.append(record)
-        print(f"Completed {record['id']}")
+    ]
+    final_records = asyncio.run(SchemeScraper().run(url_list))
 
     # Save result
     with open("processed_scheme_docs.json", "w", encoding="utf-8") as f:
         json.dump(final_records, f, indent=2, ensure_ascii=False)
 
-    print(f"\nSaved {len(final_records)} records to processed_scheme_docs.json")
+    logger.info(f"Saved {len(final_records)} records to processed_scheme_docs.json")
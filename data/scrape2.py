@@ -1,35 +1,30 @@
+'''
+scrape2.py - Generates scheme metadata (schema) for a webpage plus a bundle of PDFs.
+
+The sources are streamed page by page into chunks (data/PageStream.py) and grouped into batches
+that fit comfortably in one prompt. Each batch is mapped to a partial schema by the LLM, a few
+batches at a time, and the partials are reduced into one schema. Memory stays bounded by the
+batches in flight, and no single call sees more than one batch, however large the bundle.
+'''
+
 import os
 import json
-import fitz
+import asyncio
+from collections import Counter
+from itertools import chain
+from typing import Any, Dict, Iterable, Iterator, List
+
 from utility.LLM import LLMClient
+from utility.Governor import set_process
 from Logging.logger import logger
+from data.PageStream import iter_pdf_pages, iter_text_blocks, iter_chunks, iter_batches
 
-def read_text_file(filepath: str) -> str:
-    try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return f.read()
-    except Exception as e:
-        logger.error(f"Failed to read text file {filepath}: {e}")
-        return ""
-
-def extract_text_from_pdf(filepath: str) -> str:
-    try:
-        doc = fitz.open(filepath)
-        text = "\n".join(page.get_text() for page in doc)
-        return text
-    except Exception as e:
-        logger.error(f"Failed to extract PDF {filepath}: {e}")
-        return ""
-
-def generate_schema(text_content: str, source_files: list, source_url: str) -> dict:
-    llm = LLMClient()
+MAP_BATCH_CHARS = int(os.getenv("SCHEMA_MAP_BATCH_CHARS", "24000"))
+MAP_CONCURRENCY = int(os.getenv("SCHEMA_MAP_CONCURRENCY", "3"))
 
-    SYSTEM_MSG = "You are an expert data extractor who creates metadata for government scheme documents."
+SYSTEM_MSG = "You are an expert data extractor who creates metadata for government scheme documents."
 
-    USER_PROMPT = f"""
-Given the following content from a government scheme (webpage + PDFs), extract structured metadata using this schema:
-
-{{
+SCHEMA_TEMPLATE = """{{
   "scheme_name": ...,
   "scheme_type": "National" or "State",
   "admin_body": ...,
@@ -40,16 +35,112 @@ Given the following content from a government scheme (webpage + PDFs), extract s
   "user_stage": [...],
   "pre_approval_required": True or False,
   "source_url": {source_url},
-  "source_files": {json.dumps(source_files)}
-}}
+  "source_files": {source_files}
+}}"""
+
+MAP_PROMPT = """
+Below is part {part} of the content of a government scheme (webpage + PDFs). Extract structured
+metadata using this schema, filling only the fields this part actually supports:
+
+{schema}
 
 --- START CONTENT ---
-{text_content[:8000]}
+{content}
 --- END CONTENT ---
 Only return the JSON.
 """
 
-    return llm.run_json(SYSTEM_MSG, USER_PROMPT)
+REDUCE_PROMPT = """
+The following JSON objects were extracted from different parts of the same government scheme's
+documents. Merge them into one object using this schema. Prefer values supported by several
+parts, keep every distinct relevant list item, and drop contradictions you cannot resolve.
+
+{schema}
+
+--- PARTIAL EXTRACTIONS ---
+{partials}
+--- END ---
+Only return the JSON.
+"""
+
+
+def iter_source_pages(webpage_txt: str, pdf_files: List[str]) -> Iterator[str]:
+    """Streams the webpage text, then every PDF page, with a header marking each PDF."""
+    yield from iter_text_blocks(webpage_txt)
+    for pdf in pdf_files:
+        yield f"--- PDF: {os.path.basename(pdf)} ---"
+        try:
+            yield from iter_pdf_pages(pdf)
+        except Exception as e:
+            logger.error(f"Skipping unreadable PDF {pdf}: {e}")
+
+
+def merge_partials(partials: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Deterministic reduce: most common scalar per field, union of lists, any() for booleans."""
+    merged: Dict[str, Any] = {}
+    keys = list(dict.fromkeys(k for p in partials for k in p))
+    for key in keys:
+        values = [p[key] for p in partials if p.get(key) not in (None, "", [], "...")]
+        if not values:
+            continue
+        if all(isinstance(v, bool) for v in values):
+            merged[key] = any(values)
+        elif any(isinstance(v, list) for v in values):
+            items = chain.from_iterable(v if isinstance(v, list) else [v] for v in values)
+            merged[key] = list(dict.fromkeys(i for i in items if isinstance(i, (str, int, float, bool))))
+        else:
+            merged[key] = Counter(json.dumps(v, sort_keys=True) for v in values).most_common(1)[0][0]
+            merged[key] = json.loads(merged[key])
+    return merged
+
+
+async def map_partials(llm: LLMClient, batches: Iterable, schema: str, concurrency: int = MAP_CONCURRENCY) -> List[Dict[str, Any]]:
+    """Runs the map step with at most `concurrency` batches in flight; batches are pulled lazily."""
+    async def run(index: int, chunks: List[str]):
+        prompt = MAP_PROMPT.format(part=index + 1, schema=schema, content="\n".join(chunks))
+        try:
+            return index, await asyncio.to_thread(llm.run_json, SYSTEM_MSG, prompt)
+        except Exception as e:
+            logger.error(f"Map step failed for part {index + 1}: {e}")
+            return index, None
+
+    results: Dict[int, Dict[str, Any]] = {}
+    pending = set()
+    for index, chunks in batches:
+        if len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            results.update(t.result() for t in done)
+        pending.add(asyncio.create_task(run(index, chunks)))
+        logger.info(f"Queued part {index + 1} for schema extraction.")
+    if pending:
+        done, _ = await asyncio.wait(pending)
+        results.update(t.result() for t in done)
+    return [results[i] for i in sorted(results) if results[i]]
+
+
+async def generate_schema(pages: Iterable[str], source_files: list, source_url: str) -> dict:
+    llm = LLMClient()
+    schema = SCHEMA_TEMPLATE.format(source_url=source_url, source_files=json.dumps(source_files))
+
+    batches = iter_batches(iter_chunks(pages, chunk_size=2000, chunk_overlap=100), MAP_BATCH_CHARS)
+    partials = await map_partials(llm, batches, schema)
+    if not partials:
+        raise ValueError("No part of the content produced a schema.")
+    logger.info(f"Reducing {len(partials)} partial schemas.")
+
+    result = partials[0]
+    if len(partials) > 1:
+        try:
+            result = await asyncio.to_thread(
+                llm.run_json, SYSTEM_MSG, REDUCE_PROMPT.format(schema=schema, partials=json.dumps(partials, indent=1))
+            )
+        except Exception as e:
+            logger.warning(f"LLM reduce failed ({e}); merging partial schemas deterministically.")
+            result = merge_partials(partials)
+
+    result["source_url"] = source_url
+    result["source_files"] = source_files
+    return result
 
 def main():
     # ==== UPDATE THESE ====
@@ -99,16 +190,12 @@ def main():
     output_file = "output/nsic_schema.json"
     # =======================
 
-    logger.info("Reading webpage text...")
-    all_text = read_text_file(webpage_txt)
-
-    logger.info("Reading PDFs...")
-    for pdf in pdf_files:
-        pdf_text = extract_text_from_pdf(pdf)
-        all_text += f"\n\n--- PDF: {os.path.basename(pdf)} ---\n" + pdf_text
-
-    logger.info("Generating schema from LLM...")
-    schema = generate_schema(all_text, [webpage_txt] + pdf_files, source_url = "https://msme.gov.in/schemes/schemes-national-small-industries-corporation" )
+    logger.info("Streaming webpage text and PDFs into the schema generator...")
+    schema = asyncio.run(generate_schema(
+        iter_source_pages(webpage_txt, pdf_files),
+        [webpage_txt] + pdf_files,
+        source_url="https://msme.gov.in/schemes/schemes-national-small-industries-corporation"
+    ))
 
     os.makedirs(os.path.dirname(output_file), exist_ok=True)
     with open(output_file, "w", encoding="utf-8") as f:
@@ -117,4 +204,5 @@ def main():
     logger.info(f"Schema written to {output_file}")
 
 if __name__ == "__main__":
+    set_process("batch")  # a small share of the API quotas, in the batch lane
     main()
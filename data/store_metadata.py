@@ -5,6 +5,8 @@ from Logging.logger import logger
 from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_astradb import AstraDBVectorStore
 from langchain_core.documents import Document
+from utility.SemanticCache import mark_ingestion
+from data.IngestionManifest import IngestionManifest, file_sha256, sync_source, prune_sources
 
 load_dotenv()
 
@@ -35,13 +37,16 @@ def load_metadata_json(json_path: str) -> dict:
         return {}
 
 def store_metadata_documents(json_folder: str):
-    documents = []
+    manifest = IngestionManifest(COLLECTION_NAME)
+    json_files = sorted(f for f in os.listdir(json_folder) if f.endswith(".json"))
+    changed = prune_sources(vectorstore, manifest, json_files)
 
-    for filename in os.listdir(json_folder):
-        if not filename.endswith(".json"):
+    for filename in json_files:
+        path = os.path.join(json_folder, filename)
+        content_hash = file_sha256(path)
+        if manifest.is_done(filename, content_hash):
             continue
 
-        path = os.path.join(json_folder, filename)
         metadata = load_metadata_json(path)
         if not metadata:
             continue
@@ -52,17 +57,18 @@ def store_metadata_documents(json_folder: str):
 
         try:
             doc = Document(page_content=json.dumps(metadata), metadata=metadata)
-            documents.append(doc)
-            logger.info(f"Prepared document from {filename}")
+            upserted, deleted = sync_source(
+                vectorstore, manifest, filename, content_hash, [doc],
+                legacy_filter={"id": metadata["id"]}
+            )
+            changed += upserted + deleted
+            logger.info(f"Synced metadata document from {filename} ({upserted} upserted, {deleted} deleted)")
         except Exception as e:
-            logger.error(f"Failed to prepare {filename}: {e}")
+            logger.error(f"Failed to store {filename}: {e}")
 
-    if documents:
-        try:
-            vectorstore.add_documents(documents)
-            logger.info(f"Inserted {len(documents)} metadata documents into Astra DB.")
-        except Exception as e:
-            logger.error(f"Failed to insert documents: {e}")
+    if changed:
+        logger.info(f"Metadata collection updated ({changed} documents changed).")
+        mark_ingestion()
 
 # === Main ===
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+'''
+trade_parser.py - Fast extraction of shipment rows from exportimportdata.in table HTML.
+
+The scraper only needs the text of the nine <td> cells of each <tr>, so instead of building a
+BeautifulSoup tree per page this walks the markup with precompiled regular expressions and
+converts the cells straight into typed fields. On the serialized DOM that page.inner_html
+returns, output matches the previous BeautifulSoup implementation
+(see benchmarks/trade_parser_benchmark.py).
+'''
+
+import re
+import html
+import hashlib
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+COLUMNS = (
+    "trade_date", "indian_port", "cth", "item_description", "quantity",
+    "uqc", "unit_price_usd", "fob_usd", "destination_port",
+)
+
+# Rows and cells end at their closing tag or, when it is omitted, at the next sibling.
+_ROW_RE = re.compile(r"<tr\b[^>]*>(.*?)(?=</tr\s*>|<tr\b|</tbody\s*>|</table\s*>|\Z)", re.S | re.I)
+_CELL_RE = re.compile(r"<td\b[^>]*>(.*?)(?=</td\s*>|<td\b|\Z)", re.S | re.I)
+_TAG_RE = re.compile(r"<[^>]*>")
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.S)
+
+
+def _cell_text(raw: str) -> str:
+    if "<" in raw:
+        raw = _TAG_RE.sub("", raw)
+    if "&" in raw:
+        raw = html.unescape(raw)
+    return raw.strip()
+
+
+def iter_rows(html_content: str) -> Iterator[List[str]]:
+    """Yields the stripped text of the <td> cells of every <tr> in the fragment."""
+    if "<!--" in html_content:
+        html_content = _COMMENT_RE.sub("", html_content)
+    for row in _ROW_RE.finditer(html_content):
+        yield [_cell_text(cell) for cell in _CELL_RE.findall(row.group(1))]
+
+
+def to_record(cells: List[str]) -> Dict[str, Any]:
+    """Converts the nine cells of a row into typed fields. Raises ValueError on bad values."""
+    return {
+        "trade_date": cells[0],
+        "indian_port": cells[1],
+        "cth": int(cells[2]),
+        "item_description": cells[3],
+        "quantity": int(cells[4].replace(',', '')),
+        "uqc": cells[5],
+        "unit_price_usd": float(cells[6].replace(',', '')),
+        "fob_usd": float(cells[7].replace(',', '')),
+        "destination_port": cells[8],
+    }
+
+
+def parse_rows(html_content: str, on_reject: Optional[Callable[[List[str], Exception], None]] = None) -> List[Dict[str, Any]]:
+    """Typed records for every 9-column row; rows that fail conversion go to `on_reject`."""
+    records = []
+    for cells in iter_rows(html_content):
+        if len(cells) != len(COLUMNS):
+            continue
+        try:
+            records.append(to_record(cells))
+        except ValueError as e:
+            if on_reject is not None:
+                on_reject(cells, e)
+    return records
+
+
+# Fields that identify a shipment; the same row scraped twice hashes to the same _id.
+NATURAL_KEY = (
+    "trade_date", "indian_port", "destination_port", "cth",
+    "item_description", "quantity", "unit_price_usd",
+)
+
+
+def record_id(record: Dict[str, Any]) -> str:
+    """Deterministic _id from the natural key, insensitive to case and whitespace differences."""
+    parts = []
+    for field in NATURAL_KEY:
+        value = record.get(field)
+        if isinstance(value, float):
+            value = f"{value:.4f}"
+        parts.append(" ".join(str(value).split()).casefold())
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()[:32]
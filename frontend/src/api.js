@@ -19,19 +19,24 @@ async function startPipeline(userQuery) {
   return data;
 }
 
-// Continue the pipeline with chat memory
+// Continue the pipeline; the chat memory stays on the server, we only send the version we hold
 async function continuePipeline(userQuery, conversationState) {
   const res = await fetch(BASE_URL + '/continue', {
     method: 'POST',
     headers: { 'Content-Type': 'application/json' },
     body: JSON.stringify({
       user_query: userQuery,
-      conversation_state: conversationState
+      conversation_id: conversationState?.conversation_id,
+      state_version: conversationState?.version
     })
   });
 
   const data = await res.json();
 
+  // The server no longer holds this conversation (expired or restarted): start a new one
+  if (res.status === 404) {
+    return startPipeline(userQuery);
+  }
   if (!res.ok) {
     throw new Error(data.detail || 'Pipeline continuation failed');
   }
@@ -40,9 +45,58 @@ async function continuePipeline(userQuery, conversationState) {
   return data;
 }
 
-// Poll the pipeline status
-async function getPipelineStatus() {
-  const res = await fetch(BASE_URL + '/status');
+// Submit a turn as a background job; the response only carries the job id
+async function submitJob(userQuery, conversationState) {
+  const res = await fetch(BASE_URL + '/jobs', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({
+      user_query: userQuery,
+      conversation_id: conversationState?.conversation_id,
+      state_version: conversationState?.version
+    })
+  });
+
+  const data = await res.json();
+
+  // The server no longer holds this conversation (expired or restarted): start a new one
+  if (res.status === 404 && conversationState) {
+    return submitJob(userQuery, null);
+  }
+  if (res.status === 429) {
+    const retryAfter = res.headers.get('Retry-After');
+    throw new Error(`The server is busy, please try again in ${retryAfter || 'a few'} seconds.`);
+  }
+  if (!res.ok) {
+    throw new Error(data.detail || 'Job submission failed');
+  }
+
+  console.log(data);
+  return data;
+}
+
+// Poll a background job (its result arrives with the final status)
+async function getJobStatus(jobId) {
+  const res = await fetch(BASE_URL + '/status/' + jobId);
+
+  const data = await res.json();
+
+  if (!res.ok) {
+    throw new Error(data.detail || 'Job status fetch failed');
+  }
+
+  console.log(data);
+  return data;
+}
+
+// Poll the pipeline status (the state comes back as a delta against the version we hold)
+async function getPipelineStatus(conversationState) {
+  const params = new URLSearchParams();
+  if (conversationState) {
+    params.set('conversation_id', conversationState.conversation_id);
+    params.set('since', conversationState.version);
+  }
+  const res = await fetch(BASE_URL + '/status?' + params);
 
   const data = await res.json();
 
@@ -54,8 +108,18 @@ async function getPipelineStatus() {
   return data;
 }
 
+// Apply a compact state view from the server to the state we hold
+function mergeState(conversationState, view) {
+  if (!view) return conversationState;
+  const base = view.delta && conversationState ? conversationState.sections : {};
+  return { ...view, sections: { ...base, ...view.sections } };
+}
+
 export default {
   startPipeline,
   continuePipeline,
-  getPipelineStatus
+  getPipelineStatus,
+  submitJob,
+  getJobStatus,
+  mergeState
 };
\ No newline at end of file
@@ -8,6 +8,7 @@ function Chatbot() {
     const [messages, setMessages] = useImmer([]);
     const [newMessage, setNewMessage] = useState('');
     const [isPolling, setIsPolling] = useState(false);
+    const [jobId, setJobId] = useState(null);
     const [conversationState, setConversationState] = useState(null);
 
     const isLoading = isPolling;
@@ -32,24 +33,16 @@ function Chatbot() {
         setNewMessage('');
 
         try {
-        let response;
-
-        if (conversationState) {
-            response = await api.continuePipeline(trimmedMessage, conversationState);
-        } else {
-            response = await api.startPipeline(trimmedMessage);
-        }
-
-        if (response.state) {
-            setConversationState(response.state);
-        }
+        // Long analyses run as background jobs, so no request stays open while they do.
+        const job = await api.submitJob(trimmedMessage, conversationState);
+        setJobId(job.job_id);
         setIsPolling(true);
         } catch (err) {
         console.error(err);
         setMessages(draft => {
             draft[draft.length - 1] = {
             role: 'assistant',
-            content: 'Something went wrong while processing your query.',
+            content: err.message || 'Something went wrong while processing your query.',
             loading: false
             };
         });
@@ -57,35 +50,35 @@ function Chatbot() {
     };
 
     useEffect(() => {
-        if (!isPolling) return;
+        if (!isPolling || !jobId) return;
 
         const interval = setInterval(async () => {
         try {
-            const status = await api.getPipelineStatus();
-            console.log(`Status from /status: ${JSON.stringify(status)}`);
+            const job = await api.getJobStatus(jobId);
+            console.log(`Status from /status/${jobId}: ${JSON.stringify(job)}`);
 
-            if (status.state) {
-                setConversationState(status.state);
+            if (job.result?.state) {
+                setConversationState(prev => api.mergeState(prev, job.result.state));
             }
 
             setMessages(draft => {
                 const last = draft[draft.length - 1];
-                if (status.stage === 'COMPLETED' && status.results) {
-                    console.log(`Results: ${JSON.stringify(status.results)}`);
-                    
-                    // --- THE ONLY MODIFICATION ---
+                if (job.status === 'completed' || job.status === 'failed') {
+                    console.log(`Results: ${JSON.stringify(job.result?.results)}`);
+
                     // This passes the raw results object, allowing ChatMessages to decide how to render it.
                     draft[draft.length - 1] = {
                         role: 'assistant',
-                        content: status.results,
+                        content: job.result?.results || job.result?.message || 'Something went wrong while processing your query.',
                         loading: false
                     };
-                    // --- END OF MODIFICATION ---
 
                     setIsPolling(false);
                     clearInterval(interval);
                 } else {
-                    last.content = `Current stage: ${status.stage}`;
+                    last.content = job.status === 'queued'
+                        ? `Queued (position ${job.queue_position ?? 0})`
+                        : `Current stage: ${job.stage || 'STARTING'}`;
                 }
             });
         } catch (err) {
@@ -103,7 +96,7 @@ function Chatbot() {
         }, 2000);
 
         return () => clearInterval(interval);
-    }, [isPolling, setMessages]);
+    }, [isPolling, jobId, setMessages]);
 
     return (
         <div className='relative grow flex flex-col gap-6 pt-6'>
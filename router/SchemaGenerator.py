@@ -1,12 +1,13 @@
 import json
-from typing import Dict, Any, Type
+from typing import Dict, Any, Type, Callable, Optional
 from pydantic import BaseModel, ValidationError
 from utility.LLM import LLMClient
 from utility.model import ConversationState
+from utility.ConversationSummary import context_summary
 
 class SchemaGenerator:
-    def __init__(self):
-        self.llm = LLMClient(model="meta-llama/llama-4-maverick-17b-128e-instruct")
+    def __init__(self, model: Optional[str] = None):
+        self.llm = LLMClient(model=model, route="schema_generation")
 
     def generate(
         self,
@@ -15,17 +16,22 @@ class SchemaGenerator:
         model_class: Type[BaseModel],
         user_input: Dict[str, Any] = None,
         state: ConversationState | None = None,
-    ) -> Dict[str, Any]:
+        validate: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    ) -> Any:
+        """
+        Fills `model_class` from the LLM output merged with `user_input`. Returns the merged dict, or
+        validate(dict) when a validator is given; a ValueError from it retries on a larger model.
+        """
         user_input = user_input or {}
         context_hint = ""
         if state:
             last_tool = state.last_tool_used or ""
-            last_msg = state.messages[-1].content if state.messages else ""
+            summary = context_summary(state)
             last_entities = state.context_entities or {}
 
             context_hint = f"""
             Previous tool used: {last_tool}
-            Last assistant message: {last_msg}
+            Conversation summary: {summary}
             Previously detected entities (if any): {json.dumps(last_entities)}
             Use this context if the current query is ambiguous or a follow-up.
             """
@@ -46,14 +52,17 @@ class SchemaGenerator:
             "Return only a valid JSON object matching this schema."
         )
 
+        def finalize(llm_output: Dict[str, Any]) -> Any:
+            final_input = {**llm_output, **user_input}
+            return validate(final_input) if validate is not None else final_input
+
         try:
-            llm_output = self.llm.run_json(system_message, user_message)
+            return self.llm.run_json(system_message, user_message, validate=finalize)
+        except ValidationError as e:
+            raise ValueError(f"LLM output did not match schema requirements:\n{e}")
         except Exception as e:
             raise ValueError(f"Failed to generate schema input via LLM: {e}")
 
-        final_input = {**llm_output, **user_input}
-        return final_input
-
     # --- Minimal normalization helpers (added) ---
 
     def _coerce_location(self, loc: Any) -> Dict[str, Any]:
@@ -107,12 +116,10 @@ class SchemaGenerator:
         user_input: Dict[str, Any] = None,
         state: ConversationState | None = None,
     ) -> BaseModel:
-        raw_input = self.generate(metadata, execution_plan, model_class, user_input, state)
-
-        # --- Minimal, necessary normalization before Pydantic validation ---
-        normalized_input = self._normalize_for_model(raw_input)
-
-        try:
+        def to_instance(raw_input: Dict[str, Any]) -> BaseModel:
+            # --- Minimal, necessary normalization before Pydantic validation ---
+            normalized_input = self._normalize_for_model(raw_input)
             return model_class(**normalized_input)
-        except ValidationError as e:
-            raise ValueError(f"LLM output did not match schema requirements:\n{e}")
+
+        # If this route is on a smaller tier, output that fails validation is retried on a larger one (see LLMClient.run_json).
+        return self.generate(metadata, execution_plan, model_class, user_input, state, validate=to_instance)
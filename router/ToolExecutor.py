@@ -1,5 +1,6 @@
 import sys
 import json
+import logging
 import asyncio
 import re
 import ast
@@ -22,7 +23,9 @@ from utility.model import (
 from utility.StateManager import StateManager
 from utility.register_tools import load_registry_from_file
 from utility.LLM import LLMClient
-from Logging.logger import logger
+from utility.Tracing import span, inject
+from utility.Metrics import mcp_sessions_open
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 
 def safe_json_parse(raw_output: str) -> dict:
@@ -77,7 +80,7 @@ class ToolExecutor:
 
             self.resolver = ModelResolver("utility.model")
             self.schema_generator = SchemaGenerator()
-            self.llm_client = LLMClient(model="meta-llama/llama-4-maverick-17b-128e-instruct")
+            self.llm_client = LLMClient(route="final_explanation")
 
             self.state_manager = StateManager(initial_state=conversation_state)
             self.conversation_state = self.state_manager.get_state()
@@ -106,12 +109,18 @@ class ToolExecutor:
         endpoint = self.tool_registry[tool_name].endpoint
         logger.info(f"Connecting to MCP server at {endpoint} for tool '{tool_name}'")
 
-        async with streamablehttp_client(url=endpoint) as (read_stream, write_stream, _):
-            async with ClientSession(read_stream, write_stream) as session:
-                logger.info("Initializing MCP session...")
-                await session.initialize()
-                logger.info(f"MCP session initialized for {endpoint}")
-                yield session
+        mcp_sessions_open.inc(tool=tool_name)
+        try:
+            # The traceparent header lets the MCP host continue this request's trace.
+            async with streamablehttp_client(url=endpoint, headers=inject()) as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream) as session:
+                    logger.info("Initializing MCP session...")
+                    with span("mcp.initialize", **{"mcp.endpoint": endpoint}):
+                        await session.initialize()
+                    logger.info(f"MCP session initialized for {endpoint}")
+                    yield session
+        finally:
+            mcp_sessions_open.dec(tool=tool_name)
 
     async def get_required_inputs(self, session: ClientSession, tool_name: str) -> dict:
         try:
@@ -162,13 +171,27 @@ class ToolExecutor:
             raise UdayamitraException(f"Execution type '{plan.execution_type}' not supported yet.", sys)
 
         for task in plan.task_list:
-            async with self.connect_to_server_for_tool(task.tool_name) as session:
-                try:
-                    required_inputs = await self.get_required_inputs(session, task.tool_name)
-                    input_data = self._resolve_input(task, results)
-                    schema_class = self._get_schema(self.tool_registry[task.tool_name].input_schema)
+            with span("mcp.tool", **{"mcp.tool": task.tool_name}):
+                await self._run_task(task, plan, metadata, results)
+
+        if flatten_output and len(results) == 1:
+            return next(iter(results.values()))
 
-                    full_input = self.schema_generator.generate_instance(
+        log_payload("[FINAL STATE BEFORE RETURN]", self.conversation_state, level=logging.DEBUG)
+        log_payload("Final Execution Results", results)
+        return results if results else "No tools could be executed successfully."
+
+    async def _run_task(self, task: ToolTask, plan: ExecutionPlan, metadata: Metadata, results: Dict[str, Any]):
+        async with self.connect_to_server_for_tool(task.tool_name) as session:
+            try:
+                required_inputs = await self.get_required_inputs(session, task.tool_name)
+                input_data = self._resolve_input(task, results)
+                schema_class = self._get_schema(self.tool_registry[task.tool_name].input_schema)
+
+                # Blocking LLM calls (and their governor waits) stay off the event loop.
+                with span("schema_generation", **{"schema": schema_class.__name__}):
+                    full_input = await asyncio.to_thread(
+                        self.schema_generator.generate_instance,
                         metadata=metadata.model_dump(),
                         execution_plan=plan.model_dump(),
                         model_class=schema_class,
@@ -176,30 +199,31 @@ class ToolExecutor:
                         state=self.conversation_state
                     )
 
-                    try:
-                        known = _model_known_fields(schema_class)
-                        extras = _collect_extras_for_context(task.input, known)
-
-                        if extras and ("context_entities" in known):
-                            current_ctx = getattr(full_input, "context_entities", None) or {}
-                            merged_ctx = {**current_ctx, **extras}
-
-                            full_input = full_input.copy(update={"context_entities": merged_ctx})
-
-                            self.state_manager.update_context_entities(merged_ctx)
-                    except Exception as _e:
-                        logger.warning(f"[extras passthrough] skipped: {_e}")
-                    
-                    logger.info(f"Calling tool '{task.tool_name}' with input: {full_input}")
-                    wrapped_input = {"schema_dict": full_input.model_dump()}
-                    logger.info(f"Wrapped input for tool '{task.tool_name}': {wrapped_input}")
+                try:
+                    known = _model_known_fields(schema_class)
+                    extras = _collect_extras_for_context(task.input, known)
+
+                    if extras and ("context_entities" in known):
+                        current_ctx = getattr(full_input, "context_entities", None) or {}
+                        merged_ctx = {**current_ctx, **extras}
+
+                        full_input = full_input.copy(update={"context_entities": merged_ctx})
+
+                        self.state_manager.update_context_entities(merged_ctx)
+                except Exception as _e:
+                    logger.warning(f"[extras passthrough] skipped: {_e}")
+                
+                logger.info("Calling tool '%s'", task.tool_name)
+                wrapped_input = {"schema_dict": full_input.model_dump()}
+                log_payload(f"Wrapped input for tool '{task.tool_name}'", wrapped_input)
+                with span("mcp.call_tool", **{"mcp.server_tool": required_inputs["server_Tool"]}):
                     response = await session.call_tool(required_inputs["server_Tool"], wrapped_input)
 
-                    parsed = {}
-                    if hasattr(response, "content") and response.content:
-                        parsed = ensure_dict(safe_json_parse(response.content[0].text))
-                    
-                    system_prompt = '''You are an expert assistant that formats a tool's raw JSON output into a beautiful, user-friendly, and professional response using Markdown.
+                parsed = {}
+                if hasattr(response, "content") and response.content:
+                    parsed = ensure_dict(safe_json_parse(response.content[0].text))
+                
+                system_prompt = '''You are an expert assistant that formats a tool's raw JSON output into a beautiful, user-friendly, and professional response using Markdown.
 
 Your task is to convert the user's JSON output into a formatted explanation.
 
@@ -217,42 +241,35 @@ RULES:
 6.  **Follow-up Questions:** If you generate follow-up questions, give them a `### Follow-up Questions:` heading.
 '''
 
-                    user_message = f"""Here is the tool's response:\n\n{json.dumps(parsed, indent=2)}\n\nPlease convert this into a beautiful, formatted Markdown explanation."""
-                    final_explanation = self.llm_client.run_chat(system_prompt, user_message)
-
-                    if isinstance(final_explanation, str) and '\\n' in final_explanation:
-                        try:
-                            final_explanation = ast.literal_eval(f"'''{final_explanation}'''")
-                        except Exception:
-                            final_explanation = final_explanation.replace("\\n", "\n")
+                user_message = f"""Here is the tool's response:\n\n{json.dumps(parsed, indent=2)}\n\nPlease convert this into a beautiful, formatted Markdown explanation."""
+                final_explanation = await asyncio.to_thread(self.llm_client.run_chat, system_prompt, user_message)
 
-                    formatted = self.format_explanation(raw=final_explanation)
-                    results[task.tool_name] = {
-                        "output_text": formatted,
-                        "raw_output": parsed
-                    }
-
-                    self.state_manager.set_last_tool(task.tool_name)
-                    self.state_manager.set_tool_memory(task.tool_name, parsed)
-                    self.state_manager.add_message(role="tool", content=formatted, tool_used=task.tool_name)
-                    self.state_manager.set_last_scheme(metadata.entities.get("scheme", ""))
-
-                    merged_context = {
-                        **metadata.entities,
-                        **(metadata.user_profile.model_dump() if metadata.user_profile else {})
-                    }
-                    self.state_manager.update_context_entities(merged_context)
-
-                except Exception as e:
-                    logger.error(f"Error calling tool '{task.tool_name}': {e}")
-                    results[task.tool_name] = f"Failed to process {task.tool_name}: {e}"
-
-        if flatten_output and len(results) == 1:
-            return next(iter(results.values()))
-
-        logger.debug(f"[FINAL STATE BEFORE RETURN] {self.conversation_state.model_dump_json(indent=2)}")
-        logger.info(f"Final Execution Results:\n{json.dumps(results, indent=2)}")
-        return results if results else "No tools could be executed successfully."
+                if isinstance(final_explanation, str) and '\\n' in final_explanation:
+                    try:
+                        final_explanation = ast.literal_eval(f"'''{final_explanation}'''")
+                    except Exception:
+                        final_explanation = final_explanation.replace("\\n", "\n")
+
+                formatted = self.format_explanation(raw=final_explanation)
+                results[task.tool_name] = {
+                    "output_text": formatted,
+                    "raw_output": parsed
+                }
+
+                self.state_manager.set_last_tool(task.tool_name)
+                self.state_manager.set_tool_memory(task.tool_name, parsed)
+                self.state_manager.add_message(role="tool", content=formatted, tool_used=task.tool_name)
+                self.state_manager.set_last_scheme(metadata.entities.get("scheme", ""))
+
+                merged_context = {
+                    **metadata.entities,
+                    **(metadata.user_profile.model_dump() if metadata.user_profile else {})
+                }
+                self.state_manager.update_context_entities(merged_context)
+
+            except Exception as e:
+                logger.error(f"Error calling tool '{task.tool_name}': {e}")
+                results[task.tool_name] = f"Failed to process {task.tool_name}: {e}"
 
     def get_state(self):
         return self.conversation_state
\ No newline at end of file
@@ -1,40 +1,81 @@
 import json
 import re
 import sys
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 
 from utility.model import Metadata, ExecutionPlan, ToolTask, ConversationState
 from utility.LLM import LLMClient
+from utility.ConversationSummary import context_summary
 from router.ToolExecutor import safe_json_parse
-from Logging.logger import logger
+from Logging.logger import logger, log_payload
 from Exception.exception import UdayamitraException
 
 load_dotenv()
 
 class Planner:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
+    def __init__(self, model: Optional[str] = None):
         try:
-            logger.info(f"Initializing Planner with model: {model}")
-            self.llm_client = LLMClient(model=model)
+            self.llm_client = LLMClient(model=model, route="planning")
+            logger.info(f"Initializing Planner with model: {self.llm_client.model}")
         except Exception as e:
             logger.error(f"Failed to initialize Planner: {e}")
             raise UdayamitraException("Failed to initialize Planner", sys)
 
+    def _parse_plan(self, raw_output: str, allowed_tools: List[str]) -> ExecutionPlan:
+        """
+        The execution plan in an LLM response. Raises ValueError for unparseable output, malformed or
+        missing tasks and tools outside `allowed_tools`, so LLMClient.run_structured retries on a larger model.
+        """
+        log_payload("Raw output from LLM", raw_output)
+        plan_dict = safe_json_parse(raw_output)
+        if not isinstance(plan_dict, dict) or ("output_text" in plan_dict and "tasks" not in plan_dict):
+            raise ValueError("Planner output is not a JSON object.")
+
+        # Handle the case where the LLM correctly returns an empty task list
+        tasks_data = plan_dict.get("tasks", [])
+        if not tasks_data and allowed_tools:
+            raise ValueError(f"Planner returned no tasks although tools_required is {allowed_tools}.")
+        if not tasks_data:
+            logger.warning("Planner returned a plan with no tasks.")
+            return ExecutionPlan(execution_type="sequential", task_list=[])
+
+        log_payload("Parsed execution plan", plan_dict)
+
+        if not isinstance(tasks_data, list) or not all(isinstance(task, dict) and "tool" in task and "input" in task for task in tasks_data):
+            raise ValueError("Planner tasks must be a list of objects with 'tool' and 'input'.")
+        unknown = [task["tool"] for task in tasks_data if allowed_tools and task["tool"] not in allowed_tools]
+        if unknown:
+            raise ValueError(f"Planner used tools outside tools_required: {unknown}")
+
+        task_list: List[ToolTask] = [
+            ToolTask(
+                tool_name=task["tool"],
+                input=task["input"],
+                input_from=task.get("input_from")
+            )
+            for task in tasks_data
+        ]
+
+        return ExecutionPlan(
+            execution_type=plan_dict.get("execution_type"),
+            task_list=task_list
+        )
+
     def build_plan(self, metadata: Metadata, state: ConversationState | None = None) -> ExecutionPlan:
         try:
-            logger.info(f"Building execution plan for metadata: {metadata}")
+            log_payload("Building execution plan for metadata", metadata)
             context_hint = ""
 
             if state:
                 last_tool = state.last_tool_used or ""
-                last_msg = state.messages[-1].content if state.messages else ""
+                summary = context_summary(state)
                 last_entities = state.context_entities or {}
 
                 context_hint = f"""
 ## Conversation History (for context):
 - Previous tool used: {last_tool}
-- Last assistant message: {last_msg}
+- Conversation summary: {summary}
 - Previously detected entities: {json.dumps(last_entities, indent=2)}
 Use this context ONLY if the current query is an ambiguous follow-up.
 """.strip()
@@ -73,31 +114,9 @@ The `input` for each tool should be constructed from the `query`, `entities`, an
 }}
 """.strip()
 
-            raw_output = self.llm_client.run_chat(system_prompt, user_prompt)
-            logger.info(f"Raw output from LLM:\n{raw_output}")
-
-            plan_dict = safe_json_parse(raw_output)
-            
-            # Handle the case where the LLM correctly returns an empty task list
-            tasks_data = plan_dict.get("tasks", [])
-            if not tasks_data:
-                logger.warning("Planner returned a plan with no tasks.")
-                return ExecutionPlan(execution_type="sequential", task_list=[])
-
-            logger.info(f"Parsed execution plan:\n{json.dumps(plan_dict, indent=2)}")
-
-            task_list: List[ToolTask] = [
-                ToolTask(
-                    tool_name=task["tool"],
-                    input=task["input"],
-                    input_from=task.get("input_from")
-                )
-                for task in tasks_data
-            ]
-
-            return ExecutionPlan(
-                execution_type=plan_dict["execution_type"],
-                task_list=task_list
+            return self.llm_client.run_structured(
+                system_prompt, user_prompt,
+                lambda raw_output: self._parse_plan(raw_output, metadata.tools_required),
             )
 
         except Exception as e:
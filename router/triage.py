@@ -1,4 +1,5 @@
 from enum import Enum
+from typing import Optional
 from pydantic import BaseModel, Field
 from utility.LLM import LLMClient
 from Logging.logger import logger
@@ -14,8 +15,8 @@ class KnowledgeQueryArgs(BaseModel):
     query: str = Field(..., description="Any user query that requires information, an explanation, or an answer from the knowledge base.")
 
 class TriageClassifier:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
-        self.llm_client = LLMClient(model=model)
+    def __init__(self, model: Optional[str] = None):
+        self.llm_client = LLMClient(model=model, route="triage")
         self.tools = [
             {"type": "function", "function": {"name": "handle_chit_chat", "description": "Route conversational small talk here.", "parameters": ChitChatArgs.model_json_schema()}},
             {"type": "function", "function": {"name": "handle_knowledge_query", "description": "Route any query that requires information or an answer from the knowledge base here. This is the default choice.", "parameters": KnowledgeQueryArgs.model_json_schema()}},
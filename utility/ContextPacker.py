@@ -0,0 +1,204 @@
+'''
+ContextPacker.py - Packs retrieved chunks into a token-budgeted context block for LLM prompts.
+
+Retrieved chunks overlap heavily (the splitters use chunk_overlap=100), so instead of joining every
+chunk verbatim the packer drops duplicates, stitches adjacent chunks of the same source back together,
+keeps the most relevant blocks first and stops at a per-model token budget.
+'''
+
+import os
+import re
+from typing import List, Dict, Any, Optional, Tuple
+
+from Logging.logger import logger
+from utility.model import PackedContext
+
+# Prompt budget (tokens) reserved for retrieved documents, per model.
+MODEL_CONTEXT_BUDGETS = {
+    "meta-llama/llama-4-maverick-17b-128e-instruct": 3000,
+    "meta-llama/llama-4-scout-17b-16e-instruct": 2500,
+    "llama-3.1-8b-instant": 1500,
+}
+DEFAULT_CONTEXT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))
+
+SOURCE_KEYS = ("source_file", "original_filename", "file_name", "source", "id")
+SCORE_KEYS = ("rerank_score", "score")
+MIN_OVERLAP_CHARS = 40
+MAX_OVERLAP_CHARS = 400
+MIN_TAIL_TOKENS = 50
+
+
+class TokenCounter:
+    """Counts tokens with tiktoken when installed, otherwise with a ~4 chars/token estimate."""
+
+    def __init__(self, encoding_name: str = "cl100k_base"):
+        self.encoding = None
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(encoding_name)
+        except Exception as e:
+            logger.debug(f"[ContextPacker] tiktoken unavailable ({e}); using character estimate.")
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self.encoding is not None:
+            return len(self.encoding.encode(text, disallowed_special=()))
+        return max(1, (len(text) + 3) // 4)
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Cuts text to at most max_tokens, preferring to end on a sentence boundary."""
+        if max_tokens <= 0:
+            return ""
+        if self.count(text) <= max_tokens:
+            return text
+        if self.encoding is not None:
+            cut = self.encoding.decode(self.encoding.encode(text, disallowed_special=())[:max_tokens])
+        else:
+            cut = text[:max_tokens * 4]
+        boundary = max(cut.rfind(". "), cut.rfind("\n"))
+        if boundary > len(cut) // 2:
+            cut = cut[:boundary + 1]
+        return cut.rstrip()
+
+
+_token_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter()
+    return _token_counter
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def _overlap_merge(left: str, right: str) -> Optional[str]:
+    """Joins two texts if the tail of `left` repeats as the head of `right`."""
+    limit = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for size in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:size]):
+            return left + right[size:]
+    return None
+
+
+class ContextPacker:
+    def __init__(self, model: Optional[str] = None, token_budget: Optional[int] = None):
+        self.model = model
+        self.token_budget = token_budget or MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+        self.counter = get_token_counter()
+
+    @staticmethod
+    def _source_of(metadata: Dict[str, Any]) -> str:
+        for key in SOURCE_KEYS:
+            value = metadata.get(key)
+            if value:
+                return os.path.basename(str(value)) if key in ("source_file", "file_name") else str(value)
+        return "Retrieved document"
+
+    @staticmethod
+    def _relevance_of(metadata: Dict[str, Any], rank: int) -> Tuple[float, int]:
+        # Sort key: explicit scores first (higher is better), otherwise retrieval rank.
+        for key in SCORE_KEYS:
+            if isinstance(metadata.get(key), (int, float)):
+                return (-float(metadata[key]), rank)
+        return (0.0, rank)
+
+    def _dedupe(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        kept: List[Dict[str, Any]] = []
+        for doc in docs:
+            norm = _normalize(doc["content"])
+            if not norm:
+                continue
+            if any(norm in other["norm"] for other in kept):
+                continue
+            # A later, longer chunk swallows earlier chunks it fully contains.
+            kept = [other for other in kept if other["norm"] not in norm]
+            kept.append({**doc, "norm": norm})
+        return kept
+
+    def _merge_adjacent(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        by_source: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            by_source.setdefault(doc["source"], []).append(doc)
+
+        blocks: List[Dict[str, Any]] = []
+        for source, group in by_source.items():
+            group.sort(key=lambda d: (d["chunk_index"] is None, d["chunk_index"] or 0, d["rank"]))
+            current = None
+            for doc in group:
+                if current is not None:
+                    adjacent = (
+                        current["last_index"] is not None and doc["chunk_index"] is not None
+                        and doc["chunk_index"] - current["last_index"] == 1
+                    )
+                    merged = _overlap_merge(current["content"], doc["content"])
+                    if merged is None and adjacent:
+                        merged = current["content"] + "\n" + doc["content"]
+                    if merged is not None:
+                        current["content"] = merged
+                        current["last_index"] = doc["chunk_index"]
+                        current["relevance"] = min(current["relevance"], doc["relevance"])
+                        continue
+                    blocks.append(current)
+                current = {
+                    "source": source,
+                    "content": doc["content"],
+                    "last_index": doc["chunk_index"],
+                    "relevance": doc["relevance"],
+                }
+            if current is not None:
+                blocks.append(current)
+        return blocks
+
+    def pack(self, documents: List[Dict[str, Any]]) -> PackedContext:
+        """
+        documents: retriever results as dicts with "content" and optional "metadata",
+        in retrieval order (most similar first).
+        """
+        docs = []
+        for rank, doc in enumerate(documents or []):
+            metadata = doc.get("metadata") or {}
+            chunk_index = metadata.get("chunk_index")
+            docs.append({
+                "content": (doc.get("content") or "").strip(),
+                "source": self._source_of(metadata),
+                "chunk_index": int(chunk_index) if isinstance(chunk_index, (int, float)) else None,
+                "rank": rank,
+                "relevance": self._relevance_of(metadata, rank),
+            })
+
+        blocks = self._merge_adjacent(self._dedupe(docs))
+        blocks.sort(key=lambda b: b["relevance"])
+
+        parts, sources = [], []
+        used_tokens, dropped = 0, 0
+        for block in blocks:
+            section = f"[Source: {block['source']}]\n{block['content']}"
+            tokens = self.counter.count(section)
+            remaining = self.token_budget - used_tokens
+            if tokens > remaining:
+                if remaining < MIN_TAIL_TOKENS:
+                    dropped += 1
+                    continue
+                section = self.counter.truncate(section, remaining)
+                tokens = self.counter.count(section)
+            parts.append(section)
+            used_tokens += tokens
+            if block["source"] not in sources:
+                sources.append(block["source"])
+
+        logger.info(
+            f"[ContextPacker] Packed {len(docs)} chunks into {len(parts)} blocks "
+            f"({used_tokens}/{self.token_budget} tokens, {dropped} dropped)."
+        )
+        return PackedContext(
+            text="\n\n".join(parts),
+            sources=sources,
+            token_count=used_tokens,
+            input_chunks=len(docs),
+            dropped_blocks=dropped,
+        )
@@ -0,0 +1,148 @@
+'''
+ConversationStore.py - Server-side conversation state with compact, versioned client views.
+
+The full ConversationState (message history, raw tool outputs in tool_memory, context entities)
+stays on the server, keyed by conversation id. Clients get a compact view instead: the state is
+split into sections, tool_memory is reduced to the tools that have output, and each section is
+hashed. A conversation's version increases whenever a section digest changes, so a client that
+sends the version it already holds (state_version / `since`, or If-None-Match with the ETag)
+receives only the sections that changed since then, or nothing at all.
+
+Compact view:
+    {"conversation_id": ..., "version": 3, "etag": "\"<id>:3\"", "delta": true,
+     "sections": {"messages": [...], "focus": {...}}}
+
+A delta is only possible while the client's version is among the last STATE_HISTORY_VERSIONS
+versions; older or unknown versions get the full compact view ("delta": false).
+'''
+
+import os
+import json
+import uuid
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from Logging.logger import logger
+from utility.model import ConversationState
+from utility.StateManager import StateManager
+
+MAX_CONVERSATIONS = int(os.getenv("MAX_CONVERSATIONS", "1000"))
+STATE_HISTORY_VERSIONS = int(os.getenv("STATE_HISTORY_VERSIONS", "8"))
+
+
+def compact_sections(state: ConversationState) -> Dict[str, Any]:
+    """The client-facing sections of a state; raw tool outputs never leave the server."""
+    return {
+        "messages": [m.model_dump(mode="json", exclude_none=True) for m in state.messages],
+        "history_digest": state.history_digest,
+        "user_profile": state.user_profile.model_dump(mode="json", exclude_none=True) if state.user_profile else None,
+        "context_entities": state.context_entities,
+        "focus": {
+            "last_tool_used": state.last_tool_used,
+            "last_intent": state.last_intent,
+            "last_scheme_mentioned": state.last_scheme_mentioned,
+        },
+        "tools": sorted(name for name, memory in state.tool_memory.items() if memory.data),
+        "missing_inputs": state.missing_inputs,
+    }
+
+
+def _digest(value: Any) -> str:
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+class Conversation:
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.state_manager = StateManager(initial_state=ConversationState())
+        self.version = 0
+        self.lock = threading.Lock()
+        self.turn_lock = asyncio.Lock() # held by the backend while a turn runs
+        self._sections: Dict[str, Any] = {}
+        # version -> section digests, for the last STATE_HISTORY_VERSIONS versions
+        self._history: "OrderedDict[int, Dict[str, str]]" = OrderedDict()
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.conversation_id}:{self.version}"'
+
+    def refresh(self) -> int:
+        """Re-hashes the sections and bumps the version if any of them changed."""
+        with self.lock:
+            sections = compact_sections(self.state_manager.get_state())
+            digests = {name: _digest(value) for name, value in sections.items()}
+            if not self._history or self._history[self.version] != digests:
+                self.version += 1
+                self._history[self.version] = digests
+                while len(self._history) > STATE_HISTORY_VERSIONS:
+                    self._history.popitem(last=False)
+            self._sections = sections
+            return self.version
+
+    def view(self, since: Optional[int] = None) -> Dict[str, Any]:
+        """The compact state, as a delta against `since` when that version is still known."""
+        self.refresh()
+        with self.lock:
+            known = self._history.get(since) if since is not None else None
+            if known is None:
+                sections, delta = self._sections, False
+            else:
+                current = self._history[self.version]
+                sections = {name: value for name, value in self._sections.items() if current[name] != known.get(name)}
+                delta = True
+            return {
+                "conversation_id": self.conversation_id,
+                "version": self.version,
+                "etag": self.etag,
+                "delta": delta,
+                "sections": sections,
+            }
+
+
+class ConversationStore:
+    """Conversations by id, least recently used evicted beyond `max_conversations`."""
+
+    def __init__(self, max_conversations: int = MAX_CONVERSATIONS):
+        self.max_conversations = max_conversations
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self) -> Conversation:
+        conversation = Conversation(uuid.uuid4().hex)
+        with self._lock:
+            self._conversations[conversation.conversation_id] = conversation
+            while len(self._conversations) > self.max_conversations:
+                evicted, _ = self._conversations.popitem(last=False)
+                logger.debug("[ConversationStore] Evicted conversation %s", evicted)
+        return conversation
+
+    def get(self, conversation_id: str) -> Optional[Conversation]:
+        """A conversation by id; there is deliberately no "current" conversation to fall back to."""
+        with self._lock:
+            conversation = self._conversations.get(conversation_id)
+            if conversation is not None:
+                self._conversations.move_to_end(conversation_id)
+            return conversation
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+
+def parse_etag(value: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    """(conversation id, version) from an ETag / If-None-Match value, or (None, None)."""
+    if not value:
+        return None, None
+    value = value.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    conversation_id, _, version = value.strip('"').rpartition(":")
+    if not conversation_id or not version.isdigit():
+        return None, None
+    return conversation_id, int(version)
+
+
+conversation_store = ConversationStore()
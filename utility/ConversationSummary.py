@@ -0,0 +1,108 @@
+'''
+ConversationSummary.py - Running conversation summary for follow-up prompts.
+
+MetadataExtractor, Planner and SchemaGenerator used to paste the last assistant message (often a
+long Markdown answer with tables) into their prompts. They now use context_summary(state): the
+incremental summary kept in ConversationState.conversation_summary, capped at
+SUMMARY_MAX_CHARS, plus a clipped excerpt of the newest answer when the summary has not caught up
+with it yet. Either way the follow-up context has a fixed size.
+
+The backend calls conversation_summarizer.schedule(state) after each turn. The summary is then
+folded forward in the background with the small model of the "conversation_summary" route
+(SUMMARY_MODEL overrides it), from the previous summary and only the turns added since, so
+neither the response nor the next request waits for it.
+'''
+
+import os
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from Logging.logger import logger
+from utility.LLM import LLMClient
+from utility.model import ConversationState, Message
+from utility.Governor import lane
+
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL")
+SUMMARY_MAX_CHARS = int(os.getenv("SUMMARY_MAX_CHARS", "1200"))
+SUMMARY_RECENT_CHARS = int(os.getenv("SUMMARY_RECENT_CHARS", "600"))
+SUMMARY_TURN_MAX_CHARS = 2000 # per turn fed to the summarizer
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit].rsplit(" ", 1)[0] + "..."
+
+
+def _unsummarized(state: ConversationState) -> List[Message]:
+    since = state.summarized_until
+    return [m for m in state.messages if since is None or (m.timestamp is not None and m.timestamp > since)]
+
+
+def context_summary(state: Optional[ConversationState]) -> str:
+    """Bounded conversation context for prompts: the running summary and, if it lags, the latest answer."""
+    if state is None:
+        return ""
+    parts = []
+    if state.conversation_summary:
+        parts.append(state.conversation_summary)
+    latest = next((m for m in reversed(_unsummarized(state)) if m.role in ("assistant", "tool")), None)
+    if latest is not None:
+        parts.append(f"Latest answer (excerpt): {_clip(latest.content, SUMMARY_RECENT_CHARS)}")
+    return "\n".join(parts)
+
+
+class ConversationSummarizer:
+    SYSTEM_PROMPT = (
+        "You maintain a running summary of a conversation between a user and an assistant about Indian "
+        "government schemes and business insights. Given the current summary and the new turns, return the "
+        "updated summary as plain text: the user's goals, stated facts about them (location, sector, category, "
+        "business details), schemes and tools discussed, and key conclusions or figures. "
+        f"Keep it under {SUMMARY_MAX_CHARS // 6} words. Return only the summary."
+    )
+
+    def __init__(self, model: Optional[str] = SUMMARY_MODEL):
+        self.model = model
+        self._llm: Optional[LLMClient] = None
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @property
+    def llm(self) -> LLMClient:
+        if self._llm is None:
+            self._llm = LLMClient(model=self.model, route="conversation_summary")
+        return self._llm
+
+    def schedule(self, state: ConversationState):
+        """Updates the summary of `state` in the background; turns added meanwhile are picked up next time."""
+        if not SUMMARY_ENABLED or not _unsummarized(state):
+            return
+        key = id(state)
+        if key in self._tasks and not self._tasks[key].done():
+            return
+        task = asyncio.get_running_loop().create_task(self.update(state))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _t: self._tasks.pop(key, None))
+
+    async def update(self, state: ConversationState):
+        turns = _unsummarized(state)
+        if not turns:
+            return
+        covered_until = max((m.timestamp for m in turns if m.timestamp is not None), default=datetime.utcnow())
+        new_turns = "\n".join(
+            f"{m.role}{'/' + m.tool_used if m.tool_used else ''}: {_clip(m.content, SUMMARY_TURN_MAX_CHARS)}"
+            for m in turns
+        )
+        user_message = f"Current summary:\n{state.conversation_summary or '(none)'}\n\nNew turns:\n{new_turns}"
+        try:
+            with lane("batch"):  # background work yields the Groq quota to user requests
+                summary = await asyncio.to_thread(self.llm.run_chat, self.SYSTEM_PROMPT, user_message,
+                                                  "ConversationSummarizer.update")
+        except Exception as e:
+            logger.warning("[ConversationSummary] Summary update failed, keeping the previous one: %s", e)
+            return
+        state.conversation_summary = _clip(summary, SUMMARY_MAX_CHARS)
+        state.summarized_until = covered_until
+
+
+conversation_summarizer = ConversationSummarizer()
@@ -1,33 +1,97 @@
 import httpx
 import os
 import asyncio
+from typing import List
+
+from Logging.logger import logger
+from utility.Tracing import span
+from utility.SingleFlight import SingleFlight
+from utility.Governor import governor
 
 EMBEDDING_API_URL = os.getenv(
     "EMBEDDING_API_URL",
     "https://adityapeopleplus-embedding-generator.hf.space/embed"
 )
+# Batch endpoint of the same Space: {"texts": [...]} -> {"embeddings": [[...], ...]}.
+EMBEDDING_BATCH_API_URL = os.getenv("EMBEDDING_BATCH_API_URL", EMBEDDING_API_URL.rsplit("/", 1)[0] + "/embed_batch")
+
+embedding_flight = SingleFlight("embedding")
+
 
-async def get_embedding(text: str):
-    """Send text to the HF Space embedding API and return the vector."""
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        resp = await client.post(EMBEDDING_API_URL, json={"text": text})
-        resp.raise_for_status()
-        return resp.json()["embedding"]
+async def get_embedding(text: str, client: httpx.AsyncClient = None):
+    """Send text to the HF Space embedding API and return the vector.
+    Pass a shared `client` to reuse connections across many calls. Concurrent requests for the
+    same text share one API call (and the returned list; do not mutate it)."""
+    return await embedding_flight.do(text, lambda: _fetch_embedding(text, client))
+
+
+async def _fetch_embedding(text: str, client: httpx.AsyncClient = None):
+    async with governor.limiter("embedding").aslot():
+        return await _post_embedding(text, client)
+
+
+async def _post_embedding(text: str, client: httpx.AsyncClient = None):
+    with span("embedding", **{"embedding.chars": len(text)}):
+        if client is not None:
+            resp = await client.post(EMBEDDING_API_URL, json={"text": text})
+            resp.raise_for_status()
+            return resp.json()["embedding"]
+        async with httpx.AsyncClient(timeout=30.0) as client:
+            resp = await client.post(EMBEDDING_API_URL, json={"text": text})
+            resp.raise_for_status()
+            return resp.json()["embedding"]
+
+
+_batch_endpoint_missing = False
+
+
+async def get_embeddings(texts: List[str], client: httpx.AsyncClient = None) -> List[List[float]]:
+    """Embed a batch of texts with one request (and one governor slot) to the batch endpoint.
+    If the Space has no batch endpoint, falls back to one get_embedding call per text."""
+    global _batch_endpoint_missing
+    if not texts:
+        return []
+    if not _batch_endpoint_missing:
+        async with governor.limiter("embedding").aslot():
+            with span("embedding.batch", **{"embedding.texts": len(texts)}):
+                if client is not None:
+                    resp = await client.post(EMBEDDING_BATCH_API_URL, json={"texts": texts})
+                else:
+                    async with httpx.AsyncClient(timeout=30.0) as own_client:
+                        resp = await own_client.post(EMBEDDING_BATCH_API_URL, json={"texts": texts})
+        if resp.status_code not in (404, 405):
+            resp.raise_for_status()
+            embeddings = resp.json()["embeddings"]
+            if len(embeddings) != len(texts):
+                raise ValueError(f"Embedding API returned {len(embeddings)} vectors for {len(texts)} texts.")
+            return embeddings
+        _batch_endpoint_missing = True
+        logger.warning(f"[Embedder] {EMBEDDING_BATCH_API_URL} not found; embedding one text per request.")
+    return list(await asyncio.gather(*(get_embedding(text, client=client) for text in texts)))
 
 
 class HFAPIEmbeddings:
-    """Wrapper for Hugging Face API to mimic LangChain embeddings interface."""
+    """Wrapper for Hugging Face API to mimic LangChain embeddings interface.
+    AstraDBVectorStore calls the sync methods (add_documents, similarity_search) and the
+    a-prefixed ones from its async API."""
 
-    async def embed_documents(self, texts):
-        embeddings = []
-        for text in texts:
-            vec = await get_embedding(text)
-            embeddings.append(vec)
-        return embeddings
+    async def aembed_documents(self, texts):
+        if len(texts) == 1:
+            return [await get_embedding(texts[0])]
+        return await get_embeddings(list(texts))
+
+    async def aembed_query(self, text):
+        return await get_embedding(text)
+
+    def embed_documents(self, texts):
+        return asyncio.run(self.aembed_documents(texts))
+
+    def embed_query(self, text):
+        return asyncio.run(self.aembed_query(text))
 
     def embed_documents_sync(self, texts):
         """Synchronous wrapper for scripts that are not async."""
-        return asyncio.run(self.embed_documents(texts))
+        return self.embed_documents(texts)
 
 class RemoteHFEmbeddings:
     """Wrapper that hits a remote embedding API endpoint (e.g., Hugging Face Space)."""
@@ -37,15 +101,20 @@ class RemoteHFEmbeddings:
 
     async def embed_documents(self, texts):
         """Asynchronous method for generating multiple embeddings."""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            tasks = [client.post(self.api_url, json={"text": t}) for t in texts]
-            responses = await asyncio.gather(*tasks)
+        with span("embedding.batch", **{"embedding.texts": len(texts)}):
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                tasks = [self._post(client, t) for t in texts]
+                responses = await asyncio.gather(*tasks)
             embeddings = []
             for resp in responses:
                 if resp.status_code == 200:
                     embeddings.append(resp.json()["embedding"])
             return embeddings
 
+    async def _post(self, client: httpx.AsyncClient, text: str):
+        async with governor.limiter("embedding").aslot():
+            return await client.post(self.api_url, json={"text": text})
+
     def embed_documents_sync(self, texts):
         """Synchronous wrapper for non-async contexts."""
         return asyncio.run(self.embed_documents(texts))
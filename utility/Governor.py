@@ -0,0 +1,360 @@
+'''
+Governor.py - Admission control for the external services every request fans out to.
+
+Each dependency (the Groq LLM API, the HF Space embedding API, Nominatim) gets one Limiter per
+process, shared by all callers in that process:
+
+- a concurrency limit (requests in flight at once), which also keeps a burst from waking many
+  cold HF Space replicas at the same time;
+- a token bucket matched to the provider's quota (`rate` requests per second, `burst` at once);
+- two priority lanes: "interactive" (user requests, the default) is always served before "batch"
+  (background summaries in the backend);
+- fast failure: a request that finds its lane's queue full, or that waits longer than the lane
+  allows, raises GovernorRejected with a retry_after estimate instead of piling up. The backend
+  answers those with 429 and a Retry-After header.
+
+Limiters are not shared between processes, and the backend, the MCP host (Servers/main.py) and
+the ingestion and scraping scripts are separate processes, often on separate hosts. Lanes
+therefore only order waiters within one process. Quotas that belong to one provider account
+(SHARED_QUOTAS) are split between the processes instead: each process takes its role's share of
+the rate and burst (PROCESS_QUOTA_SHARES; the shares add up to 1). The backend is the default
+role; the MCP host calls set_process("mcp") and the scripts set_process("batch"), which also
+puts everything they do in the batch lane. Batch work is held back across processes by that
+smaller share, not by priority. GOVERNOR_PROCESS and GOVERNOR_QUOTA_SHARE override the role and
+its share, e.g. to give a script the whole quota while nothing else runs.
+
+Limits come from DEFAULT_LIMITS and can be overridden per dependency with environment variables
+named GOVERNOR_<DEPENDENCY>_<FIELD>, e.g. GOVERNOR_GROQ_RATE=1.5 or GOVERNOR_EMBEDDING_CONCURRENCY=8;
+a rate of 0 disables the token bucket. Overrides are this process's own limits (they are not
+scaled by the share). Waiters can be threads (slot()) or coroutines (aslot()).
+slot() blocks its thread for up to max_wait, so it must never run on an event loop: coroutines
+use aslot(), and sync code reached from async code (the pipeline's LLM and Nominatim calls) runs
+in a worker thread via asyncio.to_thread.
+'''
+
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from utility.Metrics import registry
+
+LANES = ("interactive", "batch")  # in priority order
+
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    # Groq on-demand tier: 30 requests/minute for the whole account (split per process, see below).
+    "groq": {"concurrency": 8, "rate": 0.5, "burst": 10, "max_queue": 64, "batch_max_queue": 1024, "max_wait": 30},
+    # The HF Space has no quota, but a burst of cold requests stalls it; cap what is in flight.
+    "embedding": {"concurrency": 8, "rate": 0, "burst": 1, "max_queue": 256, "batch_max_queue": 4096, "max_wait": 30},
+    # Nominatim usage policy: at most one request per second.
+    "nominatim": {"concurrency": 1, "rate": 1.0, "burst": 1, "max_queue": 32, "batch_max_queue": 256, "max_wait": 15},
+}
+
+# Account-wide quotas, and each process role's share of them.
+SHARED_QUOTAS = ("groq",)
+PROCESS_QUOTA_SHARES: Dict[str, float] = {"backend": 0.5, "mcp": 0.3, "batch": 0.2}
+
+_lane: contextvars.ContextVar[str] = contextvars.ContextVar("governor_lane", default=os.getenv("GOVERNOR_LANE", "interactive"))
+
+governor_wait = registry.histogram(
+    "governor_wait_seconds", "Time spent waiting for a dependency slot.", ("dependency", "lane"),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+governor_rejections = registry.counter(
+    "governor_rejections_total", "Requests turned away by admission control.", ("dependency", "lane", "reason"))
+
+
+class GovernorRejected(Exception):
+    def __init__(self, dependency: str, reason: str, retry_after: int):
+        super().__init__(f"{dependency} is overloaded ({reason}); retry after {retry_after}s.")
+        self.dependency = dependency
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def rejection_in(error: Optional[BaseException]) -> Optional[GovernorRejected]:
+    """The GovernorRejected behind `error`, if it was raised while handling one (callers re-wrap errors)."""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, GovernorRejected):
+            return error
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return None
+
+
+def current_lane() -> str:
+    return _lane.get()
+
+
+def set_lane(lane: str):
+    """Sets the lane for the current context and everything started from it (scripts call this once)."""
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'; expected one of {LANES}.")
+    _lane.set(lane)
+
+
+@contextmanager
+def lane(name: str) -> Iterator[None]:
+    if name not in LANES:
+        raise ValueError(f"Unknown lane '{name}'; expected one of {LANES}.")
+    token = _lane.set(name)
+    try:
+        yield
+    finally:
+        _lane.reset(token)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "lane", "granted", "cancelled", "event", "loop", "future")
+
+    def __init__(self, lane: str, seq: int, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.priority = LANES.index(lane)
+        self.seq = seq
+        self.lane = lane
+        self.granted = False
+        self.cancelled = False
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        else:
+            self.event.set()
+
+
+class Limiter:
+    def __init__(self, name: str, concurrency: int, rate: float, burst: float, max_queue: int,
+                 batch_max_queue: int, max_wait: float):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.max_queue = {"interactive": int(max_queue), "batch": int(batch_max_queue)}
+        self.max_wait = {"interactive": float(max_wait) if max_wait else None, "batch": None}
+        self._lock = threading.Lock()
+        self._heap: List[_Waiter] = []
+        self._queued = {name: 0 for name in LANES}
+        self._active = 0
+        self._tokens = self.burst
+        self._refilled_at = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._seq = itertools.count()
+        self._avg_hold_s = 1.0
+
+    # --- Scheduling (all under self._lock) ---
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+        self._refilled_at = now
+
+    def _dispatch(self):
+        while self._heap:
+            waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self._active >= self.concurrency:
+                return
+            if self.rate > 0:
+                self._refill()
+                if self._tokens < 1:
+                    self._schedule((1 - self._tokens) / self.rate)
+                    return
+                self._tokens -= 1
+            heapq.heappop(self._heap)
+            self._queued[waiter.lane] -= 1
+            self._active += 1
+            waiter.granted = True
+            waiter.wake()
+
+    def _schedule(self, delay: float):
+        if self._timer is None:
+            self._timer = threading.Timer(delay, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            self._dispatch()
+
+    def _retry_after(self, lane: str) -> int:
+        ahead = sum(self._queued[name] for name in LANES[:LANES.index(lane) + 1]) + self._active
+        throughput = self.concurrency / max(self._avg_hold_s, 1e-3)
+        if self.rate > 0:
+            throughput = min(throughput, self.rate)
+        return max(1, math.ceil(ahead / throughput))
+
+    def _reject(self, lane: str, reason: str) -> GovernorRejected:
+        governor_rejections.inc(dependency=self.name, lane=lane, reason=reason)
+        return GovernorRejected(self.name, reason, self._retry_after(lane))
+
+    def _enqueue(self, lane: str, loop: Optional[asyncio.AbstractEventLoop]) -> _Waiter:
+        with self._lock:
+            if self._queued[lane] >= self.max_queue[lane]:
+                raise self._reject(lane, "queue_full")
+            waiter = _Waiter(lane, next(self._seq), loop)
+            heapq.heappush(self._heap, waiter)
+            self._queued[lane] += 1
+            self._dispatch()
+            return waiter
+
+    def _withdraw(self, waiter: _Waiter) -> bool:
+        """Takes a waiter out of the queue; False if it was granted a slot in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            waiter.cancelled = True
+            self._queued[waiter.lane] -= 1
+            return True
+
+    # --- Acquire / release ---
+
+    def acquire(self, lane: Optional[str] = None):
+        lane = lane or current_lane()
+        start = time.perf_counter()
+        waiter = self._enqueue(lane, None)
+        if not waiter.event.wait(self.max_wait[lane]) and self._withdraw(waiter):
+            raise self._reject(lane, "timeout")
+        governor_wait.observe(time.perf_counter() - start, dependency=self.name, lane=lane)
+
+    async def acquire_async(self, lane: Optional[str] = None):
+        lane = lane or current_lane()
+        start = time.perf_counter()
+        waiter = self._enqueue(lane, asyncio.get_running_loop())
+        if not waiter.granted:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), self.max_wait[lane])
+            except asyncio.TimeoutError:
+                if self._withdraw(waiter):
+                    raise self._reject(lane, "timeout")
+            except asyncio.CancelledError:
+                if not self._withdraw(waiter):
+                    self.release(0.0)
+                raise
+        governor_wait.observe(time.perf_counter() - start, dependency=self.name, lane=lane)
+
+    def release(self, held_s: float):
+        with self._lock:
+            self._active -= 1
+            self._avg_hold_s = 0.9 * self._avg_hold_s + 0.1 * held_s
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, lane: Optional[str] = None) -> Iterator[None]:
+        """Blocking; for worker threads only (see the module docstring)."""
+        self.acquire(lane)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    @asynccontextmanager
+    async def aslot(self, lane: Optional[str] = None):
+        await self.acquire_async(lane)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - start)
+
+    def configure(self, **limits):
+        """Changes limits at runtime (benchmarks against local stubs lift the provider quotas)."""
+        with self._lock:
+            if "concurrency" in limits:
+                self.concurrency = max(1, int(limits["concurrency"]))
+            if "rate" in limits:
+                self.rate = float(limits["rate"] or 0)
+            if "burst" in limits:
+                self.burst = max(1.0, float(limits["burst"]))
+                self._tokens = min(self._tokens, self.burst)
+            self._dispatch()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"active": self._active, **{f"queued_{name}": count for name, count in self._queued.items()}}
+
+
+def _limits_from_env(name: str, share: float = 1.0) -> Dict[str, float]:
+    limits = dict(DEFAULT_LIMITS[name])
+    if name in SHARED_QUOTAS:
+        limits["rate"] *= share
+        limits["burst"] = max(1.0, math.floor(limits["burst"] * share))
+    for field in limits:
+        value = os.getenv(f"GOVERNOR_{name.upper()}_{field.upper()}")
+        if value is not None:
+            limits[field] = float(value)
+    return limits
+
+
+class Governor:
+    def __init__(self, process: Optional[str] = None):
+        process = process or os.getenv("GOVERNOR_PROCESS", "backend")
+        if process not in PROCESS_QUOTA_SHARES:
+            raise ValueError(f"Unknown process role '{process}'; expected one of {tuple(PROCESS_QUOTA_SHARES)}.")
+        self.process = process
+        self._limiters: Dict[str, Limiter] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def quota_share(self) -> float:
+        override = os.getenv("GOVERNOR_QUOTA_SHARE")
+        return float(override) if override else PROCESS_QUOTA_SHARES[self.process]
+
+    def limiter(self, dependency: str) -> Limiter:
+        with self._lock:
+            if dependency not in self._limiters:
+                self._limiters[dependency] = Limiter(dependency, **_limits_from_env(dependency, self.quota_share))
+            return self._limiters[dependency]
+
+    def set_process(self, process: str):
+        """Switches this process's role, rescaling the shared quotas of limiters already built."""
+        if process not in PROCESS_QUOTA_SHARES:
+            raise ValueError(f"Unknown process role '{process}'; expected one of {tuple(PROCESS_QUOTA_SHARES)}.")
+        with self._lock:
+            self.process = process
+            limiters = [limiter for name, limiter in self._limiters.items() if name in SHARED_QUOTAS]
+        for limiter in limiters:
+            limits = _limits_from_env(limiter.name, self.quota_share)
+            limiter.configure(rate=limits["rate"], burst=limits["burst"])
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+governor = Governor()
+
+
+def set_process(process: str):
+    """Declares what this process is (call once at start-up); "batch" also sets the batch lane."""
+    governor.set_process(process)
+    if process == "batch":
+        set_lane("batch")
+
+registry.callback(
+    "governor_in_flight", "Requests holding a dependency slot.", "gauge",
+    lambda: {(name,): s["active"] for name, s in governor.stats().items()}, ("dependency",))
+registry.callback(
+    "governor_queued", "Requests waiting for a dependency slot, per lane.", "gauge",
+    lambda: {(name, lane): s[f"queued_{lane}"] for name, s in governor.stats().items() for lane in LANES},
+    ("dependency", "lane"))
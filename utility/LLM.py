@@ -1,33 +1,117 @@
 import os
 import re
+import sys
 import json
-from typing import List, Dict
+import logging
+from typing import Any, Callable, Dict, List, Optional, TypeVar
 from groq import Groq
 import json5
 
+from Logging.logger import logger, log_payload
+from utility.Tracing import span
+from utility.SingleFlight import SingleFlight, flight_key
+from utility.Governor import governor
+from utility.Metrics import registry
+from utility.ModelRouter import model_router
+
+T = TypeVar("T")
+
+
+def _caller_site(depth: int) -> str:
+    """module.function of the frame `depth` levels above the caller, used to label LLM calls."""
+    frame = sys._getframe(depth + 1)
+    return f"{frame.f_globals.get('__name__', '?')}.{frame.f_code.co_name}"
+
+
+llm_flight = SingleFlight("llm")
+llm_escalations = registry.counter(
+    "llm_escalations_total", "Structured outputs rejected by a call site and retried on a larger model.",
+    ("route", "from_model", "to_model"))
+
+
 class LLMClient:
-    def __init__(self, model: str = "meta-llama/llama-4-maverick-17b-128e-instruct"):
-        if os.getenv("GROQ_API_KEY"):
-            print("Groq API key is there")
-        else:
-            print("Cant find Groq API key")
+    def __init__(self, model: Optional[str] = None, route: Optional[str] = None):
+        """`route` names the call site in Meta/model_routing.json; an explicit `model` overrides it."""
+        if not os.getenv("GROQ_API_KEY"):
+            logger.warning("Cant find Groq API key")
         self.client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-        self.model = model
-
-    def run_chat(self, system_message: str, user_message: str) -> str:
-        """Run a chat completion with the LLM and return the response"""
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": user_message}
-            ]
-        )
+        self.route = route
+        self.model = model or model_router.model_for(route)
+
+    def with_route(self, route: str) -> "LLMClient":
+        """A client for another route that shares this client's Groq connection pool."""
+        client = LLMClient.__new__(LLMClient)
+        client.client = self.client
+        client.route = route
+        client.model = model_router.model_for(route)
+        return client
+
+    def run_chat(self, system_message: str, user_message: str, call_site: Optional[str] = None,
+                 model: Optional[str] = None) -> str:
+        """Run a chat completion with the LLM and return the response.
+        `call_site` labels the call in traces; it defaults to the calling module and function.
+        `model` overrides the client's model for this call (used for escalation)."""
+        call_site = call_site or _caller_site(1)
+        model = model or self.model
+        # Identical prompts in flight at the same time (from concurrent threads) share one completion.
+        key = flight_key(model, system_message, user_message)
+        return llm_flight.do_sync(key, lambda: self._complete(model, system_message, user_message, call_site))
+
+    def _complete(self, model: str, system_message: str, user_message: str, call_site: str) -> str:
+        # The Groq quota is shared by every call in the process; waiting for it is not LLM latency.
+        with governor.limiter("groq").slot(), \
+                span("llm.chat", **{"llm.model": model, "llm.route": self.route, "llm.call_site": call_site}) as s:
+            response = self.client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": system_message},
+                    {"role": "user", "content": user_message}
+                ]
+            )
+            usage = getattr(response, "usage", None)
+            if s and usage is not None:
+                s.set_attributes({
+                    "llm.tokens_in": getattr(usage, "prompt_tokens", None),
+                    "llm.tokens_out": getattr(usage, "completion_tokens", None),
+                })
         return response.choices[0].message.content.strip()
 
-    def run_json(self, system_message: str, user_message: str) -> Dict:
-        output = self.run_chat(system_message, user_message)
-        print(f"Raw output from LLM:\n{output}")
+    def run_structured(self, system_message: str, user_message: str, parse: Callable[[str], T],
+                       call_site: Optional[str] = None) -> T:
+        """
+        Runs a chat completion and returns parse(output). When `parse` rejects the output with a
+        ValueError (pydantic's ValidationError is one), the prompt is retried on the next larger
+        model tier, if there is one, before the error is raised.
+        """
+        call_site = call_site or _caller_site(1)
+        model = self.model
+        while True:
+            output = self.run_chat(system_message, user_message, call_site=call_site, model=model)
+            try:
+                return parse(output)
+            except ValueError as e:
+                larger = model_router.escalation_for(model)
+                if larger is None:
+                    raise
+                logger.warning("[LLM] %s: %s output rejected (%s); retrying with %s", call_site, model, e, larger)
+                llm_escalations.inc(route=self.route or "default", from_model=model, to_model=larger)
+                model = larger
+
+    def run_json(self, system_message: str, user_message: str, call_site: Optional[str] = None,
+                 validate: Optional[Callable[[Dict], Any]] = None) -> Any:
+        """
+        Runs a chat completion and returns the JSON object in the response, or validate(object)
+        when a validator is given. Unparseable JSON, and objects the validator rejects with a
+        ValueError, are retried on a larger model (see run_structured).
+        """
+        def parse(output: str) -> Any:
+            data = self._parse_json(output)
+            return validate(data) if validate is not None else data
+
+        return self.run_structured(system_message, user_message, parse, call_site=call_site or _caller_site(1))
+
+    def _parse_json(self, output: str) -> Dict:
+        log_payload("Raw output from LLM", output)
 
         # Extract JSON block if in code fences
         json_blocks = re.findall(r'```json\s*({.*?})\s*```', output, re.DOTALL)
@@ -43,9 +127,8 @@ class LLMClient:
             # json5 can handle unquoted keys and single quotes
             return json5.loads(first_block)
         except Exception as e:
-            print("\n--- JSON PARSE ERROR ---")
-            print(e)
-            print("Problematic JSON string:\n", first_block)
+            logger.warning("JSON parse error: %s", e)
+            log_payload("Problematic JSON string", first_block, level=logging.WARNING)
             raise ValueError(f"Failed to parse JSON block.\nError: {e}")
                 
     def summarize_json_output(self, explanation_json: dict, context: str = None) -> str:
@@ -65,7 +148,7 @@ class LLMClient:
         """
 
         # Get raw response
-        response = self.run_chat(system_prompt, user_message)
+        response = self.run_chat(system_prompt, user_message, call_site=_caller_site(1))
 
         # Extract just the final explanation string
         if isinstance(response, dict):
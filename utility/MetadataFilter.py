@@ -0,0 +1,117 @@
+'''
+MetadataFilter.py - Metadata predicates for retrieve_documents.
+
+A RetrievalFilter is first pushed down to the Astra vector store as a Data API filter. Metadata
+written by the different ingestion scripts is not uniform (and scheme names extracted by the LLM
+rarely match the stored name exactly), so when the pushed-down search comes back empty we
+over-fetch without the filter and apply the same predicate locally, case-insensitively. If that
+matches nothing either, the result is empty: callers that would rather have unfiltered documents
+search again without the filter.
+'''
+
+import os
+from typing import Any, Dict, List, Optional
+
+from langchain_core.documents import Document
+
+from Logging.logger import logger
+from utility.model import RetrievalFilter
+from utility.Tracing import span
+
+FILTER_OVERFETCH = int(os.getenv("FILTER_OVERFETCH", "4"))
+PAN_INDIA = "Pan-India"
+
+
+def to_astra_filter(filters: RetrievalFilter) -> Dict[str, Any]:
+    """Translates a RetrievalFilter into an AstraDBVectorStore metadata filter."""
+    clauses: List[Dict[str, Any]] = []
+    if filters.scheme_name:
+        clauses.append({"scheme_name": filters.scheme_name})
+    if filters.source_file:
+        clauses.append({"$or": [
+            {"source_file": filters.source_file},
+            {"original_filename": os.path.basename(filters.source_file)},
+        ]})
+    if filters.chunk_index_min is not None:
+        clauses.append({"chunk_index": {"$gte": filters.chunk_index_min}})
+    if filters.chunk_index_max is not None:
+        clauses.append({"chunk_index": {"$lte": filters.chunk_index_max}})
+    if filters.location:
+        clauses.append({"location_scope": {"$in": [filters.location, PAN_INDIA]}})
+
+    if not clauses:
+        return {}
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def _contains(value: Any, needle: str) -> bool:
+    if value is None:
+        return False
+    if isinstance(value, (list, tuple)):
+        return any(_contains(v, needle) for v in value)
+    return needle in str(value).lower()
+
+
+def matches(filters: RetrievalFilter, metadata: Dict[str, Any]) -> bool:
+    """Local version of the same predicate, tolerant to naming differences between collections."""
+    metadata = metadata or {}
+    if filters.scheme_name:
+        needle = filters.scheme_name.lower()
+        if not any(_contains(metadata.get(k), needle) for k in ("scheme_name", "id", "source_file", "original_filename", "file_name")):
+            return False
+    if filters.source_file:
+        needle = os.path.basename(filters.source_file).lower()
+        if not any(_contains(metadata.get(k), needle) for k in ("source_file", "source_files", "original_filename", "file_name", "source")):
+            return False
+    chunk_index = metadata.get("chunk_index")
+    if filters.chunk_index_min is not None or filters.chunk_index_max is not None:
+        if not isinstance(chunk_index, (int, float)):
+            return False
+        if filters.chunk_index_min is not None and chunk_index < filters.chunk_index_min:
+            return False
+        if filters.chunk_index_max is not None and chunk_index > filters.chunk_index_max:
+            return False
+    if filters.location:
+        scope = metadata.get("location_scope")
+        if scope and not (_contains(scope, filters.location.lower()) or _contains(scope, PAN_INDIA.lower())):
+            return False
+    return True
+
+
+def search_with_filters(store, query: str, k: int, filters: Optional[RetrievalFilter] = None) -> List[Document]:
+    """
+    Similarity search restricted by `filters`:
+    1. push the filter down to the vector store;
+    2. if nothing matches, over-fetch unfiltered and filter locally;
+    3. if still nothing matches, return no documents.
+    """
+    attributes = {"retriever.collection": getattr(store, "collection_name", None), "retriever.k": k,
+                  "retriever.filtered": bool(filters)}
+    with span("retriever.search", **attributes) as s:
+        docs = _search(store, query, k, filters)
+        if s:
+            s.set_attribute("retriever.results", len(docs))
+        return docs
+
+
+def _search(store, query: str, k: int, filters: Optional[RetrievalFilter]) -> List[Document]:
+    astra_filter = to_astra_filter(filters) if filters else {}
+    if not astra_filter:
+        return store.similarity_search(query=query, k=k)
+
+    try:
+        docs = store.similarity_search(query=query, k=k, filter=astra_filter)
+        if docs:
+            logger.info(f"[Retriever] Filter {astra_filter} pushed down, {len(docs)} docs matched.")
+            return docs
+    except Exception as e:
+        logger.warning(f"[Retriever] Filter push-down failed ({e}); filtering locally.")
+
+    candidates = store.similarity_search(query=query, k=k * FILTER_OVERFETCH)
+    filtered = [d for d in candidates if matches(filters, d.metadata)]
+    if filtered:
+        logger.info(f"[Retriever] Local filter kept {len(filtered)}/{len(candidates)} candidates.")
+        return filtered[:k]
+
+    logger.warning(f"[Retriever] No documents matched {filters.model_dump(exclude_none=True)}.")
+    return []
@@ -0,0 +1,294 @@
+'''
+Metrics.py - Prometheus-style metrics for the backend and the MCP host.
+
+A small in-process registry of counters, gauges and histograms rendered in the Prometheus text
+exposition format (version 0.0.4) by the /metrics endpoints. Most series are derived from the
+spans of utility/Tracing.py, so every instrumented call (pipeline stages, LLM calls, embeddings,
+retriever searches, MCP tools) is measured once and shows up in both traces and metrics:
+
+- pipeline_stage_duration_seconds{stage}, pipeline_runs_total{outcome}
+- llm_call_duration_seconds{call_site,model,status}, llm_tokens_total{call_site,model,direction}
+- embedding_request_duration_seconds, retriever_search_duration_seconds{collection,status}
+- mcp_tool_duration_seconds{tool,status}, mcp_call_duration_seconds{tool,status}
+
+MetricsMiddleware adds http_request_duration_seconds{service,method,route,status} and
+http_requests_in_flight{service}. Values that already live elsewhere (semantic cache hit counts,
+tool resource readiness) are registered as callbacks and read at scrape time.
+'''
+
+import time
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utility.Tracing import Span, exporter
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() and abs(value) < 1e15 else repr(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> (per-bucket counts with a final +Inf slot, sum)
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = ("le", _format_value(bound))
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric(_Metric):
+    """A counter or gauge whose values are read from `fn` at scrape time ({label values: value})."""
+
+    def __init__(self, name: str, documentation: str, kind: str, fn: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.kind = kind
+        self.fn = fn
+
+    def samples(self) -> Iterable[str]:
+        for key, value in sorted(self.fn().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            # Re-registering (module reloads, several apps in one process) keeps the first instance.
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, kind: str, fn: Callable[[], Dict[LabelValues, float]],
+                 labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, fn, labelnames))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:  # a failing callback must not break the scrape
+                samples = []
+                lines.append(f"# {metric.name} collection failed: {e}")
+            lines.extend(metric.header())
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by endpoint.", ("service", "method", "route", "status"))
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("service",))
+pipeline_stage_duration = registry.histogram(
+    "pipeline_stage_duration_seconds", "Time spent in each Pipeline stage.", ("stage",))
+pipeline_runs = registry.counter(
+    "pipeline_runs_total", "Pipeline runs by final stage and cache outcome.", ("outcome", "cache_hit"))
+llm_call_duration = registry.histogram(
+    "llm_call_duration_seconds", "LLM chat completion latency.", ("call_site", "model", "status"))
+llm_tokens = registry.counter(
+    "llm_tokens_total", "LLM tokens by direction (prompt/completion).", ("call_site", "model", "direction"))
+embedding_duration = registry.histogram(
+    "embedding_request_duration_seconds", "Embedding API request latency.", ("status",))
+retriever_duration = registry.histogram(
+    "retriever_search_duration_seconds", "Vector search latency per collection.", ("collection", "status"))
+mcp_tool_duration = registry.histogram(
+    "mcp_tool_duration_seconds", "End-to-end MCP tool run (connect, schema, call, formatting).", ("tool", "status"))
+mcp_call_duration = registry.histogram(
+    "mcp_call_duration_seconds", "MCP call_tool round trip.", ("tool", "status"))
+mcp_sessions_open = registry.gauge(
+    "mcp_client_sessions_open", "MCP client sessions currently open, per tool.", ("tool",))
+
+
+def _record_span(span: Span):
+    name = span.name
+    attrs = span.attributes
+    seconds = span.duration_ms / 1000.0
+    status = span.status.lower()
+    if name == "pipeline.run":
+        pipeline_runs.inc(outcome=attrs.get("pipeline.stage", "UNKNOWN"),
+                          cache_hit=str(bool(attrs.get("pipeline.cache_hit"))).lower())
+    elif name.startswith("pipeline."):
+        pipeline_stage_duration.observe(seconds, stage=name[len("pipeline."):])
+    elif name == "llm.chat":
+        labels = {"call_site": attrs.get("llm.call_site", ""), "model": attrs.get("llm.model", "")}
+        llm_call_duration.observe(seconds, status=status, **labels)
+        if attrs.get("llm.tokens_in") is not None:
+            llm_tokens.inc(attrs["llm.tokens_in"], direction="prompt", **labels)
+        if attrs.get("llm.tokens_out") is not None:
+            llm_tokens.inc(attrs["llm.tokens_out"], direction="completion", **labels)
+    elif name == "embedding":
+        embedding_duration.observe(seconds, status=status)
+    elif name == "retriever.search":
+        retriever_duration.observe(seconds, collection=attrs.get("retriever.collection") or "", status=status)
+    elif name == "mcp.tool":
+        mcp_tool_duration.observe(seconds, tool=attrs.get("mcp.tool", ""), status=status)
+    elif name == "mcp.call_tool":
+        mcp_call_duration.observe(seconds, tool=attrs.get("mcp.server_tool", ""), status=status)
+
+
+exporter.add_listener(_record_span)
+
+
+class MetricsMiddleware:
+    """Records latency and in-flight counts per request; routes are labelled by their template."""
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(service=self.service)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(service=self.service)
+            http_request_duration.observe(
+                time.perf_counter() - start, service=self.service, method=scope.get("method", ""),
+                route=_route_label(scope, status["code"]), status=str(status["code"]))
+
+
+def _route_label(scope, status: int) -> str:
+    route = scope.get("route")
+    if route is not None and getattr(route, "path", None):
+        return route.path
+    if status == 404:
+        return "unmatched"  # keeps arbitrary URLs out of the label set
+    # Mounted apps (the MCP servers) have no route object; their mount prefix identifies them.
+    root = scope.get("root_path") or ""
+    return root or scope.get("path", "")
@@ -0,0 +1,83 @@
+'''
+ModelRouter.py - Picks the Groq model for each LLM call site.
+
+Every LLMClient used to run meta-llama/llama-4-maverick-17b-128e-instruct, including the short
+classification and JSON extraction calls on the critical path of each request. Call sites now
+name a route (LLMClient(route="planning")), and Meta/model_routing.json maps each route to a tier
+and each tier to a model: a small, fast model for classification and extraction, the large model
+for planning, schema filling and the answers users read. Routes that are not listed use
+`default_tier`.
+
+`escalation` orders the tiers from smallest to largest. When a call site rejects a structured
+output (LLMClient.run_structured / run_json with a validator), the call is retried on the next
+tier, so a small model only costs a retry on the requests it cannot handle. Escalation only
+catches invalid output: a valid but wrong answer goes straight through. Move a route to a smaller
+tier only after benchmarks/model_tier_benchmark.py shows its correctness on par with the larger one.
+
+Environment overrides:
+    MODEL_ROUTING_PATH          another routing file
+    MODEL_TIER_<TIER>=model     e.g. MODEL_TIER_SMALL=meta-llama/llama-4-scout-17b-16e-instruct
+    MODEL_ROUTE_<ROUTE>=tier    e.g. MODEL_ROUTE_TRIAGE=large
+    MODEL_ESCALATION=false      never retry on a larger tier
+'''
+
+import os
+import json
+from typing import Dict, List, Optional
+
+from Logging.logger import logger
+
+MODEL_ROUTING_PATH = os.getenv(
+    "MODEL_ROUTING_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Meta", "model_routing.json"),
+)
+MODEL_ESCALATION = os.getenv("MODEL_ESCALATION", "true").lower() == "true"
+FALLBACK_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+
+
+class ModelRouter:
+    def __init__(self, path: str = MODEL_ROUTING_PATH, escalation_enabled: bool = MODEL_ESCALATION):
+        config = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+        except Exception as e:
+            logger.warning(f"[ModelRouter] Could not load {path} ({e}); every call site uses {FALLBACK_MODEL}.")
+
+        self.tiers: Dict[str, str] = {
+            tier: os.getenv(f"MODEL_TIER_{tier.upper()}", model) for tier, model in config.get("tiers", {}).items()
+        }
+        self.escalation: List[str] = [tier for tier in config.get("escalation", []) if tier in self.tiers]
+        self.default_tier: Optional[str] = config.get("default_tier")
+        self.routes: Dict[str, str] = {
+            route: os.getenv(f"MODEL_ROUTE_{route.upper()}", tier) for route, tier in config.get("routes", {}).items()
+        }
+        self.escalation_enabled = escalation_enabled
+
+    def tier_for(self, route: Optional[str]) -> Optional[str]:
+        tier = self.routes.get(route) if route else None
+        if route and tier is None:
+            tier = os.getenv(f"MODEL_ROUTE_{route.upper()}")
+        return tier if tier in self.tiers else self.default_tier
+
+    def model_for(self, route: Optional[str] = None) -> str:
+        return self.tiers.get(self.tier_for(route), FALLBACK_MODEL)
+
+    def tier_of(self, model: str) -> Optional[str]:
+        return next((tier for tier, tier_model in self.tiers.items() if tier_model == model), None)
+
+    def escalation_for(self, model: str) -> Optional[str]:
+        """The model of the next larger tier, or None when `model` is the largest (or not a tier)."""
+        if not self.escalation_enabled:
+            return None
+        tier = self.tier_of(model)
+        if tier not in self.escalation:
+            return None
+        position = self.escalation.index(tier)
+        for larger in self.escalation[position + 1:]:
+            if self.tiers[larger] != model:
+                return self.tiers[larger]
+        return None
+
+
+model_router = ModelRouter()
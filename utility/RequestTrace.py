@@ -0,0 +1,154 @@
+'''
+RequestTrace.py - Per-request debug traces for Pipeline runs, kept off the request path.
+
+A RequestTrace collects what Pipeline used to append to pipeline_log.txt (stage changes,
+extracted metadata, the plan, results) plus a summary of every span finished under the request,
+in memory. When the run ends the trace moves into a bounded in-memory LRU and, with the "file"
+sink, is handed to a background thread that writes Artifacts/debug_traces/<request_id>.json and
+deletes the oldest files beyond DEBUG_TRACE_MAX_FILES. Request ids are trace ids, so the
+X-Trace-Id header of a response is what GET /debug/trace/{request_id} expects.
+
+Traces hold user queries and results, so recording is opt-in and reading needs a secret:
+DEBUG_TRACE_SINK is "off" (default; nothing is recorded), "memory" or "file", and the endpoint
+only answers requests whose X-Debug-Token header matches DEBUG_TRACE_TOKEN (none if it is unset).
+'''
+
+import os
+import json
+import time
+import queue
+import secrets
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional
+
+from Logging.logger import logger
+from utility.Tracing import Span, exporter
+
+DEBUG_TRACE_SINK = os.getenv("DEBUG_TRACE_SINK", "off").lower()
+DEBUG_TRACE_TOKEN = os.getenv("DEBUG_TRACE_TOKEN", "")
+DEBUG_TRACE_DIR = os.getenv("DEBUG_TRACE_DIR", os.path.join("Artifacts", "debug_traces"))
+DEBUG_TRACE_MAX_REQUESTS = int(os.getenv("DEBUG_TRACE_MAX_REQUESTS", "200"))
+DEBUG_TRACE_MAX_FILES = int(os.getenv("DEBUG_TRACE_MAX_FILES", "1000"))
+
+
+class RequestTrace:
+    def __init__(self, request_id: str, query: str):
+        self.request_id = request_id
+        self.query = query
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.entries: List[Dict[str, Any]] = []
+        self.spans: List[Dict[str, Any]] = []
+
+    def log(self, label: str, data: Any = None):
+        """Records an entry with a JSON snapshot of `data`; the pipeline keeps mutating its results."""
+        snapshot = json.loads(json.dumps(data, default=str)) if data is not None else None
+        self.entries.append({"elapsed_s": round(time.time() - self.started_at, 4), "label": label, "data": snapshot})
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "query": self.query,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "entries": self.entries,
+            "spans": self.spans,
+        }
+
+
+class DebugTraceStore:
+    def __init__(self, sink: str = DEBUG_TRACE_SINK, directory: str = DEBUG_TRACE_DIR,
+                 max_requests: int = DEBUG_TRACE_MAX_REQUESTS, max_files: int = DEBUG_TRACE_MAX_FILES,
+                 token: str = DEBUG_TRACE_TOKEN):
+        self.sink = sink if sink in ("off", "memory", "file") else "off"
+        self.token = token
+        self.directory = os.path.abspath(directory)
+        self.max_requests = max_requests
+        self.max_files = max_files
+        self._active: Dict[str, RequestTrace] = {}
+        self._finished: "OrderedDict[str, RequestTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[RequestTrace]" = queue.Queue(maxsize=1000)
+        if self.sink == "file":
+            threading.Thread(target=self._write_loop, name="debug-trace-writer", daemon=True).start()
+        if self.sink != "off":
+            exporter.add_listener(self._on_span)
+
+    @property
+    def enabled(self) -> bool:
+        return self.sink != "off"
+
+    def authorized(self, token: Optional[str]) -> bool:
+        return bool(self.token) and secrets.compare_digest((token or "").encode(), self.token.encode())
+
+    def start(self, request_id: str, query: str) -> Optional[RequestTrace]:
+        if not self.enabled:
+            return None
+        trace = RequestTrace(request_id, query)
+        with self._lock:
+            self._active[request_id] = trace
+        return trace
+
+    def finish(self, trace: Optional[RequestTrace]):
+        if trace is None:
+            return
+        trace.finished_at = time.time()
+        with self._lock:
+            self._active.pop(trace.request_id, None)
+            self._finished[trace.request_id] = trace
+            self._finished.move_to_end(trace.request_id)
+            while len(self._finished) > self.max_requests:
+                self._finished.popitem(last=False)
+        if self.sink == "file":
+            try:
+                self._queue.put_nowait(trace)
+            except queue.Full:
+                logger.warning(f"[DebugTrace] Writer queue full; trace {trace.request_id} kept in memory only.")
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """The trace of a finished or in-flight request, falling back to the file sink."""
+        with self._lock:
+            trace = self._finished.get(request_id) or self._active.get(request_id)
+        if trace is not None:
+            return json.loads(json.dumps(trace.to_dict(), default=str))
+        if self.sink == "file" and request_id.isalnum():
+            try:
+                with open(os.path.join(self.directory, f"{request_id}.json"), "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except OSError:
+                return None
+        return None
+
+    def _on_span(self, span: Span):
+        trace = self._active.get(span.trace_id)
+        if trace is not None:
+            trace.spans.append({
+                "name": span.name,
+                "service": span.service,
+                "duration_ms": round(span.duration_ms, 3),
+                "status": span.status,
+                "attributes": span.attributes,
+            })
+
+    def _write_loop(self):
+        os.makedirs(self.directory, exist_ok=True)
+        existing = sorted((os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith(".json")),
+                          key=os.path.getmtime)
+        written = deque(existing)
+        while True:
+            trace = self._queue.get()
+            path = os.path.join(self.directory, f"{trace.request_id}.json")
+            try:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(trace.to_dict(), f, indent=2, default=str)
+                written.append(path)
+                while len(written) > self.max_files:
+                    old = written.popleft()
+                    if os.path.exists(old):
+                        os.remove(old)
+            except Exception as e:
+                logger.warning(f"[DebugTrace] Failed to write trace {trace.request_id}: {e}")
+
+
+debug_traces = DebugTraceStore()
@@ -0,0 +1,156 @@
+'''
+Reranker.py - Pluggable rerankers for retrieved documents.
+
+Backends:
+- "local":  CPU cross-encoder (sentence-transformers), batched and run in a thread pool, with scores cached.
+- "remote": the Hugging Face Space rerank endpoint, over a shared HTTP client.
+- "none":   keeps the retrieval order.
+
+RERANKER_BACKEND picks the backend (default "local"; falls back to "remote" when
+sentence-transformers is not installed). Rerankers write the score into each document's
+metadata as "rerank_score", which ContextPacker uses for ordering.
+'''
+
+import os
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+
+import httpx
+
+from Logging.logger import logger
+
+RERANKER_BACKEND = os.getenv("RERANKER_BACKEND", "local")
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANKER_API_URL = os.getenv(
+    "RERANKER_API_URL",
+    "https://adityapeopleplus-embedding-generator.hf.space/rerank"
+)
+# How many candidates to fetch per requested document when reranking.
+RERANK_OVERFETCH = int(os.getenv("RERANK_OVERFETCH", "3"))
+
+
+def _with_score(doc: Dict[str, Any], score: float) -> Dict[str, Any]:
+    metadata = dict(doc.get("metadata") or {})
+    metadata["rerank_score"] = float(score)
+    return {**doc, "metadata": metadata}
+
+
+class Reranker(ABC):
+    @abstractmethod
+    async def score(self, query: str, documents: List[Dict[str, Any]]) -> List[float]:
+        """Returns one relevance score per document (higher is more relevant)."""
+
+    async def rerank(self, query: str, documents: List[Dict[str, Any]], top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        if not documents:
+            return []
+        try:
+            scores = await self.score(query, documents)
+        except Exception as e:
+            logger.error(f"[Reranker] {type(self).__name__} failed, keeping retrieval order: {e}", exc_info=True)
+            return documents[:top_k] if top_k else documents
+        ranked = sorted(
+            (_with_score(doc, s) for doc, s in zip(documents, scores)),
+            key=lambda d: d["metadata"]["rerank_score"],
+            reverse=True
+        )
+        return ranked[:top_k] if top_k else ranked
+
+
+class NoopReranker(Reranker):
+    async def score(self, query: str, documents: List[Dict[str, Any]]) -> List[float]:
+        # Preserve retrieval order: first document gets the highest score.
+        return [float(len(documents) - i) for i in range(len(documents))]
+
+
+class CrossEncoderReranker(Reranker):
+    def __init__(self, model_name: str = RERANKER_MODEL, batch_size: int = 16,
+                 max_workers: int = 2, cache_size: int = 4096):
+        from sentence_transformers import CrossEncoder  # optional dependency, imported lazily
+
+        logger.info(f"[Reranker] Loading cross-encoder '{model_name}' on CPU")
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.batch_size = batch_size
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reranker")
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _key(query: str, content: str) -> str:
+        return hashlib.sha1(f"{query}\x00{content}".encode("utf-8")).hexdigest()
+
+    def _predict(self, pairs: List[List[str]]) -> List[float]:
+        return [float(s) for s in self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)]
+
+    async def score(self, query: str, documents: List[Dict[str, Any]]) -> List[float]:
+        keys = [self._key(query, doc.get("content", "")) for doc in documents]
+        scores: List[Optional[float]] = [None] * len(documents)
+        with self._cache_lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            pairs = [[query, documents[i].get("content", "")] for i in missing]
+            loop = asyncio.get_running_loop()
+            fresh = await loop.run_in_executor(self.executor, self._predict, pairs)
+            with self._cache_lock:
+                for i, s in zip(missing, fresh):
+                    scores[i] = s
+                    self._cache[keys[i]] = s
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        logger.debug(f"[Reranker] Scored {len(documents)} docs ({len(documents) - len(missing)} cached)")
+        return scores
+
+
+class RemoteReranker(Reranker):
+    def __init__(self, api_url: str = RERANKER_API_URL, timeout: float = 30.0):
+        self.api_url = api_url
+        self.client = httpx.AsyncClient(timeout=timeout)
+
+    async def score(self, query: str, documents: List[Dict[str, Any]]) -> List[float]:
+        payload = {
+            "query": query,
+            "documents": [{"content": doc.get("content", ""), "index": i} for i, doc in enumerate(documents)]
+        }
+        resp = await self.client.post(self.api_url, json=payload)
+        resp.raise_for_status()
+        scores = [0.0] * len(documents)
+        for position, ranked in enumerate(resp.json().get("documents", [])):
+            index = ranked.get("index", position)
+            if 0 <= index < len(documents):
+                scores[index] = float(ranked.get("rerank_score", 0.0))
+        return scores
+
+
+_reranker: Optional[Reranker] = None
+
+
+def get_reranker() -> Reranker:
+    """Returns the process-wide reranker selected by RERANKER_BACKEND."""
+    global _reranker
+    if _reranker is not None:
+        return _reranker
+
+    backend = RERANKER_BACKEND.lower()
+    if backend == "local":
+        try:
+            _reranker = CrossEncoderReranker()
+        except Exception as e:
+            logger.warning(f"[Reranker] Local cross-encoder unavailable ({e}); using the remote reranker.")
+            _reranker = RemoteReranker()
+    elif backend == "remote":
+        _reranker = RemoteReranker()
+    else:
+        _reranker = NoopReranker()
+    logger.info(f"[Reranker] Using {type(_reranker).__name__}")
+    return _reranker
@@ -0,0 +1,173 @@
+'''
+SemanticCache.py - Answer cache in front of Pipeline.run for near-duplicate questions.
+
+Entries are keyed by the embedding of the expanded query plus a profile key (user_type + state)
+and the mapped tools. A lookup returns the cached tool results when a previous query for a
+compatible profile is above the similarity threshold. Context-sensitive tools (eligibility)
+additionally require identical context entities; opted-out tools are never cached.
+
+Ingestion scripts call mark_ingestion(), which bumps an epoch file; entries older than the
+epoch are discarded so answers never outlive the documents they were built from. The file sits
+under the repository root (not the working directory), so this only works when the scripts and
+the backend share a checkout or filesystem; otherwise point INGESTION_EPOCH_FILE at a shared path.
+
+The cache keeps its own deep copy of stored results, and callers copy what lookup() returns
+before mutating it.
+'''
+
+import os
+import copy
+import json
+import time
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from Logging.logger import logger
+from utility.model import Metadata
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+INGESTION_EPOCH_FILE = os.getenv(
+    "INGESTION_EPOCH_FILE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Artifacts", "cache", "ingestion_epoch"),
+)
+
+# Tools whose answers depend on the user's stated facts, not just the question.
+CONTEXT_SENSITIVE_TOOLS = {"EligibilityChecker"}
+# Tools that are never served from cache.
+NON_CACHEABLE_TOOLS = {t.strip() for t in os.getenv("SEMANTIC_CACHE_OPT_OUT", "").split(",") if t.strip()}
+
+
+def mark_ingestion():
+    """Records that the knowledge base changed; cached answers from before now are invalid."""
+    os.makedirs(os.path.dirname(INGESTION_EPOCH_FILE) or ".", exist_ok=True)
+    with open(INGESTION_EPOCH_FILE, "w") as f:
+        f.write(str(time.time()))
+    logger.info("[SemanticCache] Ingestion epoch bumped; cached answers invalidated.")
+
+
+def _read_ingestion_epoch() -> float:
+    try:
+        return os.path.getmtime(INGESTION_EPOCH_FILE)
+    except OSError:
+        return 0.0
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, ttl: float = SEMANTIC_CACHE_TTL,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def profile_key(metadata: Metadata) -> str:
+        profile = metadata.user_profile
+        if not profile:
+            return "anonymous"
+        region = profile.location.state or profile.location.country or ""
+        return f"{profile.user_type.strip().lower()}|{region.strip().lower()}"
+
+    @staticmethod
+    def context_fingerprint(context_entities: Optional[Dict[str, Any]]) -> str:
+        payload = json.dumps(context_entities or {}, sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def is_cacheable(tools: List[str]) -> bool:
+        return bool(tools) and not any(t in NON_CACHEABLE_TOOLS for t in tools)
+
+    def _bucket_key(self, metadata: Metadata) -> Tuple[str, str]:
+        return (self.profile_key(metadata), ",".join(sorted(metadata.tools_required)))
+
+    def _evict_stale(self):
+        cutoff = max(time.time() - self.ttl, _read_ingestion_epoch())
+        for key in list(self._entries):
+            fresh = [e for e in self._entries[key] if e["created_at"] > cutoff]
+            self._size -= len(self._entries[key]) - len(fresh)
+            if fresh:
+                self._entries[key] = fresh
+            else:
+                del self._entries[key]
+
+    def lookup(self, metadata: Metadata, embedding: List[float],
+               context_entities: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        if not SEMANTIC_CACHE_ENABLED or not self.is_cacheable(metadata.tools_required):
+            return None
+        self._evict_stale()
+
+        candidates = self._entries.get(self._bucket_key(metadata), [])
+        needs_context = any(t in CONTEXT_SENSITIVE_TOOLS for t in metadata.tools_required)
+        if needs_context:
+            fingerprint = self.context_fingerprint(context_entities)
+            candidates = [e for e in candidates if e["context"] == fingerprint]
+        if not candidates:
+            self.misses += 1
+            return None
+
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        matrix = np.stack([e["vector"] for e in candidates])
+        scores = matrix @ query
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        entry = candidates[best]
+        logger.info(f"[SemanticCache] Hit (similarity {scores[best]:.3f}) for '{metadata.query}' ~ '{entry['query']}'")
+        return entry["results"]
+
+    def store(self, metadata: Metadata, embedding: List[float], results: Dict[str, Any],
+              context_entities: Optional[Dict[str, Any]] = None):
+        if not SEMANTIC_CACHE_ENABLED or not self.is_cacheable(metadata.tools_required):
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        needs_context = any(t in CONTEXT_SENSITIVE_TOOLS for t in metadata.tools_required)
+        self._entries.setdefault(self._bucket_key(metadata), []).append({
+            "query": metadata.query,
+            "vector": vector,
+            "results": copy.deepcopy(results),  # the caller keeps mutating its own results
+            "context": self.context_fingerprint(context_entities) if needs_context else None,
+            "created_at": time.time(),
+        })
+        self._size += 1
+        if self._size > self.max_entries:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        key, index = min(
+            ((k, i) for k, entries in self._entries.items() for i in range(len(entries))),
+            key=lambda ki: self._entries[ki[0]][ki[1]]["created_at"]
+        )
+        self._entries[key].pop(index)
+        if not self._entries[key]:
+            del self._entries[key]
+        self._size -= 1
+
+    def invalidate(self):
+        self._entries.clear()
+        self._size = 0
+        logger.info("[SemanticCache] Cleared.")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
+
+
+semantic_cache = SemanticCache()
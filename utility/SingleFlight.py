@@ -0,0 +1,127 @@
+'''
+SingleFlight.py - Coalescing of identical concurrent calls.
+
+When a popular question arrives from many users at once, every layer underneath repeats the same
+work: the pipeline, the retriever searches, the embedding requests, the LLM calls. A SingleFlight
+group runs the first call for a key (the leader) and lets every call for the same key that
+arrives while it is in flight (followers) wait for that one result instead. Nothing is cached:
+once the leader finishes the key is free again, so results are never staler than one call.
+
+    flight = SingleFlight("embedding")
+    vector = await flight.do(text, lambda: fetch(text))    # coroutines, on one event loop
+    answer = flight.do_sync(key, lambda: client.call(...))  # blocking calls, across threads
+
+Followers receive the leader's result object itself (or its exception), so callers treat it as
+read-only or copy it. If a leader is cancelled (its client went away), its followers are not: the
+first one to wake runs fn() itself and the rest follow it. do_sync followers block their thread
+until the leader returns, so code on an event loop calls it through asyncio.to_thread. Counts are
+exported as singleflight_calls_total{group,role}.
+'''
+
+import asyncio
+import hashlib
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, TypeVar
+
+from utility.Metrics import registry
+
+T = TypeVar("T")
+
+_LEADER_CANCELLED = object()  # resolves the shared future when the leader is cancelled
+
+singleflight_calls = registry.counter(
+    "singleflight_calls_total", "Calls per coalescing group; followers reused an in-flight result.", ("group", "role"))
+
+
+def flight_key(*parts: Any) -> str:
+    """A compact key for long inputs (prompts, queries with filters)."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(str(part).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self, group: str):
+        self.group = group
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Awaits `fn()`, or the in-flight call with the same key on this event loop."""
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)  # futures belong to one loop
+        future = self._futures.get(loop_key)
+        if future is not None:
+            singleflight_calls.inc(group=self.group, role="follower")
+            while future is not None:
+                result = await asyncio.shield(future)
+                if result is not _LEADER_CANCELLED:
+                    return result
+                # The leader was cancelled: take over its call, or follow whoever already did.
+                future = self._futures.get(loop_key)
+
+        singleflight_calls.inc(group=self.group, role="leader")
+        future = loop.create_future()
+        self._futures[loop_key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here; followers re-raise it
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._futures.pop(loop_key, None)
+
+    def do_sync(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Calls `fn()`, or waits for the in-flight call with the same key from another thread.
+
+        Blocks the calling thread; never call it on an event loop (use asyncio.to_thread).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        singleflight_calls.inc(group=self.group, role="leader" if leader else "follower")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def is_in_flight(self, key: Hashable) -> bool:
+        """Whether a call to do(key, ...) from this event loop would follow an in-flight call."""
+        return (id(asyncio.get_running_loop()), key) in self._futures
+
+    def in_flight(self) -> int:
+        return len(self._futures) + len(self._calls)
@@ -1,11 +1,71 @@
+'''
+StateManager.py - Mutations of a ConversationState, within fixed per-conversation budgets.
+
+Conversations are held server-side by the thousand (utility/ConversationStore.py), so every
+part of the state that can grow is bounded:
+
+- messages: at most MAX_MESSAGE_HISTORY turns and STATE_MAX_MESSAGE_BYTES of content; trimmed
+  turns are folded into history_digest, one short line each, capped at HISTORY_DIGEST_MAX_CHARS.
+- tool_memory: STATE_TOOL_MEMORY_MAX_BYTES of raw tool output in total; the least recently
+  written tools are evicted first, and an output too large on its own is shrunk (long strings
+  and lists cut) to fit.
+- context_entities: at most MAX_CONTEXT_ENTITIES keys (least recently updated evicted), values
+  cut to CONTEXT_ENTITY_MAX_CHARS.
+'''
+
+import os
+import json
 from utility.model import (
     ConversationState, Message, ToolMemory, UserProfile
 )
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
 from Logging.logger import logger
 
-MAX_MESSAGE_HISTORY = 7
+MAX_MESSAGE_HISTORY = int(os.getenv("MAX_MESSAGE_HISTORY", "7"))
+STATE_MAX_MESSAGE_BYTES = int(os.getenv("STATE_MAX_MESSAGE_BYTES", str(32 * 1024)))
+HISTORY_DIGEST_MAX_CHARS = int(os.getenv("HISTORY_DIGEST_MAX_CHARS", "2000"))
+HISTORY_DIGEST_LINE_CHARS = 160
+STATE_TOOL_MEMORY_MAX_BYTES = int(os.getenv("STATE_TOOL_MEMORY_MAX_BYTES", str(256 * 1024)))
+MAX_CONTEXT_ENTITIES = int(os.getenv("MAX_CONTEXT_ENTITIES", "32"))
+CONTEXT_ENTITY_MAX_CHARS = int(os.getenv("CONTEXT_ENTITY_MAX_CHARS", "500"))
+CONTEXT_ENTITY_MAX_ITEMS = 20
+
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+
+
+def _shrink(value: Any, max_chars: int, max_items: int) -> Any:
+    """A copy of `value` with strings cut to `max_chars` and lists to `max_items`, at any depth."""
+    if isinstance(value, str):
+        return value if len(value) <= max_chars else value[:max_chars] + "..."
+    if isinstance(value, dict):
+        return {k: _shrink(v, max_chars, max_items) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_shrink(v, max_chars, max_items) for v in value[:max_items]]
+    return value
+
+
+def _fit(data: Dict[str, Any], max_bytes: int) -> Tuple[Dict[str, Any], int]:
+    """`data` and its size, shrunk with tighter limits until it fits in `max_bytes`."""
+    size = _size(data)
+    max_chars, max_items = 4096, 100
+    while size > max_bytes and (max_chars > 64 or max_items > 1):
+        data = _shrink(data, max_chars, max_items)
+        data["_truncated"] = True
+        size = _size(data)
+        max_chars, max_items = max(64, max_chars // 2), max(1, max_items // 2)
+    return data, size
+
+
+def _digest_line(message: Message) -> str:
+    speaker = f"{message.role}/{message.tool_used}" if message.tool_used else message.role
+    text = " ".join(message.content.split())
+    if len(text) > HISTORY_DIGEST_LINE_CHARS:
+        text = text[:HISTORY_DIGEST_LINE_CHARS] + "..."
+    return f"{speaker}: {text}"
+
 
 class StateManager:
     def __init__(self, initial_state: Optional[ConversationState] = None):
@@ -29,8 +89,23 @@ class StateManager:
         self.trim_messages()
 
     def trim_messages(self):
-        if len(self.state.messages) > MAX_MESSAGE_HISTORY:
-            self.state.messages = self.state.messages[-MAX_MESSAGE_HISTORY:]
+        messages = self.state.messages
+        content_bytes = sum(len(m.content.encode("utf-8")) for m in messages)
+        trimmed = []
+        while len(messages) > 1 and (len(messages) > MAX_MESSAGE_HISTORY or content_bytes > STATE_MAX_MESSAGE_BYTES):
+            oldest = messages.pop(0)
+            content_bytes -= len(oldest.content.encode("utf-8"))
+            trimmed.append(_digest_line(oldest))
+        if trimmed:
+            self._append_digest(trimmed)
+
+    def _append_digest(self, lines: List[str]):
+        digest = "\n".join(filter(None, [self.state.history_digest, *lines]))
+        if len(digest) > HISTORY_DIGEST_MAX_CHARS:
+            # Drop the oldest lines, never a partial one
+            cut = digest.find("\n", len(digest) - HISTORY_DIGEST_MAX_CHARS)
+            digest = digest[cut + 1:] if cut != -1 else digest[-HISTORY_DIGEST_MAX_CHARS:]
+        self.state.history_digest = digest
 
     # Focus / Intent / Context
 
@@ -49,7 +124,12 @@ class StateManager:
             new_entities["location"] = ", ".join(
                 filter(None, [loc.get("city"), loc.get("state"), loc.get("country")])
             )
-        self.state.context_entities.update(new_entities)
+        entities = self.state.context_entities
+        for key, value in new_entities.items():
+            entities.pop(key, None) # re-insert, so dict order is least recently updated first
+            entities[key] = _shrink(value, CONTEXT_ENTITY_MAX_CHARS, CONTEXT_ENTITY_MAX_ITEMS)
+        while len(entities) > MAX_CONTEXT_ENTITIES:
+            entities.pop(next(iter(entities)))
 
     def update_user_profile(self, profile: UserProfile):
         self.state.user_profile = profile
@@ -66,7 +146,18 @@ class StateManager:
     # Tool Memory
 
     def set_tool_memory(self, tool_name: str, memory_data: Dict[str, Any]):
-        self.state.tool_memory[tool_name] = ToolMemory(tool_name=tool_name, data=memory_data)
+        data, size = _fit(memory_data or {}, STATE_TOOL_MEMORY_MAX_BYTES)
+        if data is not memory_data and memory_data:
+            logger.debug("[StateManager] Shrunk output of '%s' to %d bytes.", tool_name, size)
+        memory = self.state.tool_memory
+        memory.pop(tool_name, None) # re-insert, so dict order is least recently written first
+        memory[tool_name] = ToolMemory(tool_name=tool_name, data=data, size_bytes=size)
+
+        total = sum(m.size_bytes for m in memory.values())
+        while total > STATE_TOOL_MEMORY_MAX_BYTES and len(memory) > 1:
+            evicted = memory.pop(next(iter(memory)))
+            total -= evicted.size_bytes
+            logger.debug("[StateManager] Evicted tool memory of '%s' (%d bytes).", evicted.tool_name, evicted.size_bytes)
 
     def get_tool_memory(self, tool_name: str) -> Dict[str, Any]:
         return self.state.tool_memory.get(tool_name, ToolMemory(tool_name=tool_name)).data
@@ -0,0 +1,317 @@
+'''
+Tracing.py - Lightweight request tracing for the backend, the pipeline and the MCP tool servers.
+
+Spans follow the OpenTelemetry data model (trace id, span id, parent span id, attributes, status)
+and are propagated with the W3C `traceparent` header, so the backend's request trace continues
+into the MCP host: ToolExecutor sends the header with every MCP session, and TraceMiddleware on
+both apps picks it up. The current span lives in a context variable, so it follows asyncio tasks
+and asyncio.to_thread calls without being passed around.
+
+Finished spans are exported as OTLP-style JSON lines by a background thread, so the request path
+never touches the disk; the queue is bounded and spans are dropped rather than blocking when it
+is full. The file is size-rotated like the application log (TRACE_EXPORT_MAX_BYTES,
+TRACE_EXPORT_BACKUP_COUNT), so a long-running server keeps a bounded amount of spans on disk.
+
+In-process listeners (utility/Metrics.py) receive every finished span as well. TRACING_ENABLED=false
+stops the export; spans are then only recorded while a listener needs them. TRACE_EXPORT_FILE is
+the exporter's JSON-lines file (empty disables export but keeps trace ids for propagation).
+'''
+
+import os
+import json
+import time
+import inspect
+import queue
+import atexit
+import secrets
+import logging
+import functools
+import threading
+import logging.handlers
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from Logging.logger import logger
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+TRACE_EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", os.path.join("Artifacts", "traces", "spans.jsonl"))
+TRACE_EXPORT_QUEUE_SIZE = int(os.getenv("TRACE_EXPORT_QUEUE_SIZE", "10000"))
+TRACE_EXPORT_MAX_BYTES = int(os.getenv("TRACE_EXPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_EXPORT_BACKUP_COUNT = int(os.getenv("TRACE_EXPORT_BACKUP_COUNT", "5"))
+SERVICE_NAME = os.getenv("SERVICE_NAME", "udyamitra")
+
+TRACEPARENT_HEADER = "traceparent"
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "service", "attributes",
+                 "start_ns", "end_ns", "status", "status_message", "_start_perf")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: Optional[str], service: str,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.service = service
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = "UNSET"
+        self.status_message = ""
+        self._start_perf = time.perf_counter()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> float:
+        return (time.perf_counter() - self._start_perf) * 1000.0 if self.end_ns is None \
+            else (self.end_ns - self.start_ns) / 1e6
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = self.start_ns + int((time.perf_counter() - self._start_perf) * 1e9)
+            if self.status == "UNSET":
+                self.status = "OK"
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id or "",
+            "name": self.name,
+            "service": self.service,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+        }
+
+
+class _RemoteParent:
+    """The caller's span, known only by the ids in an incoming traceparent header."""
+    __slots__ = ("trace_id", "span_id")
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+_current_span: contextvars.ContextVar[Optional[Any]] = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """Appends finished spans as JSON lines to a size-rotated file from a daemon thread."""
+
+    def __init__(self, path: str, max_queue: int = TRACE_EXPORT_QUEUE_SIZE,
+                 max_bytes: int = TRACE_EXPORT_MAX_BYTES, backup_count: int = TRACE_EXPORT_BACKUP_COUNT):
+        self.path = os.path.abspath(path) if path else ""
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.dropped = 0
+        self._file: Optional[logging.handlers.RotatingFileHandler] = None
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self._listeners: List[Callable[[Span], None]] = []
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    def add_listener(self, listener: Callable[[Span], None]):
+        """Registers an in-process consumer of finished spans (called on the request path, keep it cheap)."""
+        self._listeners.append(listener)
+
+    @property
+    def has_listeners(self) -> bool:
+        return bool(self._listeners)
+
+    def export(self, span: Span):
+        for listener in self._listeners:
+            try:
+                listener(span)
+            except Exception as e:
+                logger.warning(f"[Tracing] Span listener failed: {e}")
+        if not self.path or not TRACING_ENABLED:
+            return
+        try:
+            self._queue.put_nowait(span.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        if self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            # Rotation as in Logging/logger.py: spans.jsonl, spans.jsonl.1, ... spans.jsonl.<backup_count>.
+            self._file = logging.handlers.RotatingFileHandler(
+                self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding="utf-8", delay=True)
+            self._file.setFormatter(logging.Formatter("%(message)s"))
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            while len(batch) < 256:
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._write(batch)
+                    return
+                batch.append(nxt)
+            self._write(batch)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            lines = "\n".join(json.dumps(span, default=str) for span in batch)
+        except Exception as e:
+            logger.warning(f"[Tracing] Failed to export {len(batch)} spans: {e}")
+            return
+        # One record per batch: the handler rolls the file over before a batch would push it past
+        # max_bytes, so a file overshoots by at most one batch (256 spans).
+        self._file.emit(logging.makeLogRecord({"msg": lines}))
+
+    def shutdown(self, timeout: float = 2.0):
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+
+
+exporter = SpanExporter(TRACE_EXPORT_FILE)
+atexit.register(exporter.shutdown)
+
+
+# --- Context ---
+
+def parse_traceparent(header: Optional[str]) -> Optional[_RemoteParent]:
+    """Parses a W3C traceparent header ("00-<32 hex trace id>-<16 hex span id>-<flags>")."""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return _RemoteParent(parts[1], parts[2])
+
+
+def current_span() -> Optional[Span]:
+    active = _current_span.get()
+    return active if isinstance(active, Span) else None
+
+
+def current_trace_id() -> Optional[str]:
+    active = _current_span.get()
+    return active.trace_id if active is not None else None
+
+
+def current_traceparent() -> Optional[str]:
+    active = _current_span.get()
+    return f"00-{active.trace_id}-{active.span_id}-01" if active is not None else None
+
+
+def inject(headers: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """Returns `headers` plus the traceparent of the current span, for outgoing requests."""
+    headers = dict(headers or {})
+    traceparent = current_traceparent()
+    if traceparent:
+        headers[TRACEPARENT_HEADER] = traceparent
+    return headers
+
+
+@contextmanager
+def span(name: str, service: Optional[str] = None, parent: Any = None, **attributes) -> Iterator[Optional[Span]]:
+    """
+    Records a span around the block, as a child of `parent` (a Span or a parsed traceparent) or of
+    the current span; the service name is inherited from a local parent. Exceptions are recorded
+    on the span and re-raised. Yields None when nothing would consume the span, so callers guard
+    attribute updates with `if s:`.
+    """
+    if not TRACING_ENABLED and not exporter.has_listeners:
+        yield None
+        return
+    parent = parent if parent is not None else _current_span.get()
+    service = service or (parent.service if isinstance(parent, Span) else SERVICE_NAME)
+    trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+    new_span = Span(name, trace_id, parent.span_id if parent is not None else None, service, attributes)
+    token = _current_span.set(new_span)
+    try:
+        yield new_span
+    except BaseException as e:
+        new_span.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        new_span.end()
+        exporter.export(new_span)
+
+
+def traced(name: Optional[str] = None, **attributes):
+    """Decorator form of span() for sync and async functions."""
+    def decorator(fn):
+        span_name = name or f"{fn.__module__}.{fn.__qualname__}"
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name, **attributes):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# --- ASGI ---
+
+class TraceMiddleware:
+    """
+    Opens a server span per HTTP request, continuing the caller's trace when a traceparent header
+    is present, and returns the trace id in the X-Trace-Id response header.
+    """
+
+    def __init__(self, app, service: str = SERVICE_NAME):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope.get("headers", [])}
+        remote = parse_traceparent(headers.get(TRACEPARENT_HEADER))
+        path = scope.get("path", "")
+        with span(f"{scope.get('method', 'GET')} {path}", service=self.service, parent=remote,
+                  **{"http.method": scope.get("method"), "http.route": path}) as server_span:
+
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start" and server_span is not None:
+                    server_span.set_attribute("http.status_code", message.get("status"))
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"x-trace-id", server_span.trace_id.encode("latin-1"))
+                    ]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace)
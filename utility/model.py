@@ -86,9 +86,13 @@ class Message(BaseModel):
 class ToolMemory(BaseModel):
     tool_name: str
     data: Dict[str, Any] = {}
+    size_bytes: int = 0 # serialized size of data, for the StateManager budget
 
 class ConversationState(BaseModel):
     messages: List[Message] = []
+    history_digest: str = "" # one line per turn trimmed from messages, oldest first
+    conversation_summary: str = "" # running summary used in prompts (utility/ConversationSummary.py)
+    summarized_until: Optional[datetime] = None # timestamp of the newest message folded into the summary
     # Core memory
     user_profile: Optional[UserProfile] = None
     context_entities: Dict[str, Any] = {}
@@ -122,3 +126,19 @@ class AnalysisGeneratorOutput(BaseModel):
     actionable_steps: List[str] = Field(..., description="A clear checklist of practical next steps for the user.")
     data_table: Optional[List[Dict[str, Any]]] = Field(None, description="An optional table of data, represented as a list of objects.")
     sources: List[str] = Field(..., description="The name of the data collection used for the analysis.")
+
+# Context packing
+class PackedContext(BaseModel):
+    text: str = ""
+    sources: List[str] = Field(default_factory=list)
+    token_count: int = 0
+    input_chunks: int = 0
+    dropped_blocks: int = 0
+
+# Retrieval filters
+class RetrievalFilter(BaseModel):
+    scheme_name: Optional[str] = None
+    source_file: Optional[str] = None
+    chunk_index_min: Optional[int] = None
+    chunk_index_max: Optional[int] = None
+    location: Optional[str] = None # state or region, matched against location_scope